@@ -0,0 +1,78 @@
+# benchmarks/bench_inventory_batch.py
+"""
+库存批次构建对比：normalize_inventory_rows（元组列表）vs InventoryBatch.from_api_rows（按列紧凑存放）。
+不连数据库，只测规范化/构建耗时（取 3 次最好成绩）和构建结果常驻内存（tracemalloc）。
+
+用法：python benchmarks/bench_inventory_batch.py [行数]   （默认 100000）
+clean：数值/字符串都是干净值；mixed：每 10 行有一行带 None / 数字文本（走逐个转换的回退）。
+"""
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory_rows import InventoryBatch, normalize_inventory_rows
+
+NUMERIC_FIELDS = (
+    "total", "available_total", "reserved_fc_transfers", "reserved_fc_processing",
+    "reserved_customerorders", "afn_unsellable_quantity", "afn_inbound_working_quantity",
+    "afn_inbound_shipped_quantity", "afn_inbound_receiving_quantity", "stock_up_num",
+)
+
+
+def make_rows(n, mixed=False):
+    rows = []
+    for i in range(n):
+        r = {
+            "sid": 900000 + i % 50,
+            "name": "美国仓-压测",
+            "seller_sku": f"BENCH-SKU-{i:07d}",
+            "sku": f"INNER-{i:07d}",
+            "asin": f"B0{i:08d}",
+            "fulfillment_channel": "AMAZON_NA",
+            "share_type": 0,
+            **{k: (i + j) % 300 for j, k in enumerate(NUMERIC_FIELDS)},
+        }
+        if mixed and i % 10 == 0:
+            r["total"], r["stock_up_num"], r["sku"] = None, "3", None
+        rows.append(r)
+    return rows
+
+
+def best_time(fn, rows, repeat=3):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        t0 = time.perf_counter()
+        fn(rows)
+        dt = time.perf_counter() - t0
+        best = dt if best is None else min(best, dt)
+    return best
+
+
+def retained_mb(fn, rows):
+    gc.collect()
+    tracemalloc.start()
+    result = fn(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size / 1e6
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    builders = (("tuples", normalize_inventory_rows), ("batch", InventoryBatch.from_api_rows))
+    print(f"{'rows':>9} {'data':>6} {'builder':>8} {'build(s)':>9} {'memory(MB)':>11}")
+    for mixed in (False, True):
+        rows = make_rows(n, mixed)
+        for name, fn in builders:
+            print(f"{n:>9} {'mixed' if mixed else 'clean':>6} {name:>8} "
+                  f"{best_time(fn, rows):>9.3f} {retained_mb(fn, rows):>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# benchmarks/bench_inventory_load.py
+"""
+inventory_fba_current 写入引擎对比：executemany（分块 INSERT ... ON DUPLICATE KEY UPDATE）
+vs load_data（LOAD DATA LOCAL INFILE 进临时表 + 一条 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE）。
+
+用法：python benchmarks/bench_inventory_load.py [行数,行数,...]   （默认 10000,100000,1000000）
+连接参数取环境变量 MYSQL_HOST / MYSQL_PORT / MYSQL_USER / MYSQL_PASSWORD / MYSQL_DB（同 tests/），
+服务端需开启 local_infile（SET GLOBAL local_infile = 1）。
+数据写在 source_system='BENCHLOAD' 下，每轮前后清理。每种规模测两次：首次插入、全部更新。
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db_utils import DBHelper
+
+SOURCE = "BENCHLOAD"
+
+
+def make_rows(n, bump=0):
+    return [
+        {
+            "sid": 900000 + i % 50,
+            "name": "美国仓-压测",
+            "seller_sku": f"BENCH-SKU-{i:07d}",
+            "sku": f"INNER-{i:07d}",
+            "asin": f"B0{i:08d}",
+            "fulfillment_channel": "AMAZON_NA",
+            "share_type": 0,
+            "total": i % 1000 + bump,
+            "available_total": i % 900 + bump,
+            "reserved_fc_transfers": i % 7,
+            "afn_inbound_working_quantity": i % 5,
+        }
+        for i in range(n)
+    ]
+
+
+def cleanup(db):
+    db.cursor.execute("DELETE FROM inventory_fba_current WHERE source_system = %s", (SOURCE.lower(),))
+    db.conn.commit()
+
+
+def timed(db, rows, engine):
+    t0 = time.perf_counter()
+    db.upsert_inventory_fba_current_from_api(rows, source_system=SOURCE, engine=engine, chunk_size=1000)
+    return time.perf_counter() - t0
+
+
+def main():
+    sizes = [int(x) for x in (sys.argv[1] if len(sys.argv) > 1 else "10000,100000,1000000").split(",")]
+    db = DBHelper(
+        host=os.getenv("MYSQL_HOST", "127.0.0.1"),
+        port=int(os.getenv("MYSQL_PORT", "3306")),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", ""),
+        db_name=os.getenv("MYSQL_DB", "LXTESTN8N"),
+        local_infile=True,
+    )
+    db.connect()
+    try:
+        db.create_inventory_fba_current_table()
+        print(f"{'rows':>9} {'engine':>12} {'insert(s)':>10} {'update(s)':>10} {'rows/s(ins)':>12}")
+        for n in sizes:
+            inserts, updates = make_rows(n), make_rows(n, bump=1)
+            for engine in ("executemany", "load_data"):
+                cleanup(db)
+                t_ins = timed(db, inserts, engine)
+                t_upd = timed(db, updates, engine)
+                print(f"{n:>9} {engine:>12} {t_ins:>10.2f} {t_upd:>10.2f} {n / t_ins:>12.0f}")
+            cleanup(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
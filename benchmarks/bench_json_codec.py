@@ -0,0 +1,93 @@
+# benchmarks/bench_json_codec.py
+"""
+JSON 编解码对比：改造前的 requests r.json()（先按 charset 解码成 str 再 json.loads）、
+标准库直接解析 bytes、json_codec（有 orjson 时走 orjson）。
+样本：店铺列表页（100 家店铺）、FBA 库存页（200 行，含共享仓子项），
+外加 insert_shop_data 的逐店铺序列化（json.dumps(..., ensure_ascii=False) vs json_codec.dumps）。
+
+用法：python benchmarks/bench_json_codec.py [次数]    （默认 2000）
+"""
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+
+import json_codec
+
+
+def seller_page(n=100):
+    return {"code": 0, "message": "success", "error_details": [], "request_id": "b0c1", "total": n, "data": [
+        {
+            "sid": 100 + i, "mid": 1, "name": f"美国站-店铺{i}", "seller_id": f"A1B2C3D4E5{i:04d}",
+            "account_name": f"账号{i}", "seller_account_id": 5000 + i, "region": "NA", "country": "美国",
+            "has_ads_setting": 1, "marketplace_id": "ATVPDKIKX0DER", "status": 1,
+        }
+        for i in range(n)
+    ]}
+
+
+def fba_page(n=200):
+    return {"code": 0, "message": "success", "error_details": [], "total": 12345, "data": [
+        {
+            "sid": 100 + i % 20, "name": "美国仓", "seller_sku": f"SKU-{i:06d}", "sku": f"INNER-{i:06d}",
+            "asin": f"B0{i:08d}", "fulfillment_channel": "AMAZON_NA", "share_type": i % 3,
+            "total": i % 1000, "available_total": i % 900, "reserved_fc_transfers": i % 7,
+            "reserved_fc_processing": i % 5, "reserved_customerorders": i % 3, "afn_unsellable_quantity": 0,
+            "afn_inbound_working_quantity": i % 11, "afn_inbound_shipped_quantity": i % 13,
+            "afn_inbound_receiving_quantity": 0, "stock_up_num": 0, "is_hide": False,
+            "fba_storage_quantity_list": [
+                {"sid": 100 + j, "name": f"共享仓{j}", "total": j, "available_total": j} for j in range(i % 3)
+            ],
+        }
+        for i in range(n)
+    ]}
+
+
+def make_response(payload):
+    """模拟 requests 收到的响应：Content-Type 不带 charset（领星接口的常见情况）。"""
+    resp = requests.Response()
+    resp._content = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    resp.headers["Content-Type"] = "application/json"
+    resp.status_code = 200
+    return resp
+
+
+def bench(label, fn, n):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(n):
+        fn()
+    dt = time.perf_counter() - t0
+    print(f"  {label:<34} {dt * 1e6 / n:>9.1f} µs/次")
+    return dt
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    print(f"json_codec 后端：{json_codec.BACKEND}；每项 {n} 次\n")
+    for name, payload in (("店铺列表页（100 家）", seller_page()), ("FBA 库存页（200 行）", fba_page())):
+        resp = make_response(payload)
+        print(f"{name}，{len(resp.content) / 1024:.1f} KiB")
+
+        def fresh_requests_json():
+            resp.encoding = None  # r.text 的编码探测结果会被缓存，每次清掉才是逐页的真实开销
+            return resp.json()
+
+        base = bench("requests r.json()", fresh_requests_json, n)
+        bench("json.loads(bytes)", lambda: json.loads(resp.content), n)
+        new = bench("json_codec.response_json", lambda: json_codec.response_json(resp), n)
+        print(f"  → 解码提速 {base / new:.1f}x\n")
+
+    shops = seller_page()["data"]
+    print("insert_shop_data 逐店铺序列化（100 家）")
+    base = bench("json.dumps(ensure_ascii=False)", lambda: [json.dumps(s, ensure_ascii=False) for s in shops], n)
+    new = bench("json_codec.dumps", lambda: [json_codec.dumps(s) for s in shops], n)
+    print(f"  → 序列化提速 {base / new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
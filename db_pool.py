@@ -0,0 +1,209 @@
+# db_pool.py
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+import pymysql
+from pymysql.constants import SERVER_STATUS
+
+
+class PoolTimeoutError(RuntimeError):
+    """连接池已满，且在 acquire_timeout 内没有连接被归还。"""
+
+
+class ConnectionPool:
+    """
+    线程安全的 pymysql 连接池：
+    - max_size：同时存在（借出 + 空闲）的连接上限；满了就等待归还，超过 acquire_timeout 抛 PoolTimeoutError
+    - idle_timeout：空闲超过该秒数的连接在下次借用时关闭，不再复用
+    - 借出前健康检查：空闲超过 ping_after 秒的连接先 ping，失败就丢弃并新建
+    - 归还时若还在事务中（调用方忘了 commit）先回滚，避免把锁/半截事务带给下一个使用者
+    - stats() 返回计数指标（新建/复用/等待/超时/健康检查失败/当前借出与空闲数）
+    fork 后子进程第一次使用时会丢弃从父进程继承来的连接（socket 不能跨进程共享）。
+    """
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        max_size: int = 10,
+        idle_timeout: float = 300.0,
+        ping_after: float = 0.0,
+        acquire_timeout: float = 30.0,
+    ):
+        self._factory = factory
+        self.max_size = max(1, int(max_size))
+        self.idle_timeout = float(idle_timeout)
+        self.ping_after = float(ping_after)
+        self.acquire_timeout = float(acquire_timeout)
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle: Deque[Tuple[Any, float]] = deque()  # (conn, 归还时间)
+        self._size = 0       # 借出 + 空闲
+        self._in_use = 0
+        self._closed = False
+        self._pid = os.getpid()
+        self._metrics = {
+            "created": 0, "reused": 0, "closed": 0, "expired": 0,
+            "health_failures": 0, "waits": 0, "timeouts": 0, "max_in_use": 0,
+        }
+
+    @classmethod
+    def for_mysql(cls, connect_kwargs: Dict[str, Any], **pool_kwargs) -> "ConnectionPool":
+        """用 pymysql.connect(**connect_kwargs) 建连接的池。"""
+        kwargs = dict(connect_kwargs)
+        return cls(lambda: pymysql.connect(**kwargs), **pool_kwargs)
+
+    # ---------- 借 / 还 ----------
+    def acquire(self, timeout: Optional[float] = None):
+        timeout = self.acquire_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        while True:
+            conn, returned_at = self._checkout(deadline, timeout)
+            if conn is None:
+                return self._create()
+            # 健康检查在锁外做（ping 是一次网络往返，不能挡住其它线程借还）
+            if time.monotonic() - returned_at < self.ping_after or self._healthy(conn):
+                with self._cond:
+                    self._metrics["reused"] += 1
+                return conn
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._metrics["health_failures"] += 1
+                self._close_quietly(conn)
+                self._cond.notify()
+
+    def release(self, conn, discard: bool = False) -> None:
+        """归还连接；discard=True（或回滚失败）时直接关闭，不再复用。"""
+        if not discard:
+            try:
+                if getattr(conn, "server_status", 0) & SERVER_STATUS.SERVER_STATUS_IN_TRANS:
+                    conn.rollback()
+            except Exception:
+                discard = True
+        with self._cond:
+            self._in_use -= 1
+            if discard or self._closed or os.getpid() != self._pid:
+                self._size -= 1
+                self._close_quietly(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """with pool.connection() as conn: ...（异常时回滚后归还）"""
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            try:
+                conn.rollback()
+                self.release(conn)
+            except Exception:
+                self.release(conn, discard=True)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self) -> None:
+        """关闭所有空闲连接；借出中的连接归还时关闭。"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                self._size -= 1
+                self._close_quietly(conn)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return dict(self._metrics, size=self._size, in_use=self._in_use, idle=len(self._idle),
+                        max_size=self.max_size)
+
+    # ---------- 内部 ----------
+    def _checkout(self, deadline: float, timeout: float):
+        """
+        占一个名额：有空闲连接就取出（LIFO，冷连接留在队头慢慢过期），否则在未满时允许新建（返回 None），
+        都不行就等待归还。返回 (conn 或 None, 归还时间)。
+        """
+        with self._cond:
+            self._check_fork()
+            while True:
+                if self._closed:
+                    raise RuntimeError("连接池已关闭")
+                now = time.monotonic()
+                while self._idle and now - self._idle[0][1] > self.idle_timeout:
+                    conn, _ = self._idle.popleft()
+                    self._size -= 1
+                    self._metrics["expired"] += 1
+                    self._close_quietly(conn)
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    conn, returned_at = None, now
+                    break
+                remaining = deadline - now
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolTimeoutError(
+                        f"连接池已满（max_size={self.max_size}），等待 {timeout:.1f}s 仍无可用连接")
+                self._metrics["waits"] += 1
+                self._cond.wait(remaining)
+            self._in_use += 1
+            self._metrics["max_in_use"] = max(self._metrics["max_in_use"], self._in_use)
+            return conn, returned_at
+
+    def _healthy(self, conn) -> bool:
+        try:
+            conn.ping(reconnect=False)
+            return True
+        except Exception:
+            return False
+
+    def _create(self):
+        try:
+            conn = self._factory()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+        with self._cond:
+            self._metrics["created"] += 1
+        return conn
+
+    def _close_quietly(self, conn) -> None:
+        self._metrics["closed"] += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _check_fork(self) -> None:
+        if os.getpid() != self._pid:
+            # 继承自父进程的连接不能用，也不能 close（会影响父进程的 socket），直接丢弃
+            self._pid = os.getpid()
+            self._idle.clear()
+            self._size = self._in_use = 0
+
+
+# ---------- 模块级共享池：相同连接参数共用一个池 ----------
+_pools: Dict[Tuple, ConnectionPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(connect_kwargs: Dict[str, Any], **pool_kwargs) -> ConnectionPool:
+    """按连接参数取（或创建）共享池；pool_kwargs 只在第一次创建时生效。"""
+    key = tuple(sorted(connect_kwargs.items(), key=lambda kv: kv[0]))
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is None:
+            pool = _pools[key] = ConnectionPool.for_mysql(connect_kwargs, **pool_kwargs)
+        return pool
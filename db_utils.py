@@ -1,43 +1,265 @@
 import pymysql
-import json  # 必须导入json模块
-from pymysql.err import OperationalError, ProgrammingError, IntegrityError
+import hashlib
+import os
+import queue
+import random
+import tempfile
+import threading
+import time
+from operator import itemgetter
+from pymysql.err import OperationalError, ProgrammingError, IntegrityError, InterfaceError
 from datetime import datetime
 
+import json_codec
+from db_pool import PoolTimeoutError, get_pool
+from inventory_rows import INVENTORY_FIELDS, InventoryBatch, decimal_text, normalize_inventory_rows
+
 class DBHelper:
-    def __init__(self, host, port, user, password, db_name):
-        """初始化数据库连接参数"""
+    # engine="auto" 时，一次写入行数达到该阈值才走 LOAD DATA LOCAL INFILE
+    LOAD_DATA_MIN_ROWS = 5000
+    # 连接中断（2006 gone away / 2013 lost connection / 2003 连不上 / 2055 读写失败）时重连重试当前分块
+    RECONNECT_ERRORS = (2003, 2006, 2013, 2055)
+    RECONNECT_RETRIES = 5
+    RECONNECT_BACKOFF = 1.0  # 秒，指数退避：1, 2, 4, 8, 16
+    # InnoDB 死锁（1213）/ 锁等待超时（1205）时回滚当前分块并重试（带随机抖动，错开冲突的事务）
+    LOCK_CONFLICT_ERRORS = (1205, 1213)
+    LOCK_CONFLICT_RETRIES = 5
+    LOCK_CONFLICT_BACKOFF = 0.05  # 秒，0.05~0.1, 0.1~0.2, ...
+
+    def __init__(self, host, port, user, password, db_name, local_infile=False, pool=None):
+        """
+        初始化数据库连接参数（local_infile=True 才允许 LOAD DATA LOCAL INFILE 批量导入，服务端也需开启 local_infile）
+        pool：传 db_pool.ConnectionPool 则 connect() 从池里借连接、close() 归还；
+              传 True 则使用按连接参数共享的模块级池（db_pool.get_pool）
+        """
         self.host = host
         self.port = port
         self.user = user
         self.password = password
         self.db_name = db_name
+        self.local_infile = local_infile
+        self.pool = get_pool(self.connect_kwargs()) if pool is True else pool
         self.conn = None
         self.cursor = None
+        self._row_hash_ready = set()  # 已确认有 row_hash 列的库存表
+        self._snapshot_locked = False  # 是否持有库存快照的命名锁（重连后需重新获取）
+        self._load_data_unavailable = False  # engine="auto" 下 LOAD DATA 失败过（服务端未开 local_infile 等）
+        # 分块写入进度：{名称: {chunks_done, chunks_total, rows_done, rows_total}}，出错时写进 ingestion_runs
+        self.progress = {}
+        self.reconnects = 0
+
+    def connect_kwargs(self):
+        return dict(
+            host=self.host,
+            port=self.port,
+            user=self.user,
+            password=self.password,
+            database=self.db_name,
+            charset='utf8mb4',  # 支持特殊字符
+            local_infile=self.local_infile
+        )
 
     def connect(self):
-        """建立数据库连接"""
+        """建立数据库连接（有连接池时从池里借）"""
         try:
-            self.conn = pymysql.connect(
-                host=self.host,
-                port=self.port,
-                user=self.user,
-                password=self.password,
-                database=self.db_name,
-                charset='utf8mb4'  # 支持特殊字符
-            )
+            if self.pool is not None:
+                self.conn = self.pool.acquire()
+            else:
+                self.conn = pymysql.connect(**self.connect_kwargs())
             self.cursor = self.conn.cursor(pymysql.cursors.DictCursor)
             print("数据库连接成功")
-        except OperationalError as e:
+        except (OperationalError, PoolTimeoutError) as e:
             raise Exception(f"数据库连接失败：{str(e)}")
 
     def close(self):
-        """关闭数据库连接"""
+        """关闭数据库连接（有连接池时归还给池）"""
         if self.cursor:
             self.cursor.close()
         if self.conn:
-            self.conn.close()
+            if self.pool is not None:
+                self.pool.release(self.conn)
+            else:
+                self.conn.close()
+        self.cursor = None
+        self.conn = None
         print("数据库连接已关闭")
 
+    # ---------- 断线重连 + 分块续写 ----------
+    def _is_connection_lost(self, e):
+        if isinstance(e, InterfaceError):  # 连接已关闭后再用
+            return True
+        return isinstance(e, OperationalError) and bool(e.args) and e.args[0] in self.RECONNECT_ERRORS
+
+    def reconnect(self):
+        """丢弃当前连接（池连接不再归还复用）并重新连接；持有快照命名锁时重新获取。"""
+        try:
+            if self.cursor:
+                self.cursor.close()
+        except Exception:
+            pass
+        try:
+            if self.conn:
+                if self.pool is not None:
+                    self.pool.release(self.conn, discard=True)
+                else:
+                    self.conn.close()
+        except Exception:
+            pass
+        self.conn = self.cursor = None
+        self.connect()
+        self.reconnects += 1
+        if self._snapshot_locked:
+            self._acquire_snapshot_lock()
+
+    def _with_reconnect(self, fn):
+        """执行 fn()；遇到连接中断就退避重连后重新执行（fn 必须可重放：未提交的部分已随连接丢失）。"""
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except (OperationalError, InterfaceError) as e:
+                if not self._is_connection_lost(e) or attempt >= self.RECONNECT_RETRIES:
+                    raise
+                delay = self.RECONNECT_BACKOFF * (2 ** attempt)
+                attempt += 1
+                print(f"⚠️ 数据库连接中断（{e}），{delay:.1f}s 后第 {attempt} 次重连，从当前分块继续。")
+                time.sleep(delay)
+                try:
+                    self.reconnect()
+                except Exception as e2:
+                    print(f"⚠️ 重连失败：{e2}")
+
+    def _is_lock_conflict(self, e):
+        return isinstance(e, OperationalError) and bool(e.args) and e.args[0] in self.LOCK_CONFLICT_ERRORS
+
+    def _with_lock_retry(self, fn):
+        """执行 fn()；遇到死锁/锁等待超时先回滚（1205 只回滚了当前语句，这里把整块撤掉）再退避重试。"""
+        attempt = 0
+        while True:
+            try:
+                return fn()
+            except OperationalError as e:
+                if not self._is_lock_conflict(e) or attempt >= self.LOCK_CONFLICT_RETRIES:
+                    raise
+                try:
+                    self.conn.rollback()
+                except Exception:
+                    pass
+                delay = self.LOCK_CONFLICT_BACKOFF * (2 ** attempt) * (1 + random.random())
+                attempt += 1
+                print(f"⚠️ 锁冲突（{e}），{delay:.2f}s 后第 {attempt} 次重试当前分块。")
+                time.sleep(delay)
+
+    def _commit_unit(self, write_unit, unit):
+        """写一块并提交；断线重连、锁冲突都只重做这一块。"""
+        def _write_and_commit():
+            affected = write_unit(unit)
+            self.conn.commit()
+            return affected
+
+        return self._with_reconnect(lambda: self._with_lock_retry(_write_and_commit))
+
+    def _run_chunks(self, name, units, write_unit):
+        """
+        逐块写入并逐块提交；连接中断时重连并从失败的那一块续写（已提交的块不重做）。
+        进度记在 self.progress[name]，返回受影响行数合计。
+        """
+        p = self._progress_entry(name, units)
+        total = 0
+        for unit in units:
+            total += self._commit_unit(write_unit, unit)
+            p["chunks_done"] += 1
+            p["rows_done"] += len(unit)
+        return total
+
+    def _progress_entry(self, name, units):
+        p = self.progress.setdefault(name, {"chunks_done": 0, "chunks_total": 0, "rows_done": 0, "rows_total": 0})
+        p["chunks_total"] += len(units)
+        p["rows_total"] += sum(len(u) for u in units)
+        return p
+
+    def _run_chunks_parallel(self, name, units, make_writer, writers, queue_depth=None):
+        """
+        把分块分给 writers 个工作线程并行写，每个线程从连接池借一条自己的连接，逐块提交。
+        - 分块经有界队列（默认 2×writers）下发，调用方线程最多领先工作线程 queue_depth 块
+        - make_writer(db) 返回绑定到该线程 DBHelper 的 write_unit(unit)
+        - 任一块最终失败后不再下发新块，已在写的块写完，最后抛出第一个错误
+        """
+        pool = self.pool if self.pool is not None else get_pool(self.connect_kwargs())
+        # 主连接若也借自同一个池，要给它留一个名额
+        writers = max(1, min(int(writers), pool.max_size - (1 if self.pool is pool and self.conn else 0)))
+        if writers == 1 or len(units) <= 1:
+            return self._run_chunks(name, units, make_writer(self))
+
+        p = self._progress_entry(name, units)
+        q = queue.Queue(maxsize=queue_depth or 2 * writers)
+        lock = threading.Lock()
+        failed = threading.Event()
+        errors, totals = [], []
+
+        def _worker(db):
+            write_unit = None
+            try:
+                while True:
+                    unit = q.get()
+                    if unit is None:
+                        return
+                    if failed.is_set():
+                        continue  # 只把队列取空，让调用方线程不被卡住
+                    try:
+                        if write_unit is None:
+                            db.connect()
+                            write_unit = make_writer(db)
+                        affected = db._commit_unit(write_unit, unit)
+                    except Exception as e:
+                        with lock:
+                            errors.append(e)
+                        failed.set()
+                        continue
+                    with lock:
+                        totals.append(affected)
+                        p["chunks_done"] += 1
+                        p["rows_done"] += len(unit)
+            finally:
+                if db.conn:
+                    db.close()
+
+        helpers = [self._worker_helper(pool) for _ in range(writers)]
+        threads = [threading.Thread(target=_worker, args=(db,), name=f"db-writer-{i}", daemon=True)
+                   for i, db in enumerate(helpers)]
+        for t in threads:
+            t.start()
+        for unit in units:
+            if failed.is_set():
+                break
+            q.put(unit)
+        for _ in threads:
+            q.put(None)
+        for t in threads:
+            t.join()
+        self.reconnects += sum(db.reconnects for db in helpers)
+        if errors:
+            raise errors[0]
+        return sum(totals)
+
+    def _worker_helper(self, pool):
+        """并行写入用的 DBHelper：同样的连接参数/重试设置，连接从 pool 借。"""
+        db = type(self)(self.host, self.port, self.user, self.password, self.db_name,
+                        local_infile=self.local_infile, pool=pool)
+        for attr in ("LOAD_DATA_MIN_ROWS", "RECONNECT_RETRIES", "RECONNECT_BACKOFF",
+                     "LOCK_CONFLICT_RETRIES", "LOCK_CONFLICT_BACKOFF"):
+            setattr(db, attr, getattr(self, attr))
+        db._row_hash_ready = self._row_hash_ready
+        return db
+
+    def progress_note(self):
+        """进度摘要，如 "inventory_fba_current 3/4 chunks (1500/2000 rows); reconnects=1"。"""
+        parts = [f"{name} {p['chunks_done']}/{p['chunks_total']} chunks ({p['rows_done']}/{p['rows_total']} rows)"
+                 for name, p in self.progress.items()]
+        if self.reconnects:
+            parts.append(f"reconnects={self.reconnects}")
+        return "; ".join(parts)
+
     # 重点：这个方法必须在 DBHelper 类内部！
     def insert_shop_data(self, response_data, shop_detail):
         """
@@ -78,9 +300,9 @@ class DBHelper:
             # 处理响应时间格式（接口返回是字符串，转datetime）
             response_time = datetime.strptime(response_data["response_time"], "%Y-%m-%d %H:%M:%S")
             # 错误信息是数组，转JSON字符串存入
-            error_details = json.dumps(response_data["error_details"], ensure_ascii=False)
+            error_details = json_codec.dumps(response_data["error_details"])
             # 关键：存储单条店铺数据（shop_detail），而非全量列表
-            data_json = json.dumps(shop_detail, ensure_ascii=False)
+            data_json = json_codec.dumps(shop_detail)
 
             params = (
                 # 接口整体响应参数
@@ -117,6 +339,95 @@ class DBHelper:
             self.conn.rollback()
             raise Exception(f"插入店铺数据失败：{str(e)}")
 
+    # original_data 的列与 ON DUPLICATE KEY UPDATE 子句（单条/批量共用）
+    _ORIGINAL_DATA_COLUMNS = (
+        "code, message, error_details, response_time, data, "
+        "sid, mid, name, seller_id, account_name, seller_account_id, "
+        "region, country, has_ads_setting, marketplace_id, status"
+    )
+    _ORIGINAL_DATA_ROW = "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+    _ORIGINAL_DATA_UPDATE = """
+        code = VALUES(code),
+        message = VALUES(message),
+        error_details = VALUES(error_details),
+        response_time = VALUES(response_time),
+        data = VALUES(data),
+        mid = VALUES(mid),
+        name = VALUES(name),
+        seller_id = VALUES(seller_id),
+        account_name = VALUES(account_name),
+        seller_account_id = VALUES(seller_account_id),
+        region = VALUES(region),
+        country = VALUES(country),
+        has_ads_setting = VALUES(has_ads_setting),
+        marketplace_id = VALUES(marketplace_id),
+        status = VALUES(status)
+    """
+
+    @staticmethod
+    def _shop_row_params(response_fields, shop_detail):
+        """单家店铺的参数元组；response_fields 为已算好的 (code, message, error_details, response_time)。"""
+        return response_fields + (
+            json_codec.dumps(shop_detail),
+            shop_detail.get("sid", 0),
+            shop_detail.get("mid", 0),
+            shop_detail.get("name", ""),
+            shop_detail.get("seller_id", ""),
+            shop_detail.get("account_name", ""),
+            shop_detail.get("seller_account_id", 0),
+            shop_detail.get("region", ""),
+            shop_detail.get("country", ""),
+            shop_detail.get("has_ads_setting", 0),
+            shop_detail.get("marketplace_id", ""),
+            shop_detail.get("status", 0),
+        )
+
+    def insert_shop_data_bulk(self, response_data, shops, chunk_size=200):
+        """
+        批量写 original_data：响应级字段只算一次，每 chunk_size 家店铺一条多行 INSERT ... ON DUPLICATE KEY UPDATE，
+        每个 chunk 提交一次。某个 chunk 失败时回滚该 chunk 并逐条重试，定位具体出错的店铺，其余店铺照常写入。
+        :return: {"written": 成功店铺数, "errors": [(sid, 错误信息), ...]}
+        """
+        response_fields = (
+            response_data.get("code", 0),
+            response_data.get("message", ""),
+            json_codec.dumps(response_data["error_details"]),
+            datetime.strptime(response_data["response_time"], "%Y-%m-%d %H:%M:%S"),
+        )
+        single_sql = (f"INSERT INTO original_data ({self._ORIGINAL_DATA_COLUMNS}) "
+                      f"VALUES {self._ORIGINAL_DATA_ROW} ON DUPLICATE KEY UPDATE {self._ORIGINAL_DATA_UPDATE}")
+
+        written = 0
+        errors = []
+        for i in range(0, len(shops), chunk_size):
+            chunk = shops[i:i + chunk_size]
+            try:
+                rows = [self._shop_row_params(response_fields, shop) for shop in chunk]
+                sql = (f"INSERT INTO original_data ({self._ORIGINAL_DATA_COLUMNS}) "
+                       f"VALUES {', '.join([self._ORIGINAL_DATA_ROW] * len(rows))} "
+                       f"ON DUPLICATE KEY UPDATE {self._ORIGINAL_DATA_UPDATE}")
+                self.cursor.execute(sql, [v for row in rows for v in row])
+                self.conn.commit()
+                written += len(chunk)
+                continue
+            except Exception as e:
+                self.conn.rollback()
+                print(f"⚠️ original_data 批量写入失败（第 {i // chunk_size + 1} 批，{len(chunk)} 家），逐条重试：{e}")
+
+            # 逐条重试，只让真正有问题的那几行失败
+            for shop in chunk:
+                try:
+                    self.cursor.execute(single_sql, self._shop_row_params(response_fields, shop))
+                    self.conn.commit()
+                    written += 1
+                except Exception as e:
+                    self.conn.rollback()
+                    errors.append((shop.get("sid"), str(e)))
+                    print(f"❌ 插入店铺数据失败：sid={shop.get('sid')}, 店铺名={shop.get('name')}：{e}")
+
+        print(f"✅ original_data 批量写入完成：成功 {written} 家，失败 {len(errors)} 家")
+        return {"written": written, "errors": errors}
+
     def create_stores_table(self):
         ddl = """
               CREATE TABLE IF NOT EXISTS stores \
@@ -260,24 +571,40 @@ class DBHelper:
             print("没有可写入的店铺数据。")
             return 0
 
-        total = 0
+        def _write(batch):
+            self.cursor.executemany(sql, batch)
+            return self.cursor.rowcount
+
+        # 每块单独提交：连接中断时重连后从失败的那一块续写
         try:
-            for i in range(0, len(params), chunk_size):
-                batch = params[i:i + chunk_size]
-                self.cursor.executemany(sql, batch)
-                total += self.cursor.rowcount
-            self.conn.commit()
+            chunks = [params[i:i + chunk_size] for i in range(0, len(params), chunk_size)]
+            total = self._run_chunks("stores", chunks, _write)
             print(f"✅ UPSERT 完成（受影响行数={total}）。")
             return total
         except Exception as e:
-            self.conn.rollback()
+            try:
+                self.conn.rollback()
+            except Exception:
+                pass
             raise Exception(f"UPSERT stores 失败：{e}")
 
+    def list_store_sids(self, source_system="LINGXING", platform="AMAZON"):
+        """stores 表里该来源/平台的全部 sid（升序），用于按店铺分片拉取。"""
+        def _query():
+            self.cursor.execute(
+                "SELECT DISTINCT sid FROM stores WHERE source_system = %s AND platform = %s ORDER BY sid",
+                (source_system, platform),
+            )
+            return [int(r["sid"] if isinstance(r, dict) else r[0]) for r in self.cursor.fetchall()]
+
+        return self._with_reconnect(_query)
+
     # 在 db_utils.py 的 DBHelper 类中追加
 
-    def create_inventory_fba_current_table(self):
-        ddl = """
-              CREATE TABLE IF NOT EXISTS inventory_fba_current \
+    def create_inventory_fba_current_table(self, table="inventory_fba_current"):
+        """建库存表；table 可指定别的表名（快照模式的影子表用同一份 DDL）。"""
+        ddl = f"""
+              CREATE TABLE IF NOT EXISTS {table} \
               ( \
                   id \
                   BIGINT \
@@ -380,6 +707,7 @@ class DBHelper:
                   2 \
               ) NOT NULL DEFAULT 0,
 
+                  row_hash CHAR(32) NULL COMMENT '规范化行哈希（变更检测）',
                   pulled_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
                   updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP, \
                   UNIQUE KEY uk_src_sid_sku_chan \
@@ -405,163 +733,365 @@ class DBHelper:
               """
         self.cursor.execute(ddl)
         self.conn.commit()
-        print("✅ inventory_fba_current 表已存在（或已创建）。")
+        print(f"✅ {table} 表已存在（或已创建）。")
 
-    def upsert_inventory_fba_current_from_api(self, rows, source_system="LINGXING", platform="AMAZON", chunk_size=500):
+    def upsert_inventory_fba_current_from_api(self, rows, source_system="LINGXING", platform="AMAZON",
+                                              chunk_size=500, skip_unchanged=False, engine="auto",
+                                              table="inventory_fba_current", writers=1):
         """
         幂等写入 FBA 最新库存：
         - 唯一键：(source_system, sid, seller_sku, fulfillment_channel)
         - 共享仓：若 share_type in (1,2) 且有 fba_storage_quantity_list，则按子项展开
+        - skip_unchanged=True：按行哈希（row_hash 列）跳过没变化的行，只对它们批量刷新 pulled_at
+        - engine："executemany" 分块 INSERT；"load_data" 走 LOAD DATA LOCAL INFILE + 一条 INSERT ... SELECT；
+          "auto" 按行数（LOAD_DATA_MIN_ROWS）和 local_infile 开关自动选择
+        - table：写入的目标表（快照模式下写影子表，见 start_inventory_snapshot）
+        - writers > 1：executemany 的分块先按唯一键排序，再由 writers 条池连接并行写入（见 _run_chunks_parallel）
+        rows 可以是接口原始行，也可以是已规范化的 inventory_rows.InventoryBatch
         """
+        params = self._normalize_inventory(rows, source_system, platform)
+        if not params:
+            print("没有可写入的库存数据。")
+            return 0
 
-        def _s(v, lower=False):
-            if v is None: return ""
-            s = str(v).strip()
-            return s.lower() if lower else s
+        if skip_unchanged:
+            return self._upsert_inventory_changed_only(params, chunk_size, engine, table, writers)
 
-        def _f(v):  # 数值转 float
-            try:
-                return float(v)
-            except Exception:
-                return 0.0
+        total_affected = self._write_inventory_chunked(table, params, (), chunk_size, engine, writers)
+        print(f"✅ 库存 UPSERT 完成（受影响行数={total_affected}）。")
+        return total_affected
+
+    def _normalize_inventory(self, rows, source_system, platform):
+        if isinstance(rows, InventoryBatch):  # 已规范化的紧凑批次，直接用作参数序列
+            return rows
+        return normalize_inventory_rows(rows, source_system, platform)
 
-        def _i(v):
+    # ---------- 写入引擎：executemany / LOAD DATA LOCAL INFILE ----------
+    def _resolve_inventory_engine(self, n_rows, engine):
+        if engine not in ("auto", "executemany", "load_data"):
+            raise ValueError(f"未知写入引擎：{engine}（可选：auto / executemany / load_data）")
+        if engine == "auto":
+            if self.local_infile and not self._load_data_unavailable and n_rows >= self.LOAD_DATA_MIN_ROWS:
+                return "load_data"
+            return "executemany"
+        return engine
+
+    def _write_inventory_params(self, params, extra_columns=(), chunk_size=500, engine="auto",
+                                table="inventory_fba_current"):
+        """把规范化后的元组写入库存表（不提交），返回受影响行数。"""
+        if self._resolve_inventory_engine(len(params), engine) == "load_data":
             try:
-                return int(v)
-            except Exception:
-                return 0
+                self._stage_inventory_rows(params, extra_columns, table)
+            except (OperationalError, ProgrammingError) as e:
+                # 显式指定 load_data 时原样抛出；连接中断/锁冲突也原样抛出，交给外层重连/重试
+                if engine != "auto" or self._is_connection_lost(e) or self._is_lock_conflict(e):
+                    raise
+                print(f"⚠️ LOAD DATA 不可用，改用 executemany：{e}")
+                self._load_data_unavailable = True  # 本实例之后的批次直接走 executemany
+            else:
+                self.cursor.execute(inventory_merge_sql(table=table, extra_columns=extra_columns))
+                return self.cursor.rowcount
 
-        sql = """
-              INSERT INTO inventory_fba_current (source_system, platform, sid, seller_sku, sku, asin, \
-                                                 warehouse_name, fulfillment_channel, share_type, \
-                                                 total, available_total, \
-                                                 reserved_fc_transfers, reserved_fc_processing, reserved_customerorders, \
-                                                 reserved_total, \
-                                                 afn_unsellable_quantity, \
-                                                 afn_inbound_working_quantity, afn_inbound_shipped_quantity, \
-                                                 afn_inbound_receiving_quantity, stock_up_num, inbound_total, \
-                                                 pulled_at) \
-              VALUES (%s, %s, %s, %s, %s, %s, \
-                      %s, %s, %s, \
-                      %s, %s, \
-                      %s, %s, %s, %s, \
-                      %s, \
-                      %s, %s, %s, %s, %s, \
-                      NOW()) ON DUPLICATE KEY \
-              UPDATE \
-                  warehouse_name = \
-              VALUES (warehouse_name), sku = \
-              VALUES (sku), asin = \
-              VALUES (asin), share_type = \
-              VALUES (share_type), total = \
-              VALUES (total), available_total = \
-              VALUES (available_total), reserved_fc_transfers = \
-              VALUES (reserved_fc_transfers), reserved_fc_processing = \
-              VALUES (reserved_fc_processing), reserved_customerorders = \
-              VALUES (reserved_customerorders), reserved_total = \
-              VALUES (reserved_total), afn_unsellable_quantity = \
-              VALUES (afn_unsellable_quantity), afn_inbound_working_quantity = \
-              VALUES (afn_inbound_working_quantity), afn_inbound_shipped_quantity = \
-              VALUES (afn_inbound_shipped_quantity), afn_inbound_receiving_quantity = \
-              VALUES (afn_inbound_receiving_quantity), stock_up_num = \
-              VALUES (stock_up_num), inbound_total = \
-              VALUES (inbound_total), pulled_at = NOW(), updated_at = NOW(); \
-              """
+        sql = inventory_upsert_sql(table=table, extra_columns=extra_columns)
+        total_affected = 0
+        for i in range(0, len(params), chunk_size):
+            self.cursor.executemany(sql, params[i:i + chunk_size])
+            total_affected += self.cursor.rowcount
+        return total_affected
 
-        params = []
+    def _write_inventory_chunked(self, table, params, extra_columns=(), chunk_size=500, engine="auto", writers=1):
+        """
+        分块写入并逐块提交（断线时重连续写）。executemany 每 chunk_size 行一块；
+        load_data 整批一块（临时表属于会话，断线后整块重做）。
+        writers > 1 时按唯一键排序后分块并行写：各线程的块落在互不重叠的键区间，
+        同一个键的多行不会被切到两块里（避免两个事务争同一行、也保证后出现的行最后写入）。
+        """
+        resolved = self._resolve_inventory_engine(len(params), engine)
+        # 整批走 LOAD DATA 时把调用方原本的 engine 传下去："auto" 下导入失败才能退回 executemany
+        unit_engine = engine if resolved == "load_data" else resolved
+        if resolved == "load_data":
+            units = [range(len(params))]
+        elif writers > 1:
+            params = _sort_inventory_params(params)
+            units = _key_chunk_ranges(params, chunk_size)
+        else:
+            units = [range(i, min(i + chunk_size, len(params))) for i in range(0, len(params), chunk_size)]
 
-        for r in rows:
-            seller_sku = r.get("seller_sku")
-            if not seller_sku:
-                continue
+        def make_writer(db):
+            # 块以下标区间下发，到了工作线程里才切出参数元组（InventoryBatch 只在此时拼元组）
+            return lambda unit: db._write_inventory_params(
+                params[unit.start:unit.stop], extra_columns=extra_columns, chunk_size=chunk_size,
+                engine=unit_engine, table=table)
 
-            share_type = _i(r.get("share_type"))
-            fc = _s(r.get("fulfillment_channel"), True)
-            sku = _s(r.get("sku"), True) or None
-            asin = _s(r.get("asin"), True) or None
-            wh_name = _s(r.get("name"))
-
-            # 共有数值
-            total = _f(r.get("total"))
-            available_total = _f(r.get("available_total"))
-            reserved_fc_transfers = _f(r.get("reserved_fc_transfers"))
-            reserved_fc_processing = _f(r.get("reserved_fc_processing"))
-            reserved_customerorders = _f(r.get("reserved_customerorders"))
-            reserved_total = reserved_fc_transfers + reserved_fc_processing + reserved_customerorders
-
-            unsellable = _f(r.get("afn_unsellable_quantity"))
-
-            in_working = _f(r.get("afn_inbound_working_quantity"))
-            in_shipped = _f(r.get("afn_inbound_shipped_quantity"))
-            in_receiving = _f(r.get("afn_inbound_receiving_quantity"))
-            stock_up = _f(r.get("stock_up_num"))
-            inbound_total = in_working + in_shipped + in_receiving + stock_up
-
-            # 共享仓子项展开
-            sub_list = r.get("fba_storage_quantity_list") or []
-            if share_type in (1, 2) and sub_list:
-                # 父项通常 sid=0，这里跳过父项
-                for sub in sub_list:
-                    sid = _i(sub.get("sid"))
-                    if not sid:
-                        continue
-                    sub_wh_name = _s(sub.get("name")) or wh_name
-                    q_local = _f(sub.get("quantity_for_local_fulfillment"))
-
-                    params.append((
-                        _s(source_system, True),
-                        _s(platform, True),
-                        sid,
-                        _s(seller_sku, True),
-                        sku,
-                        asin,
-                        sub_wh_name,
-                        fc or "amazon_eu",
-                        share_type,
-                        q_local,  # total：对子项未知，取本地可售近似
-                        q_local,  # available_total：子项可售
-                        0, 0, 0, 0,  # reserved_* 置 0（无法拆分）
-                        0,  # 不可售置 0
-                        0, 0, 0, 0, 0  # 入库相关置 0（无法拆分）
-                    ))
+        if writers > 1 and resolved != "load_data":
+            return self._run_chunks_parallel(table, units, make_writer, writers)
+        return self._run_chunks(table, units, make_writer(self))
+
+    def _stage_inventory_rows(self, params, extra_columns=(), table="inventory_fba_current"):
+        """把元组写成 TSV 临时文件，LOAD DATA LOCAL INFILE 进会话级临时表 inventory_fba_stage。"""
+        cols = INVENTORY_COLUMNS + tuple(extra_columns)
+        self.cursor.execute("DROP TEMPORARY TABLE IF EXISTS inventory_fba_stage")
+        # seq 记录文件里的行序，合并时按它排序，保证同键多行时“后写的生效”（与 executemany 一致）
+        self.cursor.execute(
+            "CREATE TEMPORARY TABLE inventory_fba_stage (seq BIGINT AUTO_INCREMENT PRIMARY KEY) "
+            f"SELECT {', '.join(cols)} FROM {table} LIMIT 0"
+        )
+        fd, path = tempfile.mkstemp(prefix="inventory_fba_", suffix=".tsv")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8", newline="\n") as f:
+                for p in params:
+                    f.write("\t".join(_tsv_field(v) for v in p))
+                    f.write("\n")
+            self.cursor.execute(
+                "LOAD DATA LOCAL INFILE %s INTO TABLE inventory_fba_stage CHARACTER SET utf8mb4 "
+                "FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\' LINES TERMINATED BY '\\n' "
+                f"({', '.join(cols)})",
+                (path,),
+            )
+        finally:
+            os.remove(path)
+
+    # ---------- 变更检测：只写新增/变化的行 ----------
+    @staticmethod
+    def _inventory_row_hash(row):
+        # DECIMAL 列按 decimal_text 的规范文本参与哈希：同一个落库值无论来自 float（逐行规范化）
+        # 还是 int/定点文本（InventoryBatch），哈希都相同
+        text = "\x1f".join([*map(str, row[:9]), *map(decimal_text, row[9:])])
+        return hashlib.md5(text.encode("utf-8")).hexdigest()
+
+    def ensure_inventory_row_hash_column(self, table="inventory_fba_current"):
+        """老表补 row_hash 列（新表 DDL 已包含）；同一连接每张表只检查一次。"""
+        if table in self._row_hash_ready:
+            return
+        self.cursor.execute(
+            "SELECT COUNT(*) AS cnt FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = 'row_hash'",
+            (table,),
+        )
+        row = self.cursor.fetchone()
+        cnt = row["cnt"] if isinstance(row, dict) else row[0]
+        if not cnt:
+            self.cursor.execute(
+                f"ALTER TABLE {table} ADD COLUMN row_hash CHAR(32) NULL COMMENT '规范化行哈希（变更检测）'"
+            )
+            self.conn.commit()
+            print(f"✅ {table} 已补充 row_hash 列。")
+        self._row_hash_ready.add(table)
+
+    def _upsert_inventory_changed_only(self, params, chunk_size=500, engine="auto", table="inventory_fba_current",
+                                       writers=1):
+        """
+        对比库里已有的 row_hash：新增/变化的行走 UPSERT（连同新哈希），
+        未变化的行只用一条 UPDATE ... WHERE id IN (...) 刷新 pulled_at（updated_at 保持不变）。
+        """
+        self.ensure_inventory_row_hash_column(table)
+
+        # 1) 读出本批各键的已有哈希
+        existing = self._with_reconnect(lambda: self._load_inventory_hashes(table, params))
+
+        # 2) 分出变化/未变化
+        changed, unchanged_ids = [], []
+        for p in params:
+            h = self._inventory_row_hash(p)
+            hit = existing.get((p[2], p[3], p[7]))
+            if hit and hit[1] == h:
+                unchanged_ids.append(hit[0])
             else:
-                # 普通仓或没有子项
-                sid = _i(r.get("sid"))
-                if not sid:
-                    continue
-                params.append((
-                    _s(source_system, True),
-                    _s(platform, True),
-                    sid,
-                    _s(seller_sku, True),
-                    sku,
-                    asin,
-                    wh_name,
-                    fc or "amazon_na",
-                    share_type,
-                    total,
-                    available_total,
-                    reserved_fc_transfers,
-                    reserved_fc_processing,
-                    reserved_customerorders,
-                    reserved_total,
-                    unsellable,
-                    in_working,
-                    in_shipped,
-                    in_receiving,
-                    stock_up,
-                    inbound_total
-                ))
+                changed.append(p + (h,))
 
-        if not params:
-            print("没有可写入的库存数据。")
+        # 3) 变化的行 UPSERT；未变化的行只刷新 pulled_at
+        total_affected = 0
+        if changed:
+            total_affected = self._write_inventory_chunked(table, changed, ("row_hash",), chunk_size, engine, writers)
+
+        def _touch(part):
+            self.cursor.execute(
+                f"UPDATE {table} SET pulled_at = NOW(), updated_at = updated_at "
+                f"WHERE id IN ({', '.join(['%s'] * len(part))})",
+                part,
+            )
             return 0
 
-        total_affected = 0
-        for i in range(0, len(params), chunk_size):
-            batch = params[i:i + chunk_size]
-            self.cursor.executemany(sql, batch)
-            total_affected += self.cursor.rowcount
-        self.conn.commit()
-        print(f"✅ 库存 UPSERT 完成（受影响行数={total_affected}）。")
+        self._run_chunks(f"{table}.pulled_at",
+                         [unchanged_ids[i:i + 5000] for i in range(0, len(unchanged_ids), 5000)], _touch)
+        print(f"✅ 库存变更写入完成：变化/新增 {len(changed)} 行（受影响行数={total_affected}），"
+              f"未变化 {len(unchanged_ids)} 行仅刷新 pulled_at。")
         return total_affected
+
+    def _load_inventory_hashes(self, table, params):
+        """
+        {(sid, seller_sku, fulfillment_channel): (id, row_hash)}，只查本批出现的键
+        （行构造器 IN 走唯一键 uk_src_sid_sku_chan 的范围扫描，不会把整个 sid 的行都读回来）。
+        """
+        source_system = params[0][0]
+        keys = sorted({(p[2], p[3], p[7]) for p in params})
+        existing = {}
+        for i in range(0, len(keys), 1000):
+            part = keys[i:i + 1000]
+            self.cursor.execute(
+                f"SELECT id, sid, seller_sku, fulfillment_channel, row_hash FROM {table} "
+                f"WHERE source_system = %s AND (sid, seller_sku, fulfillment_channel) IN "
+                f"({', '.join(['(%s, %s, %s)'] * len(part))})",
+                [source_system] + [v for k in part for v in k],
+            )
+            for r in self.cursor.fetchall():
+                existing[(r["sid"], r["seller_sku"], r["fulfillment_channel"])] = (r["id"], r["row_hash"])
+        return existing
+
+    # ---------- 快照模式：整表装进影子表，RENAME TABLE 原子切换 ----------
+    INVENTORY_TABLE = "inventory_fba_current"
+    INVENTORY_SHADOW_TABLE = "inventory_fba_current_shadow"
+    INVENTORY_OLD_TABLE = "inventory_fba_current_old"
+    INVENTORY_SNAPSHOT_LOCK = "inventory_fba_current_snapshot"
+
+    def start_inventory_snapshot(self, source_system="LINGXING", lock_timeout=60):
+        """
+        开始一次全量快照：
+        - 拿 MySQL 命名锁，避免两个作业同时装同一张影子表
+        - 按 create_inventory_fba_current_table 的 DDL 新建空影子表
+        - 把其它 source_system 的行原样拷进影子表（它们不在本次拉取范围内，不能因切换而丢失）
+        返回影子表名，之后用 upsert_inventory_fba_current_from_api(..., table=影子表) 分批写入，
+        最后 swap_inventory_snapshot() 切换，出错时 abort_inventory_snapshot() 丢弃。
+        """
+        self._acquire_snapshot_lock(lock_timeout)
+
+        live, shadow = self.INVENTORY_TABLE, self.INVENTORY_SHADOW_TABLE
+        self.create_inventory_fba_current_table(live)
+        self.ensure_inventory_row_hash_column(live)
+        self.cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+        self.create_inventory_fba_current_table(shadow)
+        self._row_hash_ready.add(shadow)
+
+        cols = ", ".join(INVENTORY_COLUMNS + ("row_hash", "pulled_at", "updated_at"))
+        self.cursor.execute(
+            f"INSERT INTO {shadow} ({cols}) SELECT {cols} FROM {live} WHERE source_system <> %s",
+            (str(source_system).strip().lower(),),
+        )
+        kept = self.cursor.rowcount
+        self.conn.commit()
+        print(f"✅ 库存快照开始：影子表 {shadow} 已就绪（保留其它来源 {kept} 行）。")
+        return shadow
+
+    def swap_inventory_snapshot(self):
+        """
+        影子表装载完毕后原子切换：
+        - 内容没变的行沿用旧表的 updated_at（按 row_hash 比对）
+        - RENAME TABLE live→old, shadow→live 一条语句完成，读者要么看到旧表要么看到新表
+        - 旧表直接 DROP（上游已消失的 SKU 随之删除）
+        """
+        live, shadow, old = self.INVENTORY_TABLE, self.INVENTORY_SHADOW_TABLE, self.INVENTORY_OLD_TABLE
+        try:
+            self.cursor.execute(
+                f"UPDATE {shadow} s JOIN {live} l "
+                "ON s.source_system = l.source_system AND s.sid = l.sid "
+                "AND s.seller_sku = l.seller_sku AND s.fulfillment_channel = l.fulfillment_channel "
+                "SET s.updated_at = l.updated_at WHERE s.row_hash = l.row_hash"
+            )
+            self.conn.commit()
+            self.cursor.execute(f"DROP TABLE IF EXISTS {old}")
+            self.cursor.execute(f"RENAME TABLE {live} TO {old}, {shadow} TO {live}")
+            self.cursor.execute(f"DROP TABLE {old}")
+            print(f"✅ 库存快照已切换：{shadow} → {live}。")
+        finally:
+            self._release_inventory_snapshot_lock()
+
+    def abort_inventory_snapshot(self):
+        """丢弃影子表（线上表保持不变）。"""
+        try:
+            self.conn.rollback()
+            self.cursor.execute(f"DROP TABLE IF EXISTS {self.INVENTORY_SHADOW_TABLE}")
+            print(f"⚠️ 库存快照已放弃，{self.INVENTORY_TABLE} 未改动。")
+        finally:
+            self._release_inventory_snapshot_lock()
+
+    def _acquire_snapshot_lock(self, lock_timeout=60):
+        self.cursor.execute("SELECT GET_LOCK(%s, %s) AS ok", (self.INVENTORY_SNAPSHOT_LOCK, lock_timeout))
+        row = self.cursor.fetchone()
+        if not (row["ok"] if isinstance(row, dict) else row[0]):
+            raise Exception("库存快照正被其它作业执行（获取命名锁超时）")
+        self._snapshot_locked = True
+
+    def _release_inventory_snapshot_lock(self):
+        self._snapshot_locked = False
+        self.cursor.execute("SELECT RELEASE_LOCK(%s)", (self.INVENTORY_SNAPSHOT_LOCK,))
+        self.cursor.fetchall()
+
+    def replace_inventory_fba_current_snapshot(self, rows, source_system="LINGXING", platform="AMAZON",
+                                               chunk_size=500, engine="auto", writers=1):
+        """
+        一次性快照：把完整的一次拉取写进影子表再原子切换，本来源下没出现在 rows 里的行随之删除。
+        rows 为空时不切换（避免上游异常时清空线上表）。
+        """
+        params = self._normalize_inventory(rows, source_system, platform)
+        if not params:
+            print("没有可写入的库存数据，快照不切换。")
+            return 0
+        shadow = self.start_inventory_snapshot(source_system)
+        try:
+            hashed = [p + (self._inventory_row_hash(p),) for p in params]
+            affected = self._write_inventory_chunked(shadow, hashed, ("row_hash",), chunk_size, engine, writers)
+        except Exception:
+            self.abort_inventory_snapshot()
+            raise
+        self.swap_inventory_snapshot()
+        return affected
+
+
+# inventory_fba_current 的写入列（顺序与 normalize_inventory_rows 产出的元组一致）
+INVENTORY_COLUMNS = INVENTORY_FIELDS
+# 唯一键 uk_src_sid_sku_chan 的列（UPDATE 子句里不更新）
+INVENTORY_KEY_COLUMNS = ("source_system", "sid", "seller_sku", "fulfillment_channel")
+_INVENTORY_KEY = itemgetter(*(INVENTORY_COLUMNS.index(c) for c in INVENTORY_KEY_COLUMNS))
+
+
+def _sort_inventory_params(params):
+    """按唯一键 (source_system, sid, seller_sku, fulfillment_channel) 稳定排序。"""
+    if isinstance(params, InventoryBatch):
+        return params.sorted_by_key()
+    return sorted(params, key=_INVENTORY_KEY)
+
+
+def _key_chunk_ranges(params, chunk_size):
+    """已按键排序的参数切成约 chunk_size 行的下标区间；块边界后移，保证同键的行落在同一块。"""
+    n, start, ranges = len(params), 0, []
+    while start < n:
+        stop = min(start + chunk_size, n)
+        if stop < n:
+            key = _INVENTORY_KEY(params[stop - 1])
+            while stop < n and _INVENTORY_KEY(params[stop]) == key:
+                stop += 1
+        ranges.append(range(start, stop))
+        start = stop
+    return ranges
+
+
+def inventory_upsert_sql(table="inventory_fba_current", extra_columns=()):
+    """INSERT ... ON DUPLICATE KEY UPDATE 语句；extra_columns 追加在 INVENTORY_COLUMNS 之后（如 row_hash）。"""
+    cols = INVENTORY_COLUMNS + tuple(extra_columns)
+    updates = [f"{c} = VALUES({c})" for c in cols if c not in INVENTORY_KEY_COLUMNS and c != "platform"]
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}, pulled_at) "
+        f"VALUES ({', '.join(['%s'] * len(cols))}, NOW()) "
+        f"ON DUPLICATE KEY UPDATE {', '.join(updates)}, pulled_at = NOW(), updated_at = NOW()"
+    )
+
+
+def inventory_merge_sql(table="inventory_fba_current", stage="inventory_fba_stage", extra_columns=()):
+    """把暂存表整体合并进目标表的 INSERT ... SELECT ... ON DUPLICATE KEY UPDATE。"""
+    cols = INVENTORY_COLUMNS + tuple(extra_columns)
+    updates = [f"{c} = VALUES({c})" for c in cols if c not in INVENTORY_KEY_COLUMNS and c != "platform"]
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}, pulled_at) "
+        f"SELECT {', '.join(cols)}, NOW() FROM {stage} ORDER BY seq "
+        f"ON DUPLICATE KEY UPDATE {', '.join(updates)}, pulled_at = NOW(), updated_at = NOW()"
+    )
+
+
+def _tsv_field(v):
+    """LOAD DATA 默认转义规则下的一个字段：None → \\N，反斜杠/制表符/换行转义。"""
+    if v is None:
+        return "\\N"
+    s = str(v)
+    if "\\" in s or "\t" in s or "\n" in s or "\r" in s:
+        s = s.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    return s
@@ -1,10 +1,16 @@
 import pymysql
 from pymysql.cursors import DictCursor
 
+from db_pool import get_pool
+
 
 #数据库配置文件
 
 class DatabaseManager:
+    # 同一配置的 DatabaseManager 共用一个模块级连接池，with 块不再每次重新握手
+    POOL_MAX_SIZE = 5
+    POOL_IDLE_TIMEOUT = 300
+
     def __init__(self):
         self.config = {
             'host': 'localhost',
@@ -15,16 +21,27 @@ class DatabaseManager:
             'cursorclass': DictCursor
         }
         self.conn = None
+        self.cursor = None
 
     def __enter__(self):
-        """ 上下文管理器入口 """
-        self.conn = pymysql.connect(**self.config)
-        return self.conn.cursor()
+        """ 上下文管理器入口：从连接池借连接 """
+        self.pool = get_pool(self.config, max_size=self.POOL_MAX_SIZE, idle_timeout=self.POOL_IDLE_TIMEOUT)
+        self.conn = self.pool.acquire()
+        self.cursor = self.conn.cursor()
+        return self.cursor
 
     def __exit__(self, exc_type, exc_val, exc_tb):
-        """ 上下文管理器退出时自动提交/回滚并关闭连接 """
-        if exc_type:  # 发生异常时回滚
-            self.conn.rollback()
-        else:        # 无异常则提交
-            self.conn.commit()
-        self.conn.close()
\ No newline at end of file
+        """ 上下文管理器退出时自动提交/回滚，并把连接还给连接池 """
+        broken = False
+        try:
+            if exc_type:  # 发生异常时回滚
+                self.conn.rollback()
+            else:        # 无异常则提交
+                self.conn.commit()
+        except pymysql.err.Error:
+            broken = True
+            raise
+        finally:
+            self.cursor.close()
+            self.pool.release(self.conn, discard=broken)
+            self.conn = None
@@ -0,0 +1,154 @@
+# fetch_checkpoints.py
+"""
+拉取断点（本地文件）：长时间的拉取中途失败后，下次从断点继续，而不是从头再来。
+文件都用"写临时文件 + os.replace"原子替换，进程中途被杀也不会留下半个文件。
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import json_codec
+
+
+def scope_key(**scope: Any) -> str:
+    """把一次拉取的范围（接口、筛选条件等）压成短哈希；范围变了，旧断点就不再适用。"""
+    raw = json.dumps(scope, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.md5(raw.encode("utf-8")).hexdigest()
+
+
+def _write_json(path: Path, data: Any) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(json_codec.dumps_bytes(data))
+    os.replace(tmp, path)
+
+
+class PartitionCheckpoint:
+    """
+    按 sid 分片拉取的断点：记下已经拉完并写库的分片。
+    - scope 与文件里记录的不一致（换了筛选条件/店铺集合）时视为没有断点
+    - 全部分片成功后 clear() 删除文件，下次从头开始
+    """
+
+    def __init__(self, path, scope: str):
+        self.path = Path(path)
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._done: Set[int] = set()
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("scope") == scope:
+                self._done = {int(s) for s in data.get("done", [])}
+        except (OSError, ValueError):
+            pass
+
+    @property
+    def done(self) -> Set[int]:
+        return set(self._done)
+
+    def mark_done(self, sids: Iterable[int]) -> None:
+        with self._lock:
+            self._done.update(int(s) for s in sids)
+            _write_json(self.path, {"scope": self.scope, "done": sorted(self._done)})
+
+    def clear(self) -> None:
+        with self._lock:
+            self._done.clear()
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class PageCheckpoint:
+    """
+    分页拉取的逐页断点：每拉完一页就把该页数据写进 root/<scope>/ 下的一个文件，
+    再更新 cursor.json（下一页从哪里开始、这次拉取从什么时候开始）。
+    - 页文件先写、游标后写：游标指向的页之前的数据一定都在盘上
+    - 续拉时先交出已落盘的页，再从游标处继续
+    - 全部拉完后 finish() 删掉整个目录
+    - max_age（秒）：断点里最早的页超过这个时间就不再续拉（旧数据不能当作本次的库存），
+      读取时直接删掉，从头开始
+    key 是分页位置（FBA 库存用 offset，店铺列表用 page 页码）。
+    """
+
+    def __init__(self, root, scope: str, max_age: Optional[float] = None):
+        self.dir = Path(root) / scope
+        self.cursor_file = self.dir / "cursor.json"
+        self.max_age = max_age
+        self._started_at: Optional[float] = None
+
+    def next_key(self) -> Optional[int]:
+        """游标记录的下一页位置；没有断点（或断点已过期被丢弃）时返回 None。"""
+        cursor = _read_cursor(self.cursor_file)
+        if cursor is None:
+            return None
+        started_at = float(cursor.get("started_at", 0))
+        if self.max_age is not None and time.time() - started_at > self.max_age:
+            print(f"⚠️ 断点 {self.dir.name} 已超过 {self.max_age / 3600:.1f} 小时，丢弃后从头拉取")
+            self.finish()
+            return None
+        self._started_at = started_at
+        return int(cursor["next"])
+
+    def pages(self) -> Iterator[Tuple[int, List[Dict[str, Any]]]]:
+        """按位置顺序读出游标之前已落盘的页。"""
+        nxt = self.next_key()
+        if nxt is None:
+            return
+        keys = sorted(int(p.stem[len("page_"):]) for p in self.dir.glob("page_*.json"))
+        for key in keys:
+            if key >= nxt:  # 游标还没推进到的页（写页后、写游标前中断）不算数
+                break
+            with open(self.dir / f"page_{key:010d}.json", "rb") as f:
+                yield key, json_codec.loads(f.read())
+
+    def save_page(self, key: int, rows: List[Dict[str, Any]], next_key: int) -> None:
+        if self._started_at is None:
+            self._started_at = time.time()
+        _write_json(self.dir / f"page_{key:010d}.json", rows)
+        _write_json(self.cursor_file, {"next": next_key, "started_at": self._started_at})
+
+    def finish(self) -> None:
+        shutil.rmtree(self.dir, ignore_errors=True)
+        self._started_at = None
+
+
+def _read_cursor(path: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            cursor = json.load(f)
+        int(cursor["next"])
+        return cursor
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+
+
+def prune_page_checkpoints(root, max_age: float) -> int:
+    """
+    删掉 root 下开始时间超过 max_age 的断点目录（换了筛选条件/sid 分片后再也不会续拉的旧断点），
+    没有游标的目录按目录修改时间算。返回删除的个数。
+    """
+    root = Path(root)
+    if not root.is_dir():
+        return 0
+    now, removed = time.time(), 0
+    for d in root.iterdir():
+        if not d.is_dir():
+            continue
+        cursor = _read_cursor(d / "cursor.json")
+        try:
+            started_at = float(cursor["started_at"]) if cursor and "started_at" in cursor else d.stat().st_mtime
+        except (OSError, ValueError, TypeError):
+            continue
+        if now - started_at > max_age:
+            shutil.rmtree(d, ignore_errors=True)
+            removed += 1
+    return removed
@@ -1,11 +1,16 @@
 # http_retry.py
+import asyncio
+import math
 import time
 import threading
-from typing import Any, Dict, Optional, Union
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple, Union
 import requests
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+import json_codec
+
 class SimpleRateLimiter:
     """非常轻量：保证两次请求至少间隔 min_interval 秒。"""
     def __init__(self, min_interval: float = 0.2):
@@ -13,7 +18,8 @@ class SimpleRateLimiter:
         self._lock = threading.Lock()
         self._last = 0.0
 
-    def wait(self):
+    def wait(self, key: Optional[str] = None):
+        """key 仅为与 EndpointRateLimiter 接口兼容，这里忽略。"""
         with self._lock:
             now = time.time()
             delta = now - self._last
@@ -21,13 +27,257 @@ class SimpleRateLimiter:
                 time.sleep(self.min_interval - delta)
             self._last = time.time()
 
+class TokenBucketLimiter:
+    """
+    令牌桶：每秒补充 rate 个令牌，最多攒 burst 个（允许突发）。
+    取令牌时先在锁内“预约”（令牌可透支为负数），再在锁外 sleep 到轮到自己，
+    所以多个线程等待时不会互相卡在锁上；同时提供 asyncio 版本 acquire()。
+    """
+    def __init__(self, rate: float = 5.0, burst: int = 5):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = float(rate)
+        self.burst = max(1, int(burst))
+        self._lock = threading.Lock()
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _reserve(self, n: float = 1.0) -> float:
+        """预约 n 个令牌，返回需要等待的秒数（0 表示立刻可用）。"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens -= n
+            if self._tokens >= 0:
+                return 0.0
+            return -self._tokens / self.rate
+
+    def set_rate(self, rate: float) -> None:
+        """运行中调整速率（已攒的令牌保留）。"""
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = float(rate)
+
+    def wait(self, key: Optional[str] = None) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire(self, key: Optional[str] = None) -> None:
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class EndpointRateLimiter:
+    """
+    按接口路径分别限流：每个 key（如 /erp/sc/data/seller/lists）一个独立令牌桶，
+    不同接口的配额互不占用。budgets 形如 {path: (rate, burst)}，未配置的 key 用默认值。
+    """
+    def __init__(
+        self,
+        rate: float = 5.0,
+        burst: int = 5,
+        budgets: Optional[Dict[str, Tuple[float, int]]] = None,
+    ):
+        self.rate = float(rate)
+        self.burst = int(burst)
+        self.budgets = dict(budgets or {})
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, TokenBucketLimiter] = {}
+
+    def bucket(self, key: Optional[str] = None) -> TokenBucketLimiter:
+        key = key or ""
+        with self._lock:
+            b = self._buckets.get(key)
+            if b is None:
+                rate, burst = self.budgets.get(key, (self.rate, self.burst))
+                b = self._buckets[key] = TokenBucketLimiter(rate=rate, burst=burst)
+            return b
+
+    def wait(self, key: Optional[str] = None) -> None:
+        self.bucket(key).wait()
+
+    async def acquire(self, key: Optional[str] = None) -> None:
+        await self.bucket(key).acquire()
+
+
+class AdaptiveConcurrencyController:
+    """
+    AIMD 自适应并发/速率控制：
+    - 连续 success_window 次健康响应 → 并发 +increase_step、速率 +rate_step（加性增）
+    - 429 / 5xx / 连接错误 / 延迟超过基线 latency_factor 倍 → 并发、速率乘以 decrease_factor（乘性减）
+    - 有 Retry-After 时，在该时间内暂停发放新的请求槽位
+    并发由 slot() 控制在途请求数；若传入 limiter（令牌桶），速率变化会同步到 limiter.set_rate()。
+    snapshot() 返回当前状态，便于打印/监控。
+    """
+    def __init__(
+        self,
+        initial_concurrency: int = 2,
+        min_concurrency: int = 1,
+        max_concurrency: int = 16,
+        initial_rate: float = 5.0,
+        min_rate: float = 0.5,
+        max_rate: float = 50.0,
+        increase_step: int = 1,
+        rate_step: float = 0.5,
+        decrease_factor: float = 0.5,
+        success_window: int = 10,
+        latency_factor: float = 3.0,
+        min_decrease_interval: float = 1.0,
+        limiter: Optional[TokenBucketLimiter] = None,
+    ):
+        self.min_concurrency = max(1, int(min_concurrency))
+        self.max_concurrency = max(self.min_concurrency, int(max_concurrency))
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self.increase_step = int(increase_step)
+        self.rate_step = float(rate_step)
+        self.decrease_factor = float(decrease_factor)
+        self.success_window = max(1, int(success_window))
+        self.latency_factor = float(latency_factor)
+        self.min_decrease_interval = float(min_decrease_interval)
+        self.limiter = limiter
+
+        self._cond = threading.Condition()
+        self._concurrency = min(self.max_concurrency, max(self.min_concurrency, int(initial_concurrency)))
+        self._rate = min(self.max_rate, max(self.min_rate, float(initial_rate)))
+        self._in_flight = 0
+        self._streak = 0
+        self._latency_ewma: Optional[float] = None
+        self._latency_base: Optional[float] = None
+        self._last_decrease = 0.0
+        self._pause_until = 0.0
+        self._stats = {"ok": 0, "throttled": 0, "errors": 0, "increases": 0, "decreases": 0}
+        if self.limiter is not None:
+            self.limiter.set_rate(self._rate)
+
+    @property
+    def concurrency(self) -> int:
+        return self._concurrency
+
+    @property
+    def rate(self) -> float:
+        return self._rate
+
+    # ---------- 在途请求槽位 ----------
+    @contextmanager
+    def slot(self):
+        with self._cond:
+            while True:
+                pause = self._pause_until - time.monotonic()
+                if pause > 0:
+                    self._cond.wait(pause)
+                elif self._in_flight >= self._concurrency:
+                    self._cond.wait()
+                else:
+                    break
+            self._in_flight += 1
+        try:
+            if self.limiter is not None:
+                self.limiter.wait()
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    # ---------- 反馈 ----------
+    def record(self, status_code: Optional[int], latency: Optional[float] = None,
+               retry_after: Optional[float] = None) -> None:
+        """按响应状态码/耗时调整；status_code=None 视为连接错误。"""
+        throttled = status_code is None or status_code == 429 or status_code >= 500
+        with self._cond:
+            if throttled:
+                self._stats["errors" if status_code is None else "throttled"] += 1
+                if retry_after:
+                    self._pause_until = max(self._pause_until, time.monotonic() + float(retry_after))
+                self._decrease()
+                return
+
+            self._stats["ok"] += 1
+            if latency is not None:
+                self._latency_ewma = latency if self._latency_ewma is None else 0.8 * self._latency_ewma + 0.2 * latency
+                self._latency_base = self._latency_ewma if self._latency_base is None \
+                    else min(self._latency_base, self._latency_ewma)
+                if self._latency_ewma > self._latency_base * self.latency_factor:
+                    self._decrease()
+                    return
+
+            self._streak += 1
+            if self._streak >= self.success_window:
+                self._streak = 0
+                self._increase()
+
+    def _increase(self) -> None:
+        concurrency = min(self.max_concurrency, self._concurrency + self.increase_step)
+        rate = min(self.max_rate, self._rate + self.rate_step)
+        if (concurrency, rate) != (self._concurrency, self._rate):
+            self._stats["increases"] += 1
+            self._apply(concurrency, rate)
+
+    def _decrease(self) -> None:
+        self._streak = 0
+        now = time.monotonic()
+        # 同一波限流只回退一次，避免并发中的多个 429 把并发直接打到底
+        if now - self._last_decrease < self.min_decrease_interval:
+            return
+        self._last_decrease = now
+        concurrency = max(self.min_concurrency, int(math.floor(self._concurrency * self.decrease_factor)))
+        rate = max(self.min_rate, self._rate * self.decrease_factor)
+        self._stats["decreases"] += 1
+        # 重新学习延迟基线（负载变化后旧基线不再可靠）
+        self._latency_base = self._latency_ewma
+        self._apply(concurrency, rate)
+
+    def _apply(self, concurrency: int, rate: float) -> None:
+        self._concurrency = concurrency
+        self._rate = rate
+        if self.limiter is not None:
+            self.limiter.set_rate(rate)
+        self._cond.notify_all()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "concurrency": self._concurrency,
+                "rate": round(self._rate, 3),
+                "in_flight": self._in_flight,
+                "latency_ewma": None if self._latency_ewma is None else round(self._latency_ewma, 4),
+                "latency_base": None if self._latency_base is None else round(self._latency_base, 4),
+                "paused_for": max(0.0, round(self._pause_until - time.monotonic(), 3)),
+                **self._stats,
+            }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """解析 Retry-After 头（秒数或 HTTP 日期），无法解析返回 None。"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        from email.utils import parsedate_to_datetime
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
 def build_resilient_session(
     total_retries: int = 5,
     backoff_factor: float = 0.5,
     status_forcelist: Optional[list[int]] = None,
     allowed_methods: Optional[list[str]] = None,
+    pool_maxsize: int = 10,
 ) -> requests.Session:
-    """返回带自动重试的 Session，对 429/5xx 等状态码做指数退避。"""
+    """返回带自动重试的 Session，对 429/5xx 等状态码做指数退避；pool_maxsize 为每个 host 的长连接池大小。"""
     if status_forcelist is None:
         status_forcelist = [429, 500, 502, 503, 504]
     if allowed_methods is None:
@@ -45,7 +295,7 @@ def build_resilient_session(
         raise_on_status=False,   # 不在 urllib3 层抛异常，交给 requests.raise_for_status()
         respect_retry_after_header=True,
     )
-    adapter = HTTPAdapter(max_retries=retry)
+    adapter = HTTPAdapter(max_retries=retry, pool_connections=pool_maxsize, pool_maxsize=pool_maxsize)
     sess.mount("http://", adapter)
     sess.mount("https://", adapter)
     return sess
@@ -65,7 +315,7 @@ def request_json(
     timeout: tuple[float, float] = (3.0, 10.0),  # (连接超时, 读取超时)
     use_rate_limit: bool = True,
 ) -> Dict[str, Any]:
-    """带超时/重试/限流的统一请求入口，返回 .json() 解析后的字典。"""
+    """带超时/重试/限流的统一请求入口，返回解析后的字典（json_codec 直接解析响应 bytes）。"""
     if use_rate_limit:
         rate_limiter.wait()
     resp = session.request(
@@ -81,6 +331,6 @@ def request_json(
     resp.raise_for_status()
     # 尝试 JSON 解析
     try:
-        return resp.json()
+        return json_codec.response_json(resp)
     except ValueError as e:
         raise RuntimeError(f"响应非 JSON 或解析失败: {e}; text={resp.text[:500]!r}")
@@ -44,8 +44,16 @@ class IngestionRunsRepo:
           (job_name, started_at, ended_at, success_count, fail_count, note)
         VALUES (%s, %s, %s, %s, %s, %s)
         """
-        self.db.cursor.execute(sql, (
-            run.job_name, run.started_at, run.ended_at,
-            run.success_count, run.fail_count, run.note
-        ))
-        self.db.conn.commit()
+        def _insert():
+            self.db.cursor.execute(sql, (
+                run.job_name, run.started_at, run.ended_at,
+                run.success_count, run.fail_count, run.note
+            ))
+            self.db.conn.commit()
+
+        # 作业可能正是因为断线而失败的：运行记录（含已提交进度）尽量在重连后写进去
+        with_reconnect = getattr(self.db, "_with_reconnect", None)
+        if with_reconnect is not None:
+            with_reconnect(_insert)
+        else:
+            _insert()
@@ -0,0 +1,369 @@
+# inventory_rows.py
+"""
+库存行规范化：
+- normalize_inventory_rows：接口原始行 → INVENTORY_FIELDS 顺序的元组列表（逐行循环），
+  可直接交给 executemany 或 LOAD DATA 引擎
+- InventoryBatch：同样的记录按列紧凑存放，跨线程/跨批次传递时省内存
+"""
+import operator
+from array import array
+from collections import namedtuple
+from decimal import ROUND_HALF_UP, Decimal
+from itertools import compress, repeat
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+# 规范化后每行元组的字段顺序（即 inventory_fba_current 的写入列）
+INVENTORY_FIELDS = (
+    "source_system", "platform", "sid", "seller_sku", "sku", "asin",
+    "warehouse_name", "fulfillment_channel", "share_type",
+    "total", "available_total",
+    "reserved_fc_transfers", "reserved_fc_processing", "reserved_customerorders", "reserved_total",
+    "afn_unsellable_quantity",
+    "afn_inbound_working_quantity", "afn_inbound_shipped_quantity",
+    "afn_inbound_receiving_quantity", "stock_up_num", "inbound_total",
+)
+
+
+def _s(v, lower=False):
+    if v is None: return ""
+    s = str(v).strip()
+    return s.lower() if lower else s
+
+
+def _f(v):
+    try:
+        return float(v)
+    except Exception:
+        return 0.0
+
+
+def _i(v):
+    try:
+        return int(v)
+    except Exception:
+        return 0
+
+
+def normalize_inventory_rows(rows, source_system="LINGXING", platform="AMAZON"):
+    """
+    把接口返回的库存行规范化为 INVENTORY_COLUMNS 顺序的元组列表：
+    - 缺 seller_sku / sid 的行跳过
+    - 共享仓：若 share_type in (1,2) 且有 fba_storage_quantity_list，则按子项展开
+    """
+    params = []
+
+    for r in rows:
+        seller_sku = r.get("seller_sku")
+        if not seller_sku:
+            continue
+
+        share_type = _i(r.get("share_type"))
+        fc = _s(r.get("fulfillment_channel"), True)
+        sku = _s(r.get("sku"), True) or None
+        asin = _s(r.get("asin"), True) or None
+        wh_name = _s(r.get("name"))
+
+        # 共有数值
+        total = _f(r.get("total"))
+        available_total = _f(r.get("available_total"))
+        reserved_fc_transfers = _f(r.get("reserved_fc_transfers"))
+        reserved_fc_processing = _f(r.get("reserved_fc_processing"))
+        reserved_customerorders = _f(r.get("reserved_customerorders"))
+        reserved_total = reserved_fc_transfers + reserved_fc_processing + reserved_customerorders
+
+        unsellable = _f(r.get("afn_unsellable_quantity"))
+
+        in_working = _f(r.get("afn_inbound_working_quantity"))
+        in_shipped = _f(r.get("afn_inbound_shipped_quantity"))
+        in_receiving = _f(r.get("afn_inbound_receiving_quantity"))
+        stock_up = _f(r.get("stock_up_num"))
+        inbound_total = in_working + in_shipped + in_receiving + stock_up
+
+        # 共享仓子项展开
+        sub_list = r.get("fba_storage_quantity_list") or []
+        if share_type in (1, 2) and sub_list:
+            # 父项通常 sid=0，这里跳过父项
+            for sub in sub_list:
+                sid = _i(sub.get("sid"))
+                if not sid:
+                    continue
+                sub_wh_name = _s(sub.get("name")) or wh_name
+                q_local = _f(sub.get("quantity_for_local_fulfillment"))
+
+                params.append((
+                    _s(source_system, True),
+                    _s(platform, True),
+                    sid,
+                    _s(seller_sku, True),
+                    sku,
+                    asin,
+                    sub_wh_name,
+                    fc or "amazon_eu",
+                    share_type,
+                    q_local,  # total：对子项未知，取本地可售近似
+                    q_local,  # available_total：子项可售
+                    0, 0, 0, 0,  # reserved_* 置 0（无法拆分）
+                    0,  # 不可售置 0
+                    0, 0, 0, 0, 0  # 入库相关置 0（无法拆分）
+                ))
+        else:
+            # 普通仓或没有子项
+            sid = _i(r.get("sid"))
+            if not sid:
+                continue
+            params.append((
+                _s(source_system, True),
+                _s(platform, True),
+                sid,
+                _s(seller_sku, True),
+                sku,
+                asin,
+                wh_name,
+                fc or "amazon_na",
+                share_type,
+                total,
+                available_total,
+                reserved_fc_transfers,
+                reserved_fc_processing,
+                reserved_customerorders,
+                reserved_total,
+                unsellable,
+                in_working,
+                in_shipped,
+                in_receiving,
+                stock_up,
+                inbound_total
+            ))
+    return params
+
+
+# ---------- DECIMAL(18,2) 列的规范值 ----------
+_DEC_QUANT = Decimal("0.01")
+_INF = float("inf")
+
+
+def decimal_text(v) -> str:
+    """
+    DECIMAL(18,2) 列的规范文本（行哈希、InventoryBatch 传参共用）：只取决于落库后的十进制值，
+    与传进来的是 float / int / Decimal 无关——整数值写成整数（"12"），其余两位小数（"12.50"），
+    超过两位小数时按十进制文本 ROUND_HALF_UP（与 MySQL 收到 repr(float) 时的舍入一致），nan/inf 记 "0"。
+    str 视为已是规范文本（InventoryBatch 产出的），原样返回。
+    """
+    t = type(v)
+    if t is float:
+        if v.is_integer():
+            return "%d" % v
+        if v != v or v in (_INF, -_INF):
+            return "0"  # DECIMAL 存不了 nan/inf，按 0 处理（与 _f 转换失败的取值一致）
+    elif t is int:
+        return "%d" % v
+    elif t is str:
+        return v
+    s = str(Decimal(repr(v) if t is float else str(v)).quantize(_DEC_QUANT, rounding=ROUND_HALF_UP))
+    if s.endswith(".00"):
+        s = s[:-3]
+    return "0" if s == "-0" else s
+
+
+def _decimal_param(v: float):
+    """DECIMAL 列的传参值：整数值直接传 int（精确，转义也比 float 快），其余传规范定点文本。"""
+    return int(v) if v.is_integer() else decimal_text(v)
+
+
+# ---------- 紧凑批次：按列存放的 inventory_fba_current 记录 ----------
+# 接口行里直接读取的数值字段（reserved_total / inbound_total 由它们相加得到）
+_API_NUMERIC_FIELDS = (
+    "total", "available_total",
+    "reserved_fc_transfers", "reserved_fc_processing", "reserved_customerorders",
+    "afn_unsellable_quantity",
+    "afn_inbound_working_quantity", "afn_inbound_shipped_quantity",
+    "afn_inbound_receiving_quantity", "stock_up_num",
+)
+
+
+def _column(rows: Sequence[Dict[str, Any]], key: str) -> List[Any]:
+    return list(map(dict.get, rows, repeat(key)))
+
+
+def _float_array(values: Sequence[Any]) -> array:
+    """整列转 array('d')（C 层循环）；有 None、文本等转不了的值时逐个按 _f 的规则转换。"""
+    try:
+        return array("d", values)
+    except (TypeError, OverflowError):
+        return array("d", map(_f, values))
+
+
+def _int_array(values: Sequence[Any]) -> array:
+    try:
+        return array("q", values)
+    except (TypeError, OverflowError):
+        return array("q", map(_i, values))
+
+
+def _str_list(values: Sequence[Any], lower: bool = False) -> List[str]:
+    """整列 strip（/lower）：全是 str 时走 map，有 None 等非 str 值时逐个按 _s 处理。"""
+    try:
+        stripped = map(str.strip, values)
+        return list(map(str.lower, stripped) if lower else stripped)
+    except TypeError:
+        return [_s(v, lower) for v in values]
+
+
+# 单行带字段名的只读视图（InventoryBatch.records() 产出）
+InventoryRecord = namedtuple("InventoryRecord", INVENTORY_FIELDS)
+
+
+class InventoryBatch:
+    """
+    inventory_fba_current 的一批规范化记录，按列存放以省内存：
+    - sid / share_type 存 array('q')
+    - 12 个 DECIMAL(18,2) 列存 array('d')（与 normalize_inventory_rows 的 float 取值相同），每值 8 字节，不再是 float 对象
+    - source_system / platform / fulfillment_channel / warehouse_name 这类高度重复的字符串做驻留，
+      每行只占一个引用
+    与 normalize_inventory_rows 的元组列表可互换使用：len()、下标、切片、迭代都产出 DB 参数元组，
+    切片只在当前分块上用 zip 临时拼出元组。DECIMAL 列传参时是精确值：整数值传 int，
+    其余传 decimal_text 的定点文本，不经过 float 的 repr；行哈希对两种来源的取值一致。
+    """
+    __slots__ = ("_str_cols", "_int_cols", "_dec_cols", "_intern")
+
+    STR_FIELDS = ("source_system", "platform", "seller_sku", "sku", "asin", "warehouse_name", "fulfillment_channel")
+    INT_FIELDS = ("sid", "share_type")
+    DECIMAL_FIELDS = INVENTORY_FIELDS[9:]
+    # 元组里各列的位置（与 INVENTORY_FIELDS 一致）
+    _STR_POS = (0, 1, 3, 4, 5, 6, 7)
+    _INT_POS = (2, 8)
+    _DEC_POS = tuple(range(9, 21))
+    _INTERNED = (0, 1, 5, 6)  # source_system / platform / warehouse_name / fulfillment_channel 在 _str_cols 中的下标
+    _ITER_CHUNK = 1000
+
+    def __init__(self):
+        self._str_cols: List[List[Any]] = [[] for _ in self.STR_FIELDS]
+        self._int_cols = [array("q") for _ in self.INT_FIELDS]
+        self._dec_cols = [array("d") for _ in self.DECIMAL_FIELDS]
+        self._intern: Dict[str, str] = {}
+
+    @classmethod
+    def from_api_rows(cls, rows: Sequence[Dict[str, Any]], source_system: str = "LINGXING",
+                      platform: str = "AMAZON", chunk: int = 1000) -> "InventoryBatch":
+        """
+        从接口原始行构建，结果与 normalize_inventory_rows 逐行一致。按 chunk 行一段：
+        普通行按列直接压进数组（dict.get 取整列、array 整列转换，只有脏值才逐个按 _f/_i/_s 转），
+        不经过中间元组；某段里有要展开的共享仓子项时，该段退回 normalize_inventory_rows 逐行处理。
+        """
+        batch = cls()
+        for i in range(0, len(rows), chunk):
+            batch._extend_api_rows(rows[i:i + chunk], source_system, platform)
+        return batch
+
+    def _extend_api_rows(self, rows: Sequence[Dict[str, Any]], source_system: str, platform: str) -> None:
+        rows = [r for r in rows if r.get("seller_sku")]
+        if not rows:
+            return
+        share_type = _int_array(_column(rows, "share_type"))
+        if (1 in share_type or 2 in share_type) and any(
+                r.get("fba_storage_quantity_list") for r, st in zip(rows, share_type) if st == 1 or st == 2):
+            self.extend(normalize_inventory_rows(rows, source_system, platform))
+            return
+
+        sid = _int_array(_column(rows, "sid"))
+        num = {k: _float_array(_column(rows, k)) for k in _API_NUMERIC_FIELDS}
+        add = operator.add
+        reserved_total = array("d", map(add, map(add, num["reserved_fc_transfers"], num["reserved_fc_processing"]),
+                                        num["reserved_customerorders"]))
+        inbound_total = array("d", map(add, map(add, map(add, num["afn_inbound_working_quantity"],
+                                                         num["afn_inbound_shipped_quantity"]),
+                                                num["afn_inbound_receiving_quantity"]), num["stock_up_num"]))
+        n = len(rows)
+        intern = self._intern.setdefault
+        src, plat = _s(source_system, True), _s(platform, True)
+        wh_name = _str_list(_column(rows, "name"))
+        str_cols = [
+            [intern(src, src)] * n,
+            [intern(plat, plat)] * n,
+            _str_list(_column(rows, "seller_sku"), lower=True),
+            [v or None for v in _str_list(_column(rows, "sku"), lower=True)],
+            [v or None for v in _str_list(_column(rows, "asin"), lower=True)],
+            list(map(intern, wh_name, wh_name)),
+            [intern(v, v) if v else "amazon_na" for v in _str_list(_column(rows, "fulfillment_channel"), lower=True)],
+        ]
+        int_cols = [sid, share_type]
+        dec_cols = [num["total"], num["available_total"],
+                    num["reserved_fc_transfers"], num["reserved_fc_processing"],
+                    num["reserved_customerorders"], reserved_total,
+                    num["afn_unsellable_quantity"],
+                    num["afn_inbound_working_quantity"], num["afn_inbound_shipped_quantity"],
+                    num["afn_inbound_receiving_quantity"], num["stock_up_num"],
+                    inbound_total]
+        if 0 in sid:  # sid 为 0 的行跳过
+            keep = list(map(bool, sid))
+            str_cols = [list(compress(c, keep)) for c in str_cols]
+            int_cols = [array("q", compress(c, keep)) for c in int_cols]
+            dec_cols = [array("d", compress(c, keep)) for c in dec_cols]
+
+        for mine, col in zip(self._str_cols, str_cols):
+            mine.extend(col)
+        for mine, col in zip(self._int_cols, int_cols):
+            mine.extend(col)
+        for mine, col in zip(self._dec_cols, dec_cols):
+            mine.extend(col)
+
+    def extend(self, records: Sequence[Tuple]) -> None:
+        """追加 INVENTORY_FIELDS 顺序的元组（normalize_inventory_rows 的输出）。"""
+        if not records:
+            return
+        cols = list(zip(*records))  # 转置成列（C 层完成），随后逐列压缩
+        intern = self._intern.setdefault
+        for j, pos in enumerate(self._STR_POS):
+            if j in self._INTERNED:
+                self._str_cols[j].extend(map(intern, cols[pos], cols[pos]))
+            else:
+                self._str_cols[j].extend(cols[pos])
+        for col, pos in zip(self._int_cols, self._INT_POS):
+            col.extend(cols[pos])
+        for col, pos in zip(self._dec_cols, self._DEC_POS):
+            col.extend(cols[pos])
+
+    def __len__(self) -> int:
+        return len(self._int_cols[0])
+
+    def _rows(self, start: int, stop: int) -> List[Tuple]:
+        s, n = [c[start:stop] for c in self._str_cols], [c[start:stop] for c in self._int_cols]
+        dec = [map(_decimal_param, c[start:stop]) for c in self._dec_cols]
+        return list(zip(s[0], s[1], n[0], s[2], s[3], s[4], s[5], s[6], n[1], *dec))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step == 1:
+                return self._rows(start, stop)
+            return [self._rows(i, i + 1)[0] for i in range(start, stop, step)]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("InventoryBatch index out of range")
+        return self._rows(index, index + 1)[0]
+
+    def __iter__(self) -> Iterator[Tuple]:
+        for i in range(0, len(self), self._ITER_CHUNK):
+            yield from self._rows(i, i + self._ITER_CHUNK)
+
+    def sorted_by_key(self) -> "InventoryBatch":
+        """按唯一键 (source_system, sid, seller_sku, fulfillment_channel) 稳定排序后的新批次（同键行保持原先后）。"""
+        s, n = self._str_cols, self._int_cols
+        order = sorted(range(len(self)), key=list(zip(s[0], n[0], s[2], s[6])).__getitem__)
+        batch = type(self)()
+        batch._intern = self._intern
+        batch._str_cols = [list(map(c.__getitem__, order)) for c in s]
+        batch._int_cols = [array("q", map(c.__getitem__, order)) for c in n]
+        batch._dec_cols = [array("d", map(c.__getitem__, order)) for c in self._dec_cols]
+        return batch
+
+    def records(self) -> Iterator[InventoryRecord]:
+        """带字段名的逐行视图（rec.seller_sku / rec.available_total …），DECIMAL 列为精确的 Decimal。"""
+        for row in self:
+            yield InventoryRecord._make(row[:9] + tuple(map(Decimal, row[9:])))
+
+    def decimal(self, field: str, i: int) -> Decimal:
+        """某行某 DECIMAL 列的精确值。"""
+        v = self._dec_cols[self.DECIMAL_FIELDS.index(field)][i]
+        return Decimal(decimal_text(v)).quantize(_DEC_QUANT)
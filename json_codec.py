@@ -0,0 +1,59 @@
+# json_codec.py
+"""
+拉取链路共用的 JSON 编解码：装了 orjson 就用它（pip install orjson），否则退回标准库 json。
+- loads() 直接吃响应的原始 bytes，不先解码成 str（也绕开 requests 在没有 charset 时的编码探测）
+- dumps() 产出紧凑的 UTF-8 文本（中文不转义，等价于 json.dumps(..., ensure_ascii=False) 去掉多余空格）；
+  orjson 不支持的类型（如 Decimal）自动退回标准库
+两种实现对同一输入解析结果一致；序列化结果的空白可能不同，语义一致。
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+_COMPACT = (",", ":")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj: Any) -> bytes:
+    """序列化为 UTF-8 bytes（写文件/压缩时省一次 encode）。"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj)
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=_COMPACT).encode("utf-8")
+
+
+def dumps(obj: Any) -> str:
+    """序列化为 str（入库的 JSON 文本列等）。"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode("utf-8")
+        except TypeError:
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=_COMPACT)
+
+
+def response_json(resp) -> Any:
+    """
+    解析 requests / httpx 响应体：直接解析 resp.content 的 bytes。
+    非 UTF-8 等 orjson 解析不了的响应，交回 resp.json() 按原来的方式处理（仍失败则照常抛 ValueError）。
+    """
+    content = getattr(resp, "content", None)  # 注入的传输层可能只提供 .json()
+    if content is None:
+        return resp.json()
+    try:
+        return loads(content)
+    except ValueError:
+        return resp.json()
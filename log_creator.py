@@ -1,5 +1,245 @@
 from db_utils_old import DatabaseManager
+import atexit
 import datetime
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+SYSTEM_LOG_SQL = """
+    INSERT INTO system_log (
+        user_id,
+        action_type,
+        action_description,
+        ip_address,
+        device_info,
+        result_status,
+        error_message
+    ) VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+# True：日志先进内存队列，由后台线程批量写库（操作本身不再等两次数据库往返）；False：同步逐条写
+ASYNC_AUDIT_LOG = True
+# 数据库不可用时日志落到 JSONL 文件，恢复后由后台线程补写；
+# 每个进程一个文件（system_log_spill.<pid>.jsonl），多个 runner 进程互不干扰
+AUDIT_SPILL_PATH = os.path.join(".cache", "system_log_spill.jsonl")
+# 补写/接管到一半的中间文件（*.replaying / *.adopt-*）超过这么多秒没动，即使进程号还在也当作遗留文件接管
+SPILL_IN_FLIGHT_GRACE = 600
+
+
+def process_spill_path(base, pid=None):
+    """base 加上进程号：.cache/system_log_spill.jsonl → .cache/system_log_spill.1234.jsonl"""
+    root, ext = os.path.splitext(base)
+    return f"{root}.{pid or os.getpid()}{ext}"
+
+
+def _pid_alive(pid):
+    if os.name != "posix":
+        return True  # Windows 上 os.kill(pid, 0) 会发 Ctrl-C，不探测，当作还活着
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        return True  # 无权探测：进程还在
+    return True
+
+
+def _insert_log_rows(rows):
+    """多行写入 system_log（pymysql 的 executemany 会把 INSERT ... VALUES 改写成一条多行 INSERT）。"""
+    with DatabaseManager() as cursor:
+        cursor.executemany(SYSTEM_LOG_SQL, rows)
+
+
+class AuditLogWriter:
+    """
+    后台批量写审计日志：
+    - log() 只把一行放进有界队列；队列满时最多阻塞 put_timeout 秒（背压），仍满则直接落盘（或丢弃并告警）
+    - 后台线程攒够 batch_size 行或距上次写入满 flush_interval 秒就写一批
+    - 写库失败时整批追加到 spill_path（JSONL），之后某批写成功时再把落盘的行补写回库
+    - flush() 等队列里已有的日志写完；close() 写完剩余日志后停止线程（进程退出时经 atexit 调用）
+    """
+
+    def __init__(self, write_batch=_insert_log_rows, max_queue=10000, batch_size=200, flush_interval=1.0,
+                 put_timeout=1.0, spill_path=None):
+        self.write_batch = write_batch
+        self.batch_size = max(1, int(batch_size))
+        self.flush_interval = float(flush_interval)
+        self.put_timeout = float(put_timeout)
+        self.spill_path = spill_path
+        self._q = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._closed = False
+        self.stats = {"queued": 0, "written": 0, "batches": 0, "spilled": 0, "replayed": 0, "dropped": 0}
+        self._thread = threading.Thread(target=self._run, name="audit-log-writer", daemon=True)
+        self._thread.start()
+
+    def log(self, row):
+        if self._closed:
+            self._write_now([row])
+            return
+        try:
+            self._q.put(row, timeout=self.put_timeout)
+            self.stats["queued"] += 1
+        except queue.Full:
+            print("⚠️ 日志队列已满，本条日志直接落盘")
+            self._spill([row])
+
+    def flush(self, timeout=None):
+        """等待调用前已入队的日志全部处理完（写库或落盘）；超时返回 False。"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._q.all_tasks_done:
+            while self._q.unfinished_tasks:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._q.all_tasks_done.wait(remaining)
+        return True
+
+    def close(self, timeout=10.0):
+        if self._closed:
+            return
+        self._closed = True
+        self._q.put(None)  # 哨兵：写完它之前的日志后线程退出
+        self._thread.join(timeout)
+
+    # ---------- 后台线程 ----------
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._write_now(batch)
+            for _ in range(len(batch) + stop):
+                self._q.task_done()
+            if stop:
+                return
+
+    def _collect(self):
+        """取一批：第一条阻塞等待，之后最多再等到 flush_interval 截止或凑满 batch_size。返回 (rows, 是否收到哨兵)。"""
+        first = self._q.get()
+        if first is None:
+            return [], True
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                row = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            if row is None:
+                return batch, True
+            batch.append(row)
+        return batch, False
+
+    def _write_now(self, rows):
+        try:
+            self.write_batch(rows)
+        except Exception as e:
+            print(f"日志记录失败（{len(rows)} 条）: {str(e)}")
+            self._spill(rows)
+            return
+        self.stats["written"] += len(rows)
+        self.stats["batches"] += 1
+        self._replay_spill()
+
+    # ---------- 落盘 / 补写 ----------
+    def _spill(self, rows, count=True):
+        if not self.spill_path:
+            self.stats["dropped"] += len(rows)
+            return
+        with self._spill_lock:
+            os.makedirs(os.path.dirname(self.spill_path) or ".", exist_ok=True)
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(list(row), ensure_ascii=False) + "\n")
+        if count:
+            self.stats["spilled"] += len(rows)
+
+    def _replay_spill(self):
+        """数据库恢复后把落盘的日志补写回库；补写失败的部分留在文件里下次再试。"""
+        if not self.spill_path or not os.path.exists(self.spill_path):
+            return
+        with self._spill_lock:
+            replaying = self.spill_path + ".replaying"
+            os.replace(self.spill_path, replaying)
+        rows = self._read_spill_file(replaying)
+        for i in range(0, len(rows), self.batch_size):
+            part = rows[i:i + self.batch_size]
+            try:
+                self.write_batch(part)
+            except Exception as e:
+                print(f"⚠️ 补写落盘日志失败，稍后再试：{e}")
+                self._spill(rows[i:], count=False)  # 只是放回文件，不重复计数
+                break
+            self.stats["replayed"] += len(part)
+        os.remove(replaying)
+
+    @staticmethod
+    def _read_spill_file(path):
+        with open(path, encoding="utf-8") as f:
+            return [tuple(json.loads(line)) for line in f if line.strip()]
+
+    def adopt_orphan_spills(self, base, grace=SPILL_IN_FLIGHT_GRACE):
+        """
+        把已退出进程留下的落盘文件（base 加进程号的那些，以及不带进程号的旧文件）并进本进程的落盘文件，
+        下次写库成功时一起补写。先 os.replace 认领再读：多个进程同时认领同一个文件时只有一个能成功。
+        进程在补写/接管途中退出时留下的 *.replaying / *.adopt-* 也一并接管：进程已退出的直接接管，
+        进程号还在的（可能被新进程复用）要超过 grace 秒没动才接管，免得抢走正在补写的文件。
+        """
+        if not self.spill_path:
+            return
+        root, ext = os.path.splitext(base)
+        own = os.path.abspath(self.spill_path)
+        candidates = [(base, None, False)]
+        candidates += [(p, p[len(root) + 1:-len(ext)], False) for p in glob.glob(f"{glob.escape(root)}.*{ext}")]
+        for suffix in (".replaying", ".adopt-*"):
+            for p in glob.glob(f"{glob.escape(root)}.*{ext}{suffix}") + glob.glob(f"{glob.escape(base)}{suffix}"):
+                owner = p[len(root) + 1:p.index(ext + ".", len(root))] if not p.startswith(base + ".") else None
+                candidates.append((p, owner, True))
+        now = time.time()
+        for path, pid, in_flight in candidates:
+            if os.path.abspath(path) == own:
+                continue
+            if pid is not None:
+                if not pid.isdigit():
+                    continue
+                if _pid_alive(int(pid)) and not (in_flight and self._idle_for(path, now) >= grace):
+                    continue
+            claimed = f"{self.spill_path}.adopt-{pid or 'legacy'}{'-inflight' if in_flight else ''}"
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                continue
+            rows = self._read_spill_file(claimed)
+            self._spill(rows, count=False)
+            os.remove(claimed)
+            print(f"⚠️ 接管已退出进程的落盘日志 {len(rows)} 条：{path}")
+
+    @staticmethod
+    def _idle_for(path, now):
+        try:
+            return now - os.path.getmtime(path)
+        except FileNotFoundError:
+            return 0
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_audit_writer():
+    """进程内共享的后台日志写入器（首次使用时创建，进程退出时写完剩余日志）。"""
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AuditLogWriter(spill_path=process_spill_path(AUDIT_SPILL_PATH))
+                _writer.adopt_orphan_spills(AUDIT_SPILL_PATH)
+                atexit.register(_writer.close)
+    return _writer
 
 
 def log_system_action(
@@ -11,7 +251,7 @@ def log_system_action(
         error_message: str = None
 ):
     """
-    记录系统操作日志
+    记录系统操作日志（ASYNC_AUDIT_LOG=True 时只入队，由后台线程批量写库）
     :param user_id: 操作用户ID
     :param action_type: 操作类型 (login/update/delete等)
     :param action_description: 操作详细描述
@@ -19,30 +259,21 @@ def log_system_action(
     :param device_info: 客户端设备信息
     :param error_message: 错误信息（操作失败时需传入）
     """
+    # 自动确定操作结果状态
+    result_status = 'failure' if error_message else 'success'
+    row = (
+        user_id,
+        action_type[:30],  # 确保不超过字段长度
+        action_description,
+        ip_address[:45],  # 符合IPv6最大长度
+        device_info[:255] if device_info else None,
+        result_status,
+        error_message
+    )
+    if ASYNC_AUDIT_LOG:
+        get_audit_writer().log(row)
+        return
     try:
-        with DatabaseManager() as cursor:
-            sql = """
-                INSERT INTO system_log (
-                    user_id,
-                    action_type,
-                    action_description,
-                    ip_address,
-                    device_info,
-                    result_status,
-                    error_message
-                ) VALUES (%s, %s, %s, %s, %s, %s, %s)
-            """
-            # 自动确定操作结果状态
-            result_status = 'failure' if error_message else 'success'
-
-            cursor.execute(sql, (
-                user_id,
-                action_type[:30],  # 确保不超过字段长度
-                action_description,
-                ip_address[:45],  # 符合IPv6最大长度
-                device_info[:255] if device_info else None,
-                result_status,
-                error_message
-            ))
+        _insert_log_rows([row])
     except Exception as e:
         print(f"日志记录失败: {str(e)}")
@@ -3,6 +3,8 @@ from datetime import datetime
 from openapi import OpenApiBase
 from db_utils import DBHelper
 from ingestion_runs_repo import IngestionRunsRepo, IngestionRun
+from pipeline import prefetch
+from page_spool import PageSpool
 
 # -------------------------- 配置信息 --------------------------
 # 领星API配置
@@ -16,8 +18,57 @@ DB_PORT = 3316             # 数据库端口（MySQL默认3306）
 DB_USER = "root"           # 数据库用户名
 DB_PASSWORD = "Win2009@"   # 数据库密码
 DB_NAME = "LXTESTN8N"      # 数据库名（已创建）
+
+# 流水线：后台最多预取几页店铺
+PREFETCH_DEPTH = 2
+# 原始接口页留存目录（gzip JSONL，一页一条，按账号分目录：SPOOL_DIR/<app_id>/stores），
+# 拉完后标记为完整运行，可用 replay.py 重放入库；None 表示不留存。超过 SPOOL_KEEP_DAYS 天的旧文件在下次运行时删除
+SPOOL_DIR = ".cache/spool"
+SPOOL_KEEP_DAYS = 7
 # -------------------------------------------------------------
 
+def sync_stores(api, db_helper):
+    """
+    店铺同步作业本体（不含连接/运行记录）：token → 逐页拉店铺 → ODS 留痕 + stores UPSERT。
+    返回 (success_count, note)；出错直接抛出。main() 与 runner.py 共用。
+    """
+    # 1) 获取 access_token（含缓存/超时/重试）
+    print("\n=== 开始获取access_token ===")
+    access_token = api.generate_access_token()
+
+    # 2) 逐页拉取店铺：后台预取下一页，当前页同时写 ODS + stores
+    print("\n=== 开始获取亚马逊店铺数据（逐页入库） ===")
+    db_helper.create_stores_table()
+    shop_count = 0
+    affected = 0            # upsert 受影响的行数
+    ods_errors = 0          # original_data 写入失败的店铺数
+    # 响应级字段按整次拉取只算一次：所有店铺共用拉取开始时刻，total 为到目前为止拉到的店铺数（而非单页条数）
+    run_response = api.build_shop_response([])
+    spool = PageSpool.for_run(SPOOL_DIR, "stores", api.app_id, keep_days=SPOOL_KEEP_DAYS) if SPOOL_DIR else None
+    for shop_list in prefetch(api.iter_amazon_shop_pages(access_token, spool=spool), depth=PREFETCH_DEPTH):
+        shop_count += len(shop_list)
+        run_response["total"] = shop_count
+
+        # 3) 原有 ODS 留痕（批量写 original_data，逐条报错不丢整批）
+        print(f"\n=== 插入 {len(shop_list)} 家店铺到 original_data（留痕） ===")
+        ods = db_helper.insert_shop_data_bulk(run_response, shop_list)
+        ods_errors += len(ods["errors"])
+
+        # 4) 规范层：批量 UPSERT（幂等）
+        print("\n=== 批量 UPSERT 到 stores（幂等） ===")
+        affected += db_helper.upsert_stores_from_api(
+            shop_list,
+            source_system="LINGXING",
+            platform="AMAZON"
+        )
+    if spool is not None:
+        spool.mark_complete()  # 整次拉完才标记完整，replay.py 默认只重放完整运行
+    print(f"✅ 拉到店铺数：{shop_count}")
+    print(f"✅ stores UPSERT 受影响行数 = {affected}")
+
+    print("\n✅ ODS + DIM 两条支线完成！")
+    return shop_count, f"shops={shop_count}; affected={affected}; ods_errors={ods_errors}"
+
 def main():
     JOB_NAME = "sync_stores_from_lingxing"
 
@@ -28,52 +79,27 @@ def main():
     # 运行记录字段（异常也有值）
     started_at = datetime.now()
     ended_at = started_at
-    affected = 0            # upsert 受影响的行数
     note = None
-    success_count = 0       # 这里用 affected 作为成功数
+    success_count = 0       # 这里用店铺数作为成功数
     fail_count = 0
 
     try:
         # 2) 建立数据库连接
         db_helper.connect()
 
-        # 3) 获取 access_token（含缓存/超时/重试）
-        print("\n=== 开始获取access_token ===")
-        access_token = api.generate_access_token()
-
-        # 4) 拉取店铺完整响应
-        print("\n=== 开始获取亚马逊店铺数据 ===")
-        full_response = api.fetch_amazon_shop_data(access_token)
-        shop_list = full_response.get("data", [])
-        print(f"✅ 拉到店铺数：{len(shop_list)}")
-
-        # 5) 原有 ODS 留痕（逐条写 original_data）
-        print(f"\n=== 插入 {len(shop_list)} 家店铺到 original_data（留痕） ===")
-        for shop in shop_list:
-            db_helper.insert_shop_data(full_response, shop)
-
-        # 6) 规范层：建表（幂等）+ 批量 UPSERT（幂等）
-        db_helper.create_stores_table()
-        print("\n=== 批量 UPSERT 到 stores（幂等） ===")
-        affected = db_helper.upsert_stores_from_api(
-            shop_list,
-            source_system="LINGXING",
-            platform="AMAZON"
-        )
-        print(f"✅ stores UPSERT 受影响行数 = {affected}")
-
-        success_count = len(shop_list)
-        note = f"shops={len(shop_list)}; affected={affected}"
-        print("\n✅ ODS + DIM 两条支线完成！")
+        # 3) 拉店铺 → ODS 留痕 + stores UPSERT
+        success_count, note = sync_stores(api, db_helper)
 
     except Exception as e:
         fail_count = 1
         note = f"error: {e}"
+        if db_helper.progress_note():  # 已提交到哪一块，便于判断部分写入
+            note += f"; progress: {db_helper.progress_note()}"
         print(f"\n❌ 执行错误：{e}")
 
     finally:
         ended_at = datetime.now()
-        # 7) 写入运行日志（确保表存在）
+        # 4) 写入运行日志（确保表存在）
         try:
             repo = IngestionRunsRepo(db_helper)
             repo.ensure_table()
@@ -1,8 +1,14 @@
 # main_inventory.py
-from datetime import datetime
+from datetime import datetime, timedelta
 from openapi import OpenApiBase
+from http_retry import AdaptiveConcurrencyController, EndpointRateLimiter
 from db_utils import DBHelper
 from ingestion_runs_repo import IngestionRunsRepo, IngestionRun
+from pipeline import prefetch, batched_pages
+from inventory_rows import InventoryBatch
+from sync_checkpoints_repo import SyncCheckpointsRepo, plan_incremental_sync
+from fetch_checkpoints import PartitionCheckpoint, scope_key
+from page_spool import PageSpool
 
 # ===================== 配置 =====================
 LINGXING_HOST = "https://openapi.lingxing.com"
@@ -14,14 +20,207 @@ DB_PORT = 3316
 DB_USER = "root"
 DB_PASSWORD = "Win2009@"
 DB_NAME = "LXTESTN8N"
+# 允许大批量写入走 LOAD DATA LOCAL INFILE（服务端未开启时自动退回 executemany）
+DB_LOCAL_INFILE = True
+
+# 并发分页：每轮并发拉取的页数 & 请求速率（QPS）：从 INV_INITIAL_QPS 起步，健康时由自适应控制器逐步加到 INV_MAX_QPS
+INV_CONCURRENCY = 4
+INV_INITIAL_QPS = 2
+INV_MAX_QPS = 5
+# 流水线：每 N 页 UPSERT 一次；后台最多预取几批
+UPSERT_EVERY_N_PAGES = 5
+PREFETCH_DEPTH = 2
+# 逐页断点：每页拉到后先落盘（.page_checkpoints），作业中途失败时下次从最后一个成功页之后继续；
+# 断点超过 RESUME_MAX_AGE_HOURS 小时就作废（旧页不能当作本次库存），从头拉取
+RESUME_PAGES = True
+RESUME_MAX_AGE_HOURS = 6
+# 原始接口页留存目录（gzip JSONL，一页一条，按账号分目录：SPOOL_DIR/<app_id>/inventory），
+# 可用 replay.py 重放入库；None 表示不留存。超过 SPOOL_KEEP_DAYS 天的旧文件在下次运行时删除
+SPOOL_DIR = ".cache/spool"
+SPOOL_KEEP_DAYS = 7
+# 变更检测：只写新增/变化的行，未变化的行仅刷新 pulled_at（首次开启时会给 inventory_fba_current 补 row_hash 列）
+SKIP_UNCHANGED = False
+# 快照模式：整次拉取写进影子表，完成后 RENAME TABLE 原子切换（上游消失的 SKU 随之删除）
+SNAPSHOT_MODE = False
+# 并行写库：每批按唯一键排序分块后由几条连接同时写（1 = 单连接顺序写）
+INV_DB_WRITERS = 4
+# 增量同步：按 账号 + 接口 记水位线（sync_checkpoints 表），平时只拉一部分，
+# 每 FULL_RECONCILE_HOURS 小时做一次全量对账
+INCREMENTAL_SYNC = False
+FULL_RECONCILE_HOURS = 24
+# 接口的"变更时间"过滤参数名；FBA 库存接口目前没有，留空时改为按 sid 轮转，每次拉 INV_SID_SLICE 个店铺
+INV_CHANGED_SINCE_FILTER = None
+INV_SID_SLICE = 20
+# 按店铺分片拉取：每个 sid 一条独立的分页流，INV_PARTITION_WORKERS 个分片并行；
+# 分片失败只重拉该店铺，拉完并入库的分片记断点，作业失败后重跑时跳过
+PARTITIONED_FETCH = False
+INV_PARTITION_WORKERS = 4
 # =================================================
 
+def build_inventory_api(host, app_id, app_secret, rate_limiter=None, **kwargs):
+    """
+    库存作业用的 OpenApiBase：带自适应并发控制（从 2 页并发起步，在 [1, INV_CONCURRENCY] 之间调整）。
+    控制器直接调库存接口的令牌桶：速率从 INV_INITIAL_QPS 起步，健康时逐步加到 min(该接口预算, INV_MAX_QPS)，
+    429/5xx 时减半；只管库存接口，token / 店铺列表请求照常走各自的令牌桶。
+    """
+    if rate_limiter is None:
+        rate_limiter = EndpointRateLimiter(rate=5.0, burst=5)
+    bucket = rate_limiter.bucket(OpenApiBase.FBA_INVENTORY_PATH)
+    max_rate = min(bucket.rate, INV_MAX_QPS)
+    controller = AdaptiveConcurrencyController(
+        initial_concurrency=2, max_concurrency=INV_CONCURRENCY,
+        initial_rate=min(INV_INITIAL_QPS, max_rate), max_rate=max_rate, limiter=bucket,
+    )
+    kwargs.setdefault("resume_max_age", RESUME_MAX_AGE_HOURS * 3600)
+    return OpenApiBase(host, app_id, app_secret, rate_limiter=rate_limiter, controller=controller, **kwargs)
+
+
+def plan_inventory_sync(api, db, now):
+    """增量模式下读水位线、定本次拉取范围；返回 (repo, plan)，未开增量时返回 (None, None)。"""
+    if not INCREMENTAL_SYNC:
+        return None, None
+    repo = SyncCheckpointsRepo(db)
+    repo.ensure_table()
+    checkpoint = repo.get(api.app_id, api.FBA_INVENTORY_PATH)
+    sids = []
+    if not INV_CHANGED_SINCE_FILTER:
+        try:
+            sids = db.list_store_sids("LINGXING", "AMAZON")
+        except Exception as e:
+            print(f"⚠️ 读取店铺 sid 失败，本次改为全量：{e}")
+    plan = plan_incremental_sync(
+        checkpoint, api.app_id, api.FBA_INVENTORY_PATH, now, sids,
+        full_every=timedelta(hours=FULL_RECONCILE_HOURS),
+        changed_since_filter=INV_CHANGED_SINCE_FILTER, sid_slice=INV_SID_SLICE,
+    )
+    print(f"[INV] 增量同步：mode={plan.mode}, filters={plan.filters}")
+    return repo, plan
+
+
+def inventory_partition_sids(api, db, token, plan):
+    """分片拉取用的 sid：增量轮转时就是本次那一片，否则取 stores 表，表里没有再调店铺列表接口。"""
+    if plan is not None and plan.mode == "sid_slice":
+        return plan.sids
+    try:
+        sids = db.list_store_sids("LINGXING", "AMAZON")
+    except Exception as e:
+        print(f"⚠️ 读取 stores 表 sid 失败，改用店铺列表接口：{e}")
+        sids = []
+    if not sids:
+        shops = api.fetch_amazon_shop_data(token)
+        sids = [int(s["sid"]) for s in shops.get("data") or [] if s.get("sid") is not None]
+    return sids
+
+
+def sync_inventory(api, db):
+    """
+    库存同步作业本体（不含连接/运行记录）：token → 分页拉 FBA 库存 → 边拉边 UPSERT。
+    增量模式（INCREMENTAL_SYNC）下按水位线只拉变化的行或一片 sid，成功后推进水位线。
+    返回 (success_count, note)；出错直接抛出。main() 与 runner.py 共用。
+    """
+    checkpoint_repo, plan = plan_inventory_sync(api, db, datetime.now().replace(microsecond=0))
+    # 快照切换会删掉本次没拉到的行，只能用在全量拉取上
+    snapshot = SNAPSHOT_MODE and (plan is None or plan.mode == "full")
+
+    # 1) access_token
+    print("\n=== 获取 access_token ===")
+    token = api.generate_access_token()
+
+    # 2) 边拉边写：后台线程预取下一页（或下一个分片），主线程把已到达的数据 UPSERT 入库
+    filters = {
+        "is_hide_zero_stock": "0",
+        # 需要时再开启进一步筛选：
+        # "fulfillment_channel_type": "FBA",
+        # "status": "1",
+        #"search_field": "seller_sku",
+        #"search_value": "AMKK-KTATLSSTS-6COOR-C-US-FBA",
+        **(plan.filters if plan else {}),
+    }
+    partition_checkpoint = None
+    spool = PageSpool.for_run(SPOOL_DIR, "inventory", api.app_id, keep_days=SPOOL_KEEP_DAYS) if SPOOL_DIR else None
+    if PARTITIONED_FETCH:
+        print("\n=== 按店铺分片拉取 FBA 库存（流水线入库） ===")
+        filters.pop("sid", None)
+        sids = inventory_partition_sids(api, db, token, plan)
+        partition_checkpoint = PartitionCheckpoint(
+            api.cache_dir / f".inventory_partitions_{api.app_id}.json",
+            scope_key(endpoint=api.FBA_INVENTORY_PATH, filters=filters, sids=sorted(sids)),
+        )
+        if snapshot:
+            partition_checkpoint.clear()  # 影子表每次重建，已完成的分片也得重拉
+        skip = partition_checkpoint.done
+        if skip:
+            print(f"[INV] 从断点继续：跳过已完成的 {len(skip)} 个店铺")
+        partitions = api.iter_inventory_fba_partitions(
+            token, [s for s in sids if s not in skip], length=200, extra_filters=filters,
+            workers=INV_PARTITION_WORKERS, spool=spool,
+        )
+        # 每个分片一批，写库成功后才记入断点
+        items = (
+            (InventoryBatch.from_api_rows(rows, source_system="LINGXING", platform="AMAZON"), part)
+            for part, rows in partitions
+        )
+    else:
+        print("\n=== 分页拉取 FBA 库存（流水线入库） ===")
+        pages = api.iter_inventory_fba_pages(
+            token,
+            length=200,
+            concurrency=INV_CONCURRENCY,
+            extra_filters=filters,
+            resume=RESUME_PAGES,
+            spool=spool,
+        )
+        # 每 UPSERT_EVERY_N_PAGES 页一批；每批在预取线程里就压成紧凑的 InventoryBatch，原始 dict 随即释放
+        items = (
+            (InventoryBatch.from_api_rows(raw, source_system="LINGXING", platform="AMAZON"), None)
+            for raw in batched_pages(pages, UPSERT_EVERY_N_PAGES)
+        )
+
+    # 3) 入库（UPSERT）：快照模式写影子表，全部成功后再切换
+    table = db.start_inventory_snapshot("LINGXING") if snapshot else "inventory_fba_current"
+    total_rows = 0
+    affected = 0
+    try:
+        for batch, part in prefetch(items, depth=PREFETCH_DEPTH):
+            total_rows += len(batch)
+            affected += db.upsert_inventory_fba_current_from_api(
+                batch, source_system="LINGXING", platform="AMAZON",
+                skip_unchanged=SKIP_UNCHANGED or snapshot, table=table, writers=INV_DB_WRITERS
+            )
+            if part is not None:
+                partition_checkpoint.mark_done(part)
+    except Exception:
+        if snapshot:
+            db.abort_inventory_snapshot()
+        raise
+    if snapshot:
+        if total_rows:
+            db.swap_inventory_snapshot()
+        else:
+            db.abort_inventory_snapshot()  # 一行都没拉到时不切换，避免清空线上表
+    if partition_checkpoint is not None:
+        partition_checkpoint.clear()
+    note = f"rows={total_rows}; affected={affected}"
+    if plan is not None:
+        checkpoint_repo.save(plan.next_checkpoint)  # 整次成功才推进水位线
+        note += f"; mode={plan.mode}"
+    if spool is not None:
+        # 只有覆盖全量库存的运行才标记完整（replay --snapshot 只接受完整运行）；增量 / 跳过了已完成分片的不算
+        if (plan is None or plan.mode == "full") and not (partition_checkpoint is not None and skip):
+            spool.mark_complete()
+        print(f"[INV] 原始页已留存：{spool}")
+    print(f"✅ 库存拉取 + 入库完成：affected={affected}, rows={total_rows}")
+    if api.controller is not None:
+        print(f"[INV] 自适应并发状态：{api.controller.snapshot()}")
+    return affected, note
+
+
 def main():
     JOB_NAME = "sync_inventory_from_lingxing"
     started_at = datetime.now()
 
-    api = OpenApiBase(LINGXING_HOST, APP_ID, APP_SECRET)
-    db = DBHelper(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME)
+    api = build_inventory_api(LINGXING_HOST, APP_ID, APP_SECRET)
+    db = DBHelper(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, local_infile=DB_LOCAL_INFILE)
 
     success = 0
     fail = 0
@@ -57,46 +256,19 @@ def main():
         print(f"⚠️ 日志表 ensure 失败（继续执行）：{e}")
 
     try:
-        # 2) access_token
-        print("\n=== 获取 access_token ===")
-        token = api.generate_access_token()
-
-        # 3) 拉库存（可按需加筛选条件）
-        print("\n=== 分页拉取 FBA 库存 ===")
-        rows = api.fetch_inventory_fba_data(
-            token,
-            length=200,
-            extra_filters={
-                "is_hide_zero_stock": "0",
-                # 需要时再开启进一步筛选：
-                # "fulfillment_channel_type": "FBA",
-                # "status": "1",
-                #"search_field": "seller_sku",
-                #"search_value": "AMKK-KTATLSSTS-6COOR-C-US-FBA",
-            }
-        )
-        total_rows = len(rows)
-        print(f"✅ 库存拉取完成，共 {total_rows} 行")
-
-        # 4) 入库（UPSERT）
-        affected = 0
-        if total_rows > 0:
-            affected = db.upsert_inventory_fba_current_from_api(
-                rows, source_system="LINGXING", platform="AMAZON"
-            )
-        print(f"✅ 入库完成：affected={affected}, rows={total_rows}")
-
-        success = affected
+        # 2) 拉库存 + 流水线入库
+        success, note = sync_inventory(api, db)
         fail = 0
-        note = f"rows={total_rows}; affected={affected}"
 
     except Exception as e:
         fail = 1
         note = f"error: {e}"
+        if db.progress_note():  # 已提交到哪一块，便于判断部分写入
+            note += f"; progress: {db.progress_note()}"
         print(f"❌ 执行错误：{e}")
 
     finally:
-        # 5) 写运行记录（无论成功失败）
+        # 3) 写运行记录（无论成功失败）
         try:
             repo.insert_run(IngestionRun(
                 job_name=JOB_NAME,
@@ -2,19 +2,72 @@
 import requests
 import time
 import json
+import logging
+import os
+import threading
 from pathlib import Path
-from typing import Optional, Dict, Any, List
-from urllib.parse import quote
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import quote, urlparse
 
-from sign import SignBase  # 你已有的签名工具
+import json_codec
+from fetch_checkpoints import PageCheckpoint, prune_page_checkpoints, scope_key
+from page_spool import PageSpool
+from sign import Signer  # 你已有的签名工具（按 app_id 复用密钥/cipher）
+from token_provider import TokenProvider
+from http_retry import (
+    AdaptiveConcurrencyController,
+    EndpointRateLimiter,
+    TokenBucketLimiter,
+    build_resilient_session,
+    parse_retry_after,
+)
 
 
-class OpenApiBase:
-    def __init__(self, host: str, app_id: str, app_secret: str):
+logger = logging.getLogger(__name__)
+
+
+class TokenExpiredError(RuntimeError):
+    """接口返回 token 失效类错误码（调用方可刷新 token 后重试）。"""
+
+
+class PartitionFetchError(RuntimeError):
+    """按 sid 分片拉取时，部分分片重试后仍失败；failed 为 {分片 sid 元组: 最后一次的异常}。"""
+
+    def __init__(self, failed: Dict[Tuple[int, ...], Exception]):
+        self.failed = failed
+        detail = "; ".join(f"sid={','.join(map(str, k))}: {e}" for k, e in failed.items())
+        super().__init__(f"{len(failed)} 个分片拉取失败：{detail}")
+
+
+class OpenApiCore:
+    """
+    同步/异步客户端共用的部分：签名、token 缓存、签名策略缓存、分页请求的构造与响应解析。
+    不包含任何网络 I/O。
+    """
+    SHOP_LIST_PATH = "/erp/sc/data/seller/lists"
+    FBA_INVENTORY_PATH = "/basicOpen/openapi/storage/fbaWarehouseDetail"
+    TOKEN_PATH = "/api/auth-server/oauth/access-token"
+
+    # access_token 不存在/已过期、access_token 不正确
+    TOKEN_EXPIRED_CODES = {"2001003", "2001005"}
+
+    SHOP_STRATEGY_LABELS = {"A": "A:raw-sign", "B": "B:urlencoded-sign"}
+    INVENTORY_STRATEGY_LABELS = {"A": "A:query-only-sign", "B": "B:query+body-sign"}
+
+    def __init__(self, host: str, app_id: str, app_secret: str, cache_dir: Optional[str] = None):
+        """:param cache_dir: token / 签名策略缓存文件所在目录（默认当前目录）"""
         self.host = host.rstrip("/")
         self.app_id = app_id
         self.app_secret = app_secret
-        self.token_cache_file = Path(f".token_cache_{app_id}.json")
+        self.signer = Signer.for_app(app_id)
+        self.cache_dir = Path(cache_dir) if cache_dir else Path(".")
+        self.token_cache_file = self.cache_dir / f".token_cache_{app_id}.json"
+        # 每个接口“签名策略”的记忆（与 token 缓存放在同一目录）
+        self.sign_strategy_file = self.cache_dir / f".sign_strategy_{app_id}.json"
+        self._sign_strategies: Optional[Dict[str, str]] = None
+        self.sign_fallback_count: Dict[str, int] = {}
+        self._strategy_lock = threading.Lock()
 
     # ---------- 工具：打码 + 打印请求 ----------
     @staticmethod
@@ -27,17 +80,16 @@ class OpenApiBase:
     @staticmethod
     def _debug_prepared_request(method, url, params, json_body, mask_keys=None, title=""):
         import requests as _req
-        import json as _json
         mask_keys = mask_keys or []
         params_print = dict(params or {})
         for k in mask_keys:
             if k in params_print:
-                params_print[k] = OpenApiBase._mask(params_print[k])
+                params_print[k] = OpenApiCore._mask(params_print[k])
 
         print("\n====== DEBUG 请求构造", title, "======")
         print("Raw URL:", url)
         print("Query params (masked):", params_print)
-        print("JSON body:", _json.dumps(json_body or {}, ensure_ascii=False))
+        print("JSON body:", json_codec.dumps(json_body or {}))
 
         req = _req.Request(method=method.upper(), url=url, params=params, json=json_body,
                            headers={"Content-Type": "application/json; charset=utf-8"})
@@ -47,7 +99,7 @@ class OpenApiBase:
         q = dict(parse_qsl(pu.query, keep_blank_values=True))
         for k in mask_keys:
             if k in q:
-                q[k] = OpenApiBase._mask(q[k])
+                q[k] = OpenApiCore._mask(q[k])
         masked_url = urlunparse((pu.scheme, pu.netloc, pu.path, pu.params, urlencode(q), pu.fragment))
         print("Prepared URL (masked):", masked_url)
 
@@ -60,257 +112,662 @@ class OpenApiBase:
         print("Prepared Body:", body_text)
         print("====================================\n")
 
-    # ---------- token 缓存 ----------
-    def _load_token_cache(self) -> Optional[str]:
-        if self.token_cache_file.exists():
-            try:
-                with open(self.token_cache_file, "r") as f:
-                    cache = json.load(f)
-                    if cache.get("expires_at", 0) > time.time():
-                        return cache["access_token"]
-            except Exception:
-                pass
-        return None
-
-    def _save_token_cache(self, access_token: str, expires_in: int = 3600) -> None:
+    # ---------- 签名策略缓存（按接口记住成功的签名方式） ----------
+    def _load_sign_strategies(self) -> Dict[str, str]:
+        if self._sign_strategies is None:
+            strategies: Dict[str, str] = {}
+            if self.sign_strategy_file.exists():
+                try:
+                    with open(self.sign_strategy_file, "r") as f:
+                        cache = json.load(f)
+                    strategies = dict(cache.get("strategies") or {})
+                    self.sign_fallback_count = {k: int(v) for k, v in (cache.get("fallbacks") or {}).items()}
+                except Exception:
+                    pass
+            self._sign_strategies = strategies
+        return self._sign_strategies
+
+    def _save_sign_strategies(self) -> None:
         cache = {
+            "strategies": self._sign_strategies or {},
+            "fallbacks": self.sign_fallback_count,
+        }
+        # 先写临时文件再原子替换：同账号的多个 runner 进程共用这个文件，不能让别人读到写了一半的内容
+        # （临时文件名带进程号，两个进程同时写也不会互相覆盖临时文件）
+        tmp = self.sign_strategy_file.with_name(f"{self.sign_strategy_file.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp, "w") as f:
+                json.dump(cache, f)
+            os.replace(tmp, self.sign_strategy_file)
+        except Exception as e:
+            print(f"⚠️ 写签名策略缓存失败（忽略）：{e}")
+
+    def _strategy_order(self, endpoint: str, strategies: List[str]) -> List[str]:
+        """已知可用的策略排第一，其余按默认顺序。"""
+        with self._strategy_lock:
+            known = self._load_sign_strategies().get(endpoint)
+        if known in strategies:
+            return [known] + [s for s in strategies if s != known]
+        return list(strategies)
+
+    def _remember_strategy(self, endpoint: str, strategy: str, fell_back: bool) -> None:
+        with self._strategy_lock:
+            cache = self._load_sign_strategies()
+            changed = cache.get(endpoint) != strategy
+            cache[endpoint] = strategy
+            if fell_back:
+                self.sign_fallback_count[endpoint] = self.sign_fallback_count.get(endpoint, 0) + 1
+            if changed or fell_back:
+                self._save_sign_strategies()
+
+    # ---------- 请求构造 / 响应解析（同步、异步共用） ----------
+    @staticmethod
+    def _is_ok(code, expected: int = 0) -> bool:
+        return (code == expected) or (isinstance(code, str) and code == str(expected))
+
+    def _parse_token_response(self, data: Dict[str, Any]) -> Tuple[str, int]:
+        """校验 token 接口响应，返回 (access_token, expires_in)。"""
+        code = data.get("code")
+        if not self._is_ok(code, 200):
+            raise RuntimeError(f"get token failed: code={code}, msg={data.get('message') or data.get('msg')}")
+        token = data["data"]["access_token"]
+        expires_in = int(data["data"].get("expires_in", 3600))
+        print(f"access_token获取成功（有效期{expires_in}s）：{token[:20]}...")
+        return token, expires_in
+
+    def _shop_page_params(self, access_token: str, page: int, page_size: int, strategy: str) -> Dict[str, Any]:
+        """店铺列表单页的 query（含签名）。A：raw sign；B：只对 sign 做 URL 编码。"""
+        # 很多对接方把分页字段也纳入签名；沿用你先前的做法
+        query = {
+            "app_key": self.app_id,
+            "access_token": access_token,
+            "timestamp": str(int(time.time())),
+            "page": page,
+            "page_size": page_size,
+        }
+        sign = self.signer.sign(query)
+        params = dict(query)
+        params["sign"] = sign if strategy == "A" else quote(sign)
+        return params
+
+    def _inventory_page_request(
+        self,
+        access_token: str,
+        offset: int,
+        length: int,
+        extra_filters: Optional[Dict[str, Any]],
+        strategy: str,
+    ) -> Tuple[Dict[str, Any], Dict[str, Any], str]:
+        """FBA 库存单页的 (query 含签名, body, 调试标题)。A：只签 query；B：query+body 同签（布尔小写化）。"""
+        def _normalize_for_sign(v):
+            if isinstance(v, bool):
+                return "true" if v else "false"
+            if v is None:
+                return ""
+            return str(v)
+
+        # 基础 query
+        query = {
+            "app_key": self.app_id,
             "access_token": access_token,
-            "expires_at": time.time() + int(expires_in)
+            "timestamp": str(int(time.time())),
+        }
+        # body（分页 + 你的筛选）
+        body: Dict[str, Any] = {
+            "offset": offset,
+            "length": length,
+            "is_hide_zero_stock": "0",
+            # "query_fba_storage_quantity_list": True,
         }
-        with open(self.token_cache_file, "w") as f:
-            json.dump(cache, f)
+        if extra_filters:
+            body.update(extra_filters)
+
+        if strategy == "A":
+            sign = self.signer.sign(query)
+            title = "FBA库存 策略A（只签query）"
+        else:
+            sign_b_params = dict(query)
+            sign_b_params.update({k: _normalize_for_sign(v) for k, v in body.items()})
+            sign = self.signer.sign(sign_b_params)
+            title = "FBA库存 策略B（query+body同时签）"
+            print("参与签名（B）字段：", {k: sign_b_params[k] for k in sorted(sign_b_params.keys())})
+        params = dict(query)
+        params["sign"] = sign
+        return params, body, title
+
+    def _handle_page_response(
+        self,
+        j: Dict[str, Any],
+        endpoint: str,
+        strategy: str,
+        attempt: int,
+        attempts: int,
+        what: str,
+    ) -> Optional[List[Dict[str, Any]]]:
+        """
+        解析分页响应：成功 → 记住策略并返回 data；
+        2001006 且还有别的策略可试 → 返回 None；token 失效 → TokenExpiredError；其它错误直接抛出。
+        """
+        code = j.get("code")
+        if self._is_ok(code):
+            self._remember_strategy(endpoint, strategy, fell_back=attempt > 0)
+            return j.get("data") or []
+        msg = j.get("message") or j.get("msg") or ""
+        if str(code) in self.TOKEN_EXPIRED_CODES:
+            raise TokenExpiredError(f"{what}失败：code={code}, msg={msg}")
+        if str(code) != "2001006" or attempt == attempts - 1:
+            raise RuntimeError(f"{what}失败：code={code}, msg={msg}")
+        return None
+
+    @staticmethod
+    def build_shop_response(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """组装一个“完整响应”（与 main.py / insert_shop_data 的用法兼容）"""
+        return {
+            "code": 0,
+            "message": "success",
+            "error_details": [],
+            "request_id": "",
+            "response_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
+            "data": rows,
+            "total": len(rows),
+        }
+
+
+class OpenApiBase(OpenApiCore):
+    def __init__(
+        self,
+        host: str,
+        app_id: str,
+        app_secret: str,
+        session: Optional[requests.Session] = None,
+        rate_limiter: Optional[EndpointRateLimiter] = None,
+        controller: Optional[AdaptiveConcurrencyController] = None,
+        cache_dir: Optional[str] = None,
+        token_renew_margin: float = 300.0,
+        resume_max_age: float = 6 * 3600,
+    ):
+        """
+        :param session: 可注入的 HTTP 传输（需支持 .request()）；默认用 build_resilient_session
+                        构建的长连接池 Session（含 429/5xx 重试退避）
+        :param rate_limiter: 领星请求的限流器（需支持 .wait(key)，key 为接口路径）；
+                             默认按接口各自一个令牌桶（5 QPS，突发 5）
+        :param controller: 可选的 AIMD 自适应并发控制器；设置后每次请求都占用它的槽位，
+                           并把 429/5xx/延迟反馈给它，并发分页的窗口大小也跟随它调整
+        :param token_renew_margin: token 过期前多少秒开始后台续期
+        :param resume_max_age: 逐页断点的有效期（秒），超过后不再续拉、从头开始
+        """
+        super().__init__(host, app_id, app_secret, cache_dir=cache_dir)
+        self.resume_max_age = resume_max_age
+        self.session = session if session is not None else build_resilient_session()
+        self.rate_limiter = rate_limiter if rate_limiter is not None else EndpointRateLimiter(rate=5.0, burst=5)
+        self.controller = controller
+        # 内存优先的 token 提供者（磁盘缓存做二级，单飞刷新 + 到期前后台续期）
+        self.token_provider = TokenProvider(self.token_cache_file, self._request_new_token,
+                                            renew_margin=token_renew_margin)
+
+    # ---------- 统一请求入口：限流 + 长连接 Session ----------
+    def _request(self, method: str, url: str, **kwargs) -> requests.Response:
+        path = urlparse(url).path
+        if self.rate_limiter is not None and not self._controller_owns_bucket(path):
+            self.rate_limiter.wait(path)
+        if not self._controller_governs(path):
+            return self.session.request(method.upper(), url, **kwargs)
+
+        with self.controller.slot():
+            t0 = time.monotonic()
+            try:
+                resp = self.session.request(method.upper(), url, **kwargs)
+            except requests.RequestException:
+                self.controller.record(None)
+                raise
+            latency = time.monotonic() - t0
+
+        # urllib3 层已经重试掉的 429/5xx 也反馈给控制器
+        retries = getattr(getattr(resp, "raw", None), "retries", None)
+        history = getattr(retries, "history", None) or ()
+        for h in history:
+            self.controller.record(h.status)
+        self.controller.record(
+            resp.status_code,
+            latency=None if history else latency,
+            retry_after=parse_retry_after(resp.headers.get("Retry-After")),
+        )
+        return resp
+
+    def _controller_governs(self, path: str) -> bool:
+        """
+        该接口的请求是否走控制器（占槽位 + 反馈 429/延迟）：控制器绑定了某个接口的令牌桶时只管那个接口，
+        token、店铺列表等其它接口既不占它的槽位，也不影响它的 AIMD 信号；没绑定令牌桶时管所有接口。
+        """
+        if self.controller is None:
+            return False
+        return getattr(self.controller, "limiter", None) is None or self._controller_owns_bucket(path)
+
+    def _controller_owns_bucket(self, path: str) -> bool:
+        """控制器带的令牌桶就是该接口的桶时，令牌由 controller.slot() 取，这里不再重复等待。"""
+        limiter = getattr(self.controller, "limiter", None)
+        bucket = getattr(self.rate_limiter, "bucket", None)
+        return limiter is not None and bucket is not None and bucket(path) is limiter
 
     # ---------- 获取 access_token ----------
     def generate_access_token(self, force_refresh: bool = False) -> str:
-        if not force_refresh:
-            cached = self._load_token_cache()
-            if cached:
-                print(f"使用缓存 access_token：{cached[:20]}...")
-                return cached
+        if force_refresh:
+            return self.token_provider.refresh(force=True)
+        return self.token_provider.get()
 
-        url = f"{self.host}/api/auth-server/oauth/access-token"
+    def _with_token_retry(self, fetch, access_token: str):
+        """先把调用方的 token 换成当前有效的；接口报 token 失效时单飞刷新，再重试一次。"""
+        token = self.token_provider.current(access_token)
+        try:
+            return fetch(token)
+        except TokenExpiredError as e:
+            print(f"[TOKEN] {e}；刷新 access_token 后重试一次")
+            return fetch(self.token_provider.refresh(stale=token))
+
+    def _request_new_token(self) -> Tuple[str, int]:
+        """真正请求 token 接口（由 TokenProvider 在单飞锁内调用）。"""
+        url = f"{self.host}{self.TOKEN_PATH}"
         form_data = {"appId": self.app_id, "appSecret": self.app_secret}
         print("\n=== 获取新的 access_token ===")
         print("请求URL:", url)
         print("请求参数:", form_data)
 
-        resp = requests.post(url, data=form_data, timeout=10)
+        resp = self._request("POST", url, data=form_data, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
-        code = data.get("code")
-        ok = (code == 200) or (isinstance(code, str) and code == "200")
-        if not ok:
-            raise RuntimeError(f"get token failed: code={code}, msg={data.get('message') or data.get('msg')}")
-        token = data["data"]["access_token"]
-        expires_in = data["data"].get("expires_in", 3600)
-        self._save_token_cache(token, expires_in)
-        print(f"access_token获取成功（有效期{expires_in}s）：{token[:20]}...")
-        return token
+        return self._parse_token_response(json_codec.response_json(resp))
 
     # ---------- 店铺列表（自动分页 + 签名容错：raw → urlencoded） ----------
-    def fetch_amazon_shop_data(self, access_token: str, page_size: int = 100) -> Dict[str, Any]:
+    def fetch_amazon_shop_data(
+        self, access_token: str, page_size: int = 100, resume: bool = False, spool: Optional[PageSpool] = None
+    ) -> Dict[str, Any]:
         """
         GET /erp/sc/data/seller/lists
         - 自动分页：page 从 1 开始，直到返回数量 < page_size
         - 签名容错：先用 raw sign；若 code=2001006（签名错误）→ 再用 urlencode(sign)
+        - resume=True：逐页记断点，上次中途失败时从最后一个成功页之后继续（见 iter_with_checkpoint）
+        - spool：把每页原始数据追加进 page_spool.PageSpool，供 replay.py 重放
         - 返回：完整响应 dict（其中 data 是聚合后的店铺列表），与 main.py 兼容
         """
-        url = f"{self.host}/erp/sc/data/seller/lists"
         all_rows: List[Dict[str, Any]] = []
-        page = 1
+        for rows in self.iter_amazon_shop_pages(access_token, page_size=page_size, resume=resume, spool=spool):
+            all_rows.extend(rows)
+        return self.build_shop_response(all_rows)
+
+    def iter_amazon_shop_pages(
+        self, access_token: str, page_size: int = 100, resume: bool = False, start_page: int = 1,
+        spool: Optional[PageSpool] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """逐页产出店铺列表（每次 yield 一页 data），不在内存里聚合全量。"""
         page_size = max(20, min(200, int(page_size)))
+        if resume:
+            yield from self.iter_with_checkpoint(
+                self.page_checkpoint(self.SHOP_LIST_PATH, page_size=page_size), 1, 1,
+                lambda page: self.iter_amazon_shop_pages(access_token, page_size=page_size, start_page=page,
+                                                         spool=spool),
+                on_resumed_page=None if spool is None else lambda page, rows: spool.write(
+                    self.SHOP_LIST_PATH, self.app_id, {"page": page, "page_size": page_size}, rows),
+            )
+            return
 
+        url = f"{self.host}{self.SHOP_LIST_PATH}"
+        page = max(1, int(start_page))
         while True:
-            ts = str(int(time.time()))
-            # 很多对接方把分页字段也纳入签名；沿用你先前的做法
-            query = {
-                "app_key": self.app_id,
-                "access_token": access_token,
-                "timestamp": ts,
-                "page": page,
-                "page_size": page_size,
-            }
-
-            # 方案A：raw sign（不额外 urlencode）
-            sign_a = SignBase.generate_sign(query, self.app_id)
-            params_a = dict(query)
-            params_a["sign"] = sign_a
+            rows = self._fetch_shop_page(url, access_token, page, page_size)
+            if rows:
+                if spool is not None:
+                    spool.write(self.SHOP_LIST_PATH, self.app_id, {"page": page, "page_size": page_size}, rows)
+                yield rows
+            if not rows or len(rows) < page_size:
+                break
+            page += 1
+
+    def _fetch_shop_page(self, url: str, access_token: str, page: int, page_size: int) -> List[Dict[str, Any]]:
+        """
+        拉取单页店铺，返回该页 data。
+        签名策略：A=raw sign，B=urlencode(sign)；先用该接口记住的策略，code=2001006 再换另一种。
+        """
+        return self._with_token_retry(
+            lambda token: self._fetch_shop_page_once(url, token, page, page_size), access_token
+        )
+
+    def _fetch_shop_page_once(self, url: str, access_token: str, page: int, page_size: int) -> List[Dict[str, Any]]:
+        order = self._strategy_order(self.SHOP_LIST_PATH, ["A", "B"])
+        for i, strategy in enumerate(order):
+            params = self._shop_page_params(access_token, page, page_size, strategy)
 
             # 可按需打开调试
-            # self._debug_prepared_request("GET", url, params_a, None, mask_keys=["access_token", "sign"],
-            #                              title=f"店铺列表 A page={page}")
+            # self._debug_prepared_request("GET", url, params, None, mask_keys=["access_token", "sign"],
+            #                              title=f"店铺列表 {strategy} page={page}")
 
             try:
-                r = requests.get(url, params=params_a, timeout=20)
+                r = self._request("GET", url, params=params, timeout=20)
                 r.raise_for_status()
-                j = r.json()
-                code = j.get("code")
-                ok = (code == 0) or (isinstance(code, str) and code == "0")
-                if ok:
-                    rows = j.get("data") or []
-                    all_rows.extend(rows)
-                    print(f"[SHOPS] page={page}, got={len(rows)} (A:raw-sign)")
-                    if not rows or len(rows) < page_size:
-                        break
-                    page += 1
-                    continue
-                else:
-                    msg = j.get("message") or j.get("msg") or ""
-                    if str(code) != "2001006":
-                        raise RuntimeError(f"拉店铺失败：code={code}, msg={msg}")
-                    print("[SHOPS] code=2001006，改用 urlencode(sign) 重试。")
+                j = json_codec.response_json(r)
             except Exception as e:
-                # 网络/解析异常：这里直接抛错；也可根据需要切到B
-                if "2001006" not in str(e):
-                    raise RuntimeError(f"拉店铺失败（A）：{e}")
+                raise RuntimeError(f"拉店铺失败（{strategy}）：{e}")
 
-            # 方案B：对 sign 做 URL 编码（与你先前成功的写法一致）
-            sign_b = SignBase.generate_sign(query, self.app_id)
-            params_b = dict(query)
-            params_b["sign"] = quote(sign_b)  # 只编码 sign
-
-            # 可按需打开调试
-            # self._debug_prepared_request("GET", url, params_b, None, mask_keys=["access_token", "sign"],
-            #                              title=f"店铺列表 B page={page}")
-
-            r = requests.get(url, params=params_b, timeout=20)
-            r.raise_for_status()
-            j = r.json()
-            code = j.get("code")
-            ok = (code == 0) or (isinstance(code, str) and code == "0")
-            if not ok:
-                msg = j.get("message") or j.get("msg") or ""
-                raise RuntimeError(f"拉店铺失败：code={code}, msg={msg}")
-            rows = j.get("data") or []
-            all_rows.extend(rows)
-            print(f"[SHOPS] page={page}, got={len(rows)} (B:urlencoded-sign)")
-            if not rows or len(rows) < page_size:
-                break
-            page += 1
-
-        # 组装一个“完整响应”返回（与 main.py 当前用法兼容）
-        resp = {
-            "code": 0,
-            "message": "success",
-            "error_details": [],
-            "request_id": "",
-            "response_time": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime()),
-            "data": all_rows,
-            "total": len(all_rows),
-        }
-        return resp
+            label = self.SHOP_STRATEGY_LABELS[strategy]
+            rows = self._handle_page_response(j, self.SHOP_LIST_PATH, strategy, i, len(order), "拉店铺")
+            if rows is not None:
+                print(f"[SHOPS] page={page}, got={len(rows)} ({label})")
+                return rows
+            print(f"[SHOPS] code=2001006（{label}），换另一种签名方式重试。")
+        raise RuntimeError("拉店铺失败：没有可用的签名策略")
 
     # ---------- FBA 库存（分页 + 两种签名策略 + Debug 打印） ----------
     def fetch_inventory_fba_data(
         self,
         access_token: str,
         length: int = 200,
-        extra_filters: Optional[Dict[str, Any]] = None
+        extra_filters: Optional[Dict[str, Any]] = None,
+        concurrency: int = 1,
+        max_qps: Optional[float] = None,
+        resume: bool = False,
+        spool: Optional[PageSpool] = None,
     ) -> List[Dict[str, Any]]:
         """
         POST /basicOpen/openapi/storage/fbaWarehouseDetail
         自动重试：先“只签 query”，若 2001006 再切到“query+body 同签（布尔小写化参与签名）”。
         同时打印完整请求入参（对 access_token/sign 打码）。
+        - concurrency > 1：第一页之后，每轮并发拉取 concurrency 个 offset 窗口；
+          遇到短页即停止，结果按 offset 顺序合并
+        - max_qps：并发模式下的请求速率上限（None 表示不额外限流；控制器管着库存接口的令牌桶时忽略）
+        - 实例带 controller 时，concurrency 作为窗口上限，实际窗口随 429/延迟自适应
+        - resume=True：逐页记断点（范围 = 接口 + length + extra_filters），
+          上次在某个 offset 失败时，已拉到的页直接从本地读出，从失败处继续拉
+        - spool：把每页原始数据（连同 offset/length/筛选条件）追加进 page_spool.PageSpool
         """
-        def _normalize_for_sign(v):
-            if isinstance(v, bool):
-                return "true" if v else "false"
-            if v is None:
-                return ""
-            return str(v)
-
-        url = f"{self.host}/basicOpen/openapi/storage/fbaWarehouseDetail"
         all_rows: List[Dict[str, Any]] = []
-        offset = 0
+        for rows in self.iter_inventory_fba_pages(
+            access_token, length=length, extra_filters=extra_filters,
+            concurrency=concurrency, max_qps=max_qps, resume=resume, spool=spool,
+        ):
+            all_rows.extend(rows)
+        print(f"[INV] 合并库存行数：{len(all_rows)}")
+        return all_rows
+
+    def iter_inventory_fba_pages(
+        self,
+        access_token: str,
+        length: int = 200,
+        extra_filters: Optional[Dict[str, Any]] = None,
+        concurrency: int = 1,
+        max_qps: Optional[float] = None,
+        resume: bool = False,
+        start_offset: int = 0,
+        spool: Optional[PageSpool] = None,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """逐页产出 FBA 库存（按 offset 顺序 yield 每页 data），参数同 fetch_inventory_fba_data。"""
+        url = f"{self.host}{self.FBA_INVENTORY_PATH}"
         length = max(20, min(200, int(length)))
+        concurrency = max(1, int(concurrency))
+
+        if resume:
+            yield from self.iter_with_checkpoint(
+                self.page_checkpoint(self.FBA_INVENTORY_PATH, length=length, filters=extra_filters or {}),
+                0, length,
+                lambda off: self.iter_inventory_fba_pages(
+                    access_token, length=length, extra_filters=extra_filters,
+                    concurrency=concurrency, max_qps=max_qps, start_offset=off, spool=spool,
+                ),
+                on_resumed_page=None if spool is None else lambda off, rows: self._spool_inventory_page(
+                    spool, off, length, extra_filters, rows),
+            )
+            return
 
-        while True:
-            ts = str(int(time.time()))
-            # 基础 query
-            query = {
-                "app_key": self.app_id,
-                "access_token": access_token,
-                "timestamp": ts
-            }
-            # body（分页 + 你的筛选）
-            body: Dict[str, Any] = {
-                "offset": offset,
-                "length": length,
-                "is_hide_zero_stock": "0",
-                # "query_fba_storage_quantity_list": True,
-            }
-            if extra_filters:
-                body.update(extra_filters)
-
-            # 策略 A：只签 query
-            sign_a = SignBase.generate_sign(query, self.app_id)
-            params_a = dict(query)
-            params_a["sign"] = sign_a
-
-            self._debug_prepared_request(
-                "POST", url, params_a, body,
-                mask_keys=["access_token", "sign"],
-                title="FBA库存 策略A（只签query）"
+        if spool is not None:
+            # 页按 offset 顺序产出、每页前进 length，由此还原每页的 offset 记进 spool
+            pages = self.iter_inventory_fba_pages(
+                access_token, length=length, extra_filters=extra_filters,
+                concurrency=concurrency, max_qps=max_qps, start_offset=start_offset,
             )
+            for i, rows in enumerate(pages):
+                self._spool_inventory_page(spool, start_offset + i * length, length, extra_filters, rows)
+                yield rows
+            return
+
+        if concurrency > 1:
+            yield from self._iter_inventory_pages_parallel(
+                url, access_token, length, extra_filters, concurrency, max_qps, start_offset
+            )
+            return
+
+        offset = max(0, int(start_offset))
+        while True:
+            rows = self._fetch_inventory_page(url, access_token, offset, length, extra_filters)
+            if rows:
+                yield rows
+            if not rows or len(rows) < length:
+                break
+            offset += length
+
+    def _spool_inventory_page(
+        self, spool: PageSpool, offset: int, length: int, extra_filters: Optional[Dict[str, Any]], rows
+    ) -> None:
+        spool.write(self.FBA_INVENTORY_PATH, self.app_id,
+                    {"offset": offset, "length": length, "filters": extra_filters or {}}, rows)
+
+    # ---------- 逐页断点（resume=True） ----------
+    def page_checkpoint(self, endpoint: str, **scope: Any) -> PageCheckpoint:
+        """
+        该账号某接口、某组分页参数的逐页断点，存放在 cache_dir/.page_checkpoints 下；
+        顺带清掉超过 resume_max_age 的旧断点（包括范围已变、不会再用到的）。
+        """
+        root = self.cache_dir / ".page_checkpoints"
+        prune_page_checkpoints(root, self.resume_max_age)
+        return PageCheckpoint(root, scope_key(app_id=self.app_id, endpoint=endpoint, **scope),
+                              max_age=self.resume_max_age)
 
+    @staticmethod
+    def iter_with_checkpoint(
+        checkpoint: PageCheckpoint, first_key: int, step: int, fetch_from, on_resumed_page=None
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        带断点的逐页拉取：先交出上次已落盘的页，再调 fetch_from(key) 从断点处继续；
+        每拉到一页先落盘再交给调用方，全部拉完后删除断点。
+        fetch_from(key) 须按顺序产出从 key 开始的非空页，每页前进 step（offset 步长或 1 页）。
+        on_resumed_page(key, rows)：从断点交出的旧页先过一遍（如写进本次的 spool，使其包含完整的一次拉取）。
+        """
+        key = checkpoint.next_key()
+        if key is None:
+            key = first_key
+        else:
+            print(f"[RESUME] 从断点继续：{checkpoint.dir.name} next={key}")
+            for page_key, rows in checkpoint.pages():
+                if on_resumed_page is not None:
+                    on_resumed_page(page_key, rows)
+                yield rows
+        for rows in fetch_from(key):
+            checkpoint.save_page(key, rows, key + step)
+            yield rows
+            key += step
+        checkpoint.finish()
+
+    def iter_inventory_fba_partitions(
+        self,
+        access_token: str,
+        sids: List[int],
+        length: int = 200,
+        extra_filters: Optional[Dict[str, Any]] = None,
+        workers: int = 4,
+        sids_per_partition: int = 1,
+        retries: int = 2,
+        retry_backoff: float = 1.0,
+        spool: Optional[PageSpool] = None,
+    ) -> Iterator[Tuple[Tuple[int, ...], List[Dict[str, Any]]]]:
+        """
+        按店铺分片拉 FBA 库存：每个分片（sids_per_partition 个 sid）带 sid 过滤条件独立分页，
+        workers 个分片同时拉；按完成先后 yield (分片 sid 元组, 该分片全部行)。
+        - 分片失败只重拉这一个分片（最多 retries 次，指数退避），不影响其它分片
+        - 同时在途的分片最多 2×workers 个（已拉完未被消费的也算），不会把整个租户攒在内存里
+        - 有分片最终失败时，其它分片照常产出，最后抛 PartitionFetchError（列出失败的 sid）
+        - spool：分片成功后把它的每一页写进 spool（失败重拉的半截分片不会留下重复页）
+        """
+        url = f"{self.host}{self.FBA_INVENTORY_PATH}"
+        length = max(20, min(200, int(length)))
+        size = max(1, int(sids_per_partition))
+        ordered = list(dict.fromkeys(int(s) for s in sids))
+        partitions = [tuple(ordered[i:i + size]) for i in range(0, len(ordered), size)]
+
+        def _run(part: Tuple[int, ...]) -> List[Dict[str, Any]]:
+            filters = dict(extra_filters or {})
+            filters["sid"] = ",".join(map(str, part))
+            attempt = 0
+            while True:
+                try:
+                    pages: List[List[Dict[str, Any]]] = []
+                    offset = 0
+                    while True:
+                        page = self._fetch_inventory_page(url, access_token, offset, length, filters)
+                        if page:
+                            pages.append(page)
+                        if not page or len(page) < length:
+                            break
+                        offset += length
+                except Exception as e:
+                    if attempt >= retries:
+                        raise
+                    delay = retry_backoff * (2 ** attempt)
+                    attempt += 1
+                    print(f"[INV] 分片 sid={filters['sid']} 失败（{e}），{delay:.1f}s 后第 {attempt} 次重拉该分片")
+                    time.sleep(delay)
+                    continue
+                if spool is not None:
+                    for i, page in enumerate(pages):
+                        self._spool_inventory_page(spool, i * length, length, filters, page)
+                return [row for page in pages for row in page]
+
+        failed: Dict[Tuple[int, ...], Exception] = {}
+        todo = iter(partitions)
+        max_in_flight = 2 * max(1, int(workers))
+        with ThreadPoolExecutor(max_workers=max(1, int(workers)), thread_name_prefix="inv-partition") as pool:
+            pending = {}
             try:
-                r = requests.post(url, params=params_a, json=body, timeout=20)
-                r.raise_for_status()
-                j = r.json()
-                code = j.get("code")
-                ok = (code == 0) or (isinstance(code, str) and code == "0")
-                if ok:
-                    rows = j.get("data") or []
-                    all_rows.extend(rows)
-                    print(f"[INV] offset={offset}, got={len(rows)} (A:query-only-sign)")
-                    if not rows or len(rows) < length:
+                while True:
+                    while len(pending) < max_in_flight:
+                        part = next(todo, None)
+                        if part is None:
+                            break
+                        pending[pool.submit(_run, part)] = part
+                    if not pending:
                         break
-                    offset += length
-                    continue
-                else:
-                    msg = j.get("message") or j.get("msg") or ""
-                    if str(code) != "2001006":
-                        raise RuntimeError(f"拉库存失败：code={code}, msg={msg}")
-                    print("[INV] code=2001006，切换为“query+body 一起签名”重试。")
-            except Exception as e:
-                if "2001006" not in str(e):
-                    raise RuntimeError(f"拉库存失败（A）：{e}")
-
-            # 策略 B：query+body 同签（布尔小写化）
-            body_for_sign = {k: _normalize_for_sign(v) for k, v in body.items()}
-            sign_b_params = dict(query)
-            sign_b_params.update(body_for_sign)
-            sign_b = SignBase.generate_sign(sign_b_params, self.app_id)
-            params_b = dict(query)
-            params_b["sign"] = sign_b
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                    for fut in done:
+                        part = pending.pop(fut)
+                        try:
+                            rows = fut.result()
+                        except Exception as e:
+                            failed[part] = e
+                            continue
+                        print(f"[INV] 分片 sid={','.join(map(str, part))} 完成：{len(rows)} 行")
+                        yield part, rows
+            finally:
+                for fut in pending:
+                    fut.cancel()
+        if failed:
+            raise PartitionFetchError(failed)
+
+    def _iter_inventory_pages_parallel(
+        self,
+        url: str,
+        access_token: str,
+        length: int,
+        extra_filters: Optional[Dict[str, Any]],
+        concurrency: int,
+        max_qps: Optional[float],
+        start_offset: int = 0,
+    ) -> Iterator[List[Dict[str, Any]]]:
+        """
+        并发分页：先拉第一页确认是否还有后续，再按窗口并发拉 concurrency 页。
+        窗口内按 offset 顺序消费结果，出现短页/空页后丢弃其后的页并结束。
+        """
+        # 控制器管着库存接口的令牌桶时速率由它调整，不再额外套一层固定速率
+        if self._controller_owns_bucket(self.FBA_INVENTORY_PATH):
+            max_qps = None
+        limiter = TokenBucketLimiter(rate=max_qps, burst=concurrency) if max_qps else None
+
+        def _page(off: int) -> List[Dict[str, Any]]:
+            if limiter:
+                limiter.wait()
+            return self._fetch_inventory_page(url, access_token, off, length, extra_filters)
+
+        first = _page(start_offset)
+        if first:
+            yield first
+        if not first or len(first) < length:
+            return
+
+        next_offset = start_offset + length
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            done = False
+            while not done:
+                # 有自适应控制器时，窗口大小跟随其当前并发（不超过 concurrency）
+                window = min(concurrency, self.controller.concurrency) if self.controller else concurrency
+                offsets = [next_offset + i * length for i in range(window)]
+                futures = [pool.submit(_page, off) for off in offsets]
+                try:
+                    for fut in futures:
+                        rows = fut.result()
+                        if done:
+                            continue  # 短页之后的窗口页（应为空）直接丢弃
+                        if rows:
+                            yield rows
+                        if not rows or len(rows) < length:
+                            done = True
+                finally:
+                    # 异常或调用方提前停止迭代时，取消尚未开始的页
+                    for fut in futures:
+                        fut.cancel()
+                next_offset += window * length
+
+    def _fetch_inventory_page(
+        self,
+        url: str,
+        access_token: str,
+        offset: int,
+        length: int,
+        extra_filters: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        """
+        拉取单页 FBA 库存，返回该页 data。
+        签名策略：A=只签 query，B=query+body 同签（布尔小写化）；
+        先用该接口记住的策略，code=2001006 再换另一种。
+        """
+        return self._with_token_retry(
+            lambda token: self._fetch_inventory_page_once(url, token, offset, length, extra_filters), access_token
+        )
 
-            print("参与签名（B）字段：", {k: sign_b_params[k] for k in sorted(sign_b_params.keys())})
-            self._debug_prepared_request(
-                "POST", url, params_b, body,
-                mask_keys=["access_token", "sign"],
-                title="FBA库存 策略B（query+body同时签）"
-            )
+    def _fetch_inventory_page_once(
+        self,
+        url: str,
+        access_token: str,
+        offset: int,
+        length: int,
+        extra_filters: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        order = self._strategy_order(self.FBA_INVENTORY_PATH, ["A", "B"])
+        for i, strategy in enumerate(order):
+            params, body, title = self._inventory_page_request(access_token, offset, length, extra_filters, strategy)
+
+            # 每页都重新构造/序列化一遍请求只为打印，默认不做；logging 开 DEBUG 时才打印
+            if logger.isEnabledFor(logging.DEBUG):
+                self._debug_prepared_request(
+                    "POST", url, params, body,
+                    mask_keys=["access_token", "sign"],
+                    title=title
+                )
 
             try:
-                r = requests.post(url, params=params_b, json=body, timeout=20)
+                r = self._request("POST", url, params=params, json=body, timeout=20)
                 r.raise_for_status()
-                j = r.json()
+                j = json_codec.response_json(r)
             except Exception as e:
-                raise RuntimeError(f"拉库存失败（B）：{e}")
-
-            code = j.get("code")
-            ok = (code == 0) or (isinstance(code, str) and code == "0")
-            if not ok:
-                msg = j.get("message") or j.get("msg") or ""
-                raise RuntimeError(f"拉库存失败：code={code}, msg={msg}")
-
-            rows = j.get("data") or []
-            all_rows.extend(rows)
-            print(f"[INV] offset={offset}, got={len(rows)} (B:query+body-sign)")
-
-            if not rows or len(rows) < length:
-                break
-            offset += length
-
-        print(f"[INV] 合并库存行数：{len(all_rows)}")
-        return all_rows
+                raise RuntimeError(f"拉库存失败（{strategy}）：{e}")
+
+            label = self.INVENTORY_STRATEGY_LABELS[strategy]
+            rows = self._handle_page_response(j, self.FBA_INVENTORY_PATH, strategy, i, len(order), "拉库存")
+            if rows is not None:
+                print(f"[INV] offset={offset}, got={len(rows)} ({label})")
+                return rows
+            print(f"[INV] code=2001006（{label}），换另一种签名方式重试。")
+        raise RuntimeError("拉库存失败：没有可用的签名策略")
@@ -0,0 +1,254 @@
+# openapi_async.py
+import asyncio
+from typing import Optional, Dict, Any, AsyncIterator, List, Tuple
+
+try:
+    import httpx
+except ImportError:  # 可选依赖：只有用到异步客户端时才需要 pip install httpx
+    httpx = None
+
+import json_codec
+from openapi import OpenApiCore, TokenExpiredError
+from http_retry import EndpointRateLimiter, TokenBucketLimiter, parse_retry_after
+from token_provider import AsyncTokenProvider
+
+
+class AsyncOpenApiBase(OpenApiCore):
+    """
+    OpenApiBase 的 asyncio 版本：签名、token 缓存、签名策略缓存、分页语义与同步版一致，
+    HTTP 走 httpx.AsyncClient 长连接池，可用 asyncio.gather 同时跑多个账号/多个接口。
+
+        async with AsyncOpenApiBase(host, app_id, app_secret) as api:
+            token = await api.generate_access_token()
+            rows = await api.fetch_inventory_fba_data(token, concurrency=4)
+
+    与同步版的差异：不打印每页的 DEBUG 请求构造；429/5xx 的重试退避在本类内完成。
+    """
+    RETRY_STATUS = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        host: str,
+        app_id: str,
+        app_secret: str,
+        client: Optional["httpx.AsyncClient"] = None,
+        rate_limiter: Optional[EndpointRateLimiter] = None,
+        max_connections: int = 20,
+        max_retries: int = 5,
+        backoff_factor: float = 0.5,
+        cache_dir: Optional[str] = None,
+        token_renew_margin: float = 300.0,
+    ):
+        """
+        :param client: 可注入的 httpx.AsyncClient；默认新建一个长连接池客户端（由本实例负责关闭）
+        :param rate_limiter: 需支持 await .acquire(key)，key 为接口路径；默认按接口各自一个令牌桶（5 QPS，突发 5）
+        :param token_renew_margin: token 过期前多少秒开始后台续期
+        """
+        super().__init__(host, app_id, app_secret, cache_dir=cache_dir)
+        if client is None:
+            if httpx is None:
+                raise RuntimeError("AsyncOpenApiBase 需要 httpx：pip install httpx")
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+                timeout=httpx.Timeout(20.0, connect=3.0),
+            )
+            self._owns_client = True
+        else:
+            self._owns_client = False
+        self.client = client
+        self.rate_limiter = rate_limiter if rate_limiter is not None else EndpointRateLimiter(rate=5.0, burst=5)
+        self.max_retries = int(max_retries)
+        self.backoff_factor = float(backoff_factor)
+        # 与同步版同一套 token 缓存语义（内存优先、原子写盘、文件锁跨进程单飞）
+        self.token_provider = AsyncTokenProvider(self.token_cache_file, self._request_new_token,
+                                                 renew_margin=token_renew_margin)
+
+    async def aclose(self) -> None:
+        self.token_provider.close()
+        if self._owns_client:
+            await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncOpenApiBase":
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.aclose()
+
+    # ---------- 统一请求入口：限流 + 429/5xx 退避重试 ----------
+    async def _request(self, method: str, url: str, **kwargs) -> "httpx.Response":
+        path = httpx.URL(url).path if httpx is not None else url
+        attempt = 0
+        while True:
+            if self.rate_limiter is not None:
+                await self.rate_limiter.acquire(path)
+            resp = await self.client.request(method.upper(), url, **kwargs)
+            if resp.status_code not in self.RETRY_STATUS or attempt >= self.max_retries:
+                return resp
+            delay = parse_retry_after(resp.headers.get("Retry-After"))
+            if delay is None:
+                delay = self.backoff_factor * (2 ** attempt)
+            attempt += 1
+            print(f"[ASYNC] {resp.status_code} {path}，{delay:.2f}s 后第 {attempt} 次重试")
+            await asyncio.sleep(delay)
+
+    # ---------- 获取 access_token ----------
+    async def generate_access_token(self, force_refresh: bool = False) -> str:
+        if force_refresh:
+            return await self.token_provider.refresh(force=True)
+        return await self.token_provider.get()
+
+    async def _with_token_retry(self, fetch, access_token: str):
+        """同 OpenApiBase._with_token_retry：token 失效时单飞刷新，再重试一次。"""
+        token = await self.token_provider.current(access_token)
+        try:
+            return await fetch(token)
+        except TokenExpiredError as e:
+            print(f"[TOKEN] {e}；刷新 access_token 后重试一次")
+            return await fetch(await self.token_provider.refresh(stale=token))
+
+    async def _request_new_token(self) -> Tuple[str, int]:
+        """真正请求 token 接口（由 AsyncTokenProvider 在单飞锁内调用）。"""
+        url = f"{self.host}{self.TOKEN_PATH}"
+        form_data = {"appId": self.app_id, "appSecret": self.app_secret}
+        print("\n=== 获取新的 access_token（async） ===")
+        print("请求URL:", url)
+
+        resp = await self._request("POST", url, data=form_data, timeout=10)
+        resp.raise_for_status()
+        return self._parse_token_response(json_codec.response_json(resp))
+
+    # ---------- 店铺列表 ----------
+    async def fetch_amazon_shop_data(self, access_token: str, page_size: int = 100) -> Dict[str, Any]:
+        """同 OpenApiBase.fetch_amazon_shop_data。"""
+        all_rows: List[Dict[str, Any]] = []
+        async for rows in self.iter_amazon_shop_pages(access_token, page_size=page_size):
+            all_rows.extend(rows)
+        return self.build_shop_response(all_rows)
+
+    async def iter_amazon_shop_pages(self, access_token: str, page_size: int = 100) -> AsyncIterator[List[Dict[str, Any]]]:
+        url = f"{self.host}{self.SHOP_LIST_PATH}"
+        page = 1
+        page_size = max(20, min(200, int(page_size)))
+        while True:
+            rows = await self._fetch_shop_page(url, access_token, page, page_size)
+            if rows:
+                yield rows
+            if not rows or len(rows) < page_size:
+                break
+            page += 1
+
+    async def _fetch_shop_page(self, url: str, access_token: str, page: int, page_size: int) -> List[Dict[str, Any]]:
+        return await self._with_token_retry(
+            lambda token: self._fetch_shop_page_once(url, token, page, page_size), access_token
+        )
+
+    async def _fetch_shop_page_once(self, url: str, access_token: str, page: int, page_size: int) -> List[Dict[str, Any]]:
+        order = self._strategy_order(self.SHOP_LIST_PATH, ["A", "B"])
+        for i, strategy in enumerate(order):
+            params = self._shop_page_params(access_token, page, page_size, strategy)
+            try:
+                r = await self._request("GET", url, params=params, timeout=20)
+                r.raise_for_status()
+                j = json_codec.response_json(r)
+            except Exception as e:
+                raise RuntimeError(f"拉店铺失败（{strategy}）：{e}")
+
+            label = self.SHOP_STRATEGY_LABELS[strategy]
+            rows = self._handle_page_response(j, self.SHOP_LIST_PATH, strategy, i, len(order), "拉店铺")
+            if rows is not None:
+                print(f"[SHOPS] page={page}, got={len(rows)} ({label})")
+                return rows
+            print(f"[SHOPS] code=2001006（{label}），换另一种签名方式重试。")
+        raise RuntimeError("拉店铺失败：没有可用的签名策略")
+
+    # ---------- FBA 库存 ----------
+    async def fetch_inventory_fba_data(
+        self,
+        access_token: str,
+        length: int = 200,
+        extra_filters: Optional[Dict[str, Any]] = None,
+        concurrency: int = 1,
+        max_qps: Optional[float] = None,
+    ) -> List[Dict[str, Any]]:
+        """同 OpenApiBase.fetch_inventory_fba_data（concurrency > 1 时按窗口并发，结果按 offset 顺序）。"""
+        all_rows: List[Dict[str, Any]] = []
+        async for rows in self.iter_inventory_fba_pages(
+            access_token, length=length, extra_filters=extra_filters,
+            concurrency=concurrency, max_qps=max_qps,
+        ):
+            all_rows.extend(rows)
+        print(f"[INV] 合并库存行数：{len(all_rows)}")
+        return all_rows
+
+    async def iter_inventory_fba_pages(
+        self,
+        access_token: str,
+        length: int = 200,
+        extra_filters: Optional[Dict[str, Any]] = None,
+        concurrency: int = 1,
+        max_qps: Optional[float] = None,
+    ) -> AsyncIterator[List[Dict[str, Any]]]:
+        url = f"{self.host}{self.FBA_INVENTORY_PATH}"
+        length = max(20, min(200, int(length)))
+        concurrency = max(1, int(concurrency))
+        limiter = TokenBucketLimiter(rate=max_qps, burst=concurrency) if max_qps else None
+
+        async def _page(off: int) -> List[Dict[str, Any]]:
+            if limiter:
+                await limiter.acquire()
+            return await self._fetch_inventory_page(url, access_token, off, length, extra_filters)
+
+        first = await _page(0)
+        if first:
+            yield first
+        if not first or len(first) < length:
+            return
+
+        next_offset = length
+        while True:
+            offsets = [next_offset + i * length for i in range(concurrency)]
+            pages = await asyncio.gather(*(_page(off) for off in offsets))
+            for rows in pages:
+                if rows:
+                    yield rows
+                if not rows or len(rows) < length:
+                    return  # 短页之后的窗口页直接丢弃
+            next_offset += concurrency * length
+
+    async def _fetch_inventory_page(
+        self,
+        url: str,
+        access_token: str,
+        offset: int,
+        length: int,
+        extra_filters: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        return await self._with_token_retry(
+            lambda token: self._fetch_inventory_page_once(url, token, offset, length, extra_filters), access_token
+        )
+
+    async def _fetch_inventory_page_once(
+        self,
+        url: str,
+        access_token: str,
+        offset: int,
+        length: int,
+        extra_filters: Optional[Dict[str, Any]],
+    ) -> List[Dict[str, Any]]:
+        order = self._strategy_order(self.FBA_INVENTORY_PATH, ["A", "B"])
+        for i, strategy in enumerate(order):
+            params, body, _title = self._inventory_page_request(access_token, offset, length, extra_filters, strategy)
+            try:
+                r = await self._request("POST", url, params=params, json=body, timeout=20)
+                r.raise_for_status()
+                j = json_codec.response_json(r)
+            except Exception as e:
+                raise RuntimeError(f"拉库存失败（{strategy}）：{e}")
+
+            label = self.INVENTORY_STRATEGY_LABELS[strategy]
+            rows = self._handle_page_response(j, self.FBA_INVENTORY_PATH, strategy, i, len(order), "拉库存")
+            if rows is not None:
+                print(f"[INV] offset={offset}, got={len(rows)} ({label})")
+                return rows
+            print(f"[INV] code=2001006（{label}），换另一种签名方式重试。")
+        raise RuntimeError("拉库存失败：没有可用的签名策略")
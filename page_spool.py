@@ -0,0 +1,126 @@
+# page_spool.py
+"""
+原始接口页的本地留存（spool）：只追加、gzip 压缩，一页一条记录（JSON 一行）：
+    {"endpoint": ..., "app_id": ..., "fetched_at": ..., "request": {...分页/筛选参数}, "rows": [...接口原始 data]}
+每条记录单独压成一个 gzip member 追加到文件末尾（多 member 拼接仍是合法的 .gz，zcat 可直接看），
+进程中途被杀最多丢掉最后半条，之前的记录都能读出来。
+作业整次跑完（覆盖了全量数据）后调用 mark_complete()，文件改名为 *.complete.jsonl.gz；
+中途失败、增量或只拉了部分分片的运行不改名。replay.py 默认只重放最近一次完整运行的文件。
+replay.py 从这里重放规范化 + UPSERT，不再调用接口。
+"""
+import gzip
+import os
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+import json_codec
+
+
+COMPLETE_SUFFIX = ".complete.jsonl.gz"
+
+
+class PageSpool:
+    def __init__(self, path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self.pages = 0
+        self.rows = 0
+
+    @classmethod
+    def for_run(cls, spool_dir, name: str, app_id: str, keep_days: Optional[float] = None) -> "PageSpool":
+        """
+        按账号 + 作业 + 启动时间新建一个 spool 文件，如 spool_dir/ak_xxx/inventory/20260501-080000-1234.jsonl.gz
+        （多个账号共用 spool_dir 时各写各的目录）。keep_days 给定时顺带删掉该目录下更早的旧文件。
+        """
+        directory = Path(spool_dir) / app_id / name
+        if keep_days is not None:
+            prune_spool(directory, keep_days)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        return cls(directory / f"{stamp}-{os.getpid()}.jsonl.gz")
+
+    def write(self, endpoint: str, app_id: str, request: Dict[str, Any], rows: List[Dict[str, Any]]) -> None:
+        record = {
+            "endpoint": endpoint,
+            "app_id": app_id,
+            "fetched_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "request": request,
+            "rows": rows,
+        }
+        # 压缩在锁外做，多个拉取线程只在追加时串行
+        data = gzip.compress(json_codec.dumps_bytes(record) + b"\n", compresslevel=6)
+        with self._lock:
+            with open(self.path, "ab") as f:
+                f.write(data)
+            self.pages += 1
+            self.rows += len(rows)
+
+    def mark_complete(self) -> Path:
+        """标记本次运行完整（文件改名为 *.complete.jsonl.gz；一页都没有时也留一个空文件作记录），返回新路径。"""
+        with self._lock:
+            if not is_complete(self.path):
+                self.path.touch()
+                target = self.path.with_name(self.path.name[:-len(".jsonl.gz")] + COMPLETE_SUFFIX)
+                os.replace(self.path, target)
+                self.path = target
+        return self.path
+
+    def __repr__(self) -> str:
+        return f"PageSpool({str(self.path)!r}, pages={self.pages}, rows={self.rows})"
+
+
+def read_spool(paths: Iterable, endpoint: Optional[str] = None,
+               app_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """
+    按文件顺序读出记录（endpoint / app_id 给定时只要该接口、该账号的页）；
+    文件末尾被截断的半条记录跳过并告警。
+    """
+    for path in paths:
+        with gzip.open(path, "rb") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    record = json_codec.loads(line)
+                    if endpoint is not None and record.get("endpoint") != endpoint:
+                        continue
+                    if app_id is not None and record.get("app_id") != app_id:
+                        continue
+                    yield record
+            except (EOFError, gzip.BadGzipFile, zlib.error, ValueError) as e:
+                print(f"⚠️ spool 文件 {path} 末尾记录不完整，已跳过：{e}")
+
+
+def spool_files(spool_dir, name: str, app_id: str) -> List[Path]:
+    """spool_dir/app_id/name 下的全部 spool 文件（文件名带时间戳，按名字排序即按时间先后）。"""
+    return sorted((Path(spool_dir) / app_id / name).glob("*.jsonl.gz"))
+
+
+def is_complete(path) -> bool:
+    """该 spool 文件是否来自一次完整跑完的运行（见 PageSpool.mark_complete）。"""
+    return Path(path).name.endswith(COMPLETE_SUFFIX)
+
+
+def latest_complete_spool(spool_dir, name: str, app_id: str) -> Optional[Path]:
+    """spool_dir/app_id/name 下最近一次完整运行的 spool 文件；没有则返回 None。"""
+    complete = [p for p in spool_files(spool_dir, name, app_id) if is_complete(p)]
+    return complete[-1] if complete else None
+
+
+def prune_spool(directory, keep_days: float) -> int:
+    """删掉 directory 下修改时间早于 keep_days 天的 spool 文件，返回删除个数。"""
+    cutoff = time.time() - keep_days * 86400
+    removed = 0
+    for path in Path(directory).glob("*.jsonl.gz"):
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    if removed:
+        print(f"[SPOOL] 已清理 {directory} 下 {removed} 个超过 {keep_days:g} 天的旧文件")
+    return removed
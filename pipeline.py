@@ -0,0 +1,66 @@
+# pipeline.py
+import queue
+import threading
+from typing import Iterable, Iterator, List, TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+
+
+def batched_pages(pages: Iterable[List[T]], pages_per_batch: int = 1) -> Iterator[List[T]]:
+    """把逐页数据按 N 页合并成一批（最后一批可能不足 N 页）。"""
+    pages_per_batch = max(1, int(pages_per_batch))
+    buf: List[T] = []
+    n = 0
+    for page in pages:
+        buf.extend(page)
+        n += 1
+        if n >= pages_per_batch:
+            yield buf
+            buf, n = [], 0
+    if buf:
+        yield buf
+
+
+def prefetch(source: Iterable[T], depth: int = 1) -> Iterator[T]:
+    """
+    后台线程提前拉取 source 的下一项（最多缓存 depth 项），
+    让“拉下一页”和“处理/写库当前页”重叠进行。
+    - source 抛出的异常会在消费方原样抛出
+    - 消费方提前结束（break/异常）时，后台线程会尽快退出
+    """
+    q: "queue.Queue" = queue.Queue(maxsize=max(1, int(depth)))
+    stop = threading.Event()
+
+    def _put(item) -> bool:
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _producer():
+        try:
+            for item in source:
+                if not _put((item, None)):
+                    return
+        except BaseException as e:  # 交给消费方处理
+            _put((_DONE, e))
+            return
+        _put((_DONE, None))
+
+    t = threading.Thread(target=_producer, name="prefetch", daemon=True)
+    t.start()
+    try:
+        while True:
+            item, err = q.get()
+            if item is _DONE:
+                if err is not None:
+                    raise err
+                return
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,120 @@
+# replay.py
+"""
+从 page_spool 留存的原始接口页重放规范化 + UPSERT，不调用领星接口（不耗接口配额）。
+表结构或规范化逻辑改了之后，用它重建 stores / inventory_fba_current。
+
+用法：
+    python replay.py inventory                       # 重放 .cache/spool/<APP_ID>/inventory 下最近一次完整运行的文件
+    python replay.py inventory --all                 # 按时间先后重放该目录下全部文件（含中途失败/增量的运行）
+    python replay.py stores .cache/spool/ak_xxx/stores/20260501-080000-1234.complete.jsonl.gz
+    python replay.py inventory --app-id ak_xxx       # 指定账号（默认 main_inventory.APP_ID）
+    python replay.py inventory --snapshot            # 写影子表后原子切换（spool 里没有的行随之删除）
+只重放该账号拉到的页（记录里的 app_id 不符的跳过），不会把别的账号的数据写进来。
+同一行在多个文件/多页里出现时，后拉到的覆盖先拉到的。
+--snapshot 会删掉 spool 里没有的行，所以只接受恰好一个完整运行的文件（*.complete.jsonl.gz），
+不能拿多次运行拼起来或半截的运行去切换，否则早已下架的 SKU 会被重新写回、没拉到的会被误删。
+"""
+import argparse
+
+from db_utils import DBHelper
+from inventory_rows import InventoryBatch
+from openapi import OpenApiCore
+from page_spool import is_complete, latest_complete_spool, read_spool, spool_files
+from pipeline import batched_pages
+
+SPOOL_DIR = ".cache/spool"
+
+
+def replay_inventory(db, paths, source_system="LINGXING", platform="AMAZON", pages_per_batch=5,
+                     snapshot=False, writers=1, app_id=None):
+    """
+    把 spool 里的 FBA 库存页（app_id 给定时只取该账号的）重新规范化并 UPSERT；返回 (行数, 受影响行数)。
+    snapshot=True 时 paths 必须恰好是一个完整运行的文件。
+    """
+    paths = list(paths)
+    if snapshot and (len(paths) != 1 or not is_complete(paths[0])):
+        raise ValueError(f"快照重放只接受恰好一个完整运行的 spool 文件（*.complete.jsonl.gz），收到：{paths}")
+    pages = (r["rows"] for r in read_spool(paths, endpoint=OpenApiCore.FBA_INVENTORY_PATH, app_id=app_id))
+    table = db.start_inventory_snapshot(source_system) if snapshot else "inventory_fba_current"
+    if not snapshot:
+        db.create_inventory_fba_current_table()
+    total_rows = affected = 0
+    try:
+        for raw in batched_pages(pages, pages_per_batch):
+            batch = InventoryBatch.from_api_rows(raw, source_system=source_system, platform=platform)
+            total_rows += len(batch)
+            affected += db.upsert_inventory_fba_current_from_api(
+                batch, source_system=source_system, platform=platform,
+                skip_unchanged=snapshot, table=table, writers=writers,
+            )
+    except Exception:
+        if snapshot:
+            db.abort_inventory_snapshot()
+        raise
+    if snapshot:
+        if total_rows:
+            db.swap_inventory_snapshot()
+        else:
+            db.abort_inventory_snapshot()  # spool 里没有库存页时不切换，避免清空线上表
+    return total_rows, affected
+
+
+def replay_stores(db, paths, source_system="LINGXING", platform="AMAZON", app_id=None):
+    """把 spool 里的店铺列表页（app_id 给定时只取该账号的）重新 UPSERT 进 stores；返回 (店铺数, 受影响行数)。"""
+    db.create_stores_table()
+    shops = affected = 0
+    for record in read_spool(paths, endpoint=OpenApiCore.SHOP_LIST_PATH, app_id=app_id):
+        shops += len(record["rows"])
+        affected += db.upsert_stores_from_api(record["rows"], source_system=source_system, platform=platform)
+    return shops, affected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从本地 spool 重放入库（不调接口）")
+    parser.add_argument("target", choices=["inventory", "stores"])
+    parser.add_argument("files", nargs="*",
+                        help="spool 文件；不给则取 --spool-dir/<app_id>/<target> 下最近一次完整运行的文件")
+    parser.add_argument("--spool-dir", default=SPOOL_DIR)
+    parser.add_argument("--all", action="store_true", help="不给文件时重放目录下全部文件（不能与 --snapshot 同用）")
+    parser.add_argument("--app-id", default=None, help="只重放该账号的页（默认 main_inventory.APP_ID）")
+    parser.add_argument("--snapshot", action="store_true", help="inventory：写影子表后原子切换")
+    parser.add_argument("--writers", type=int, default=1, help="inventory：并行写库的连接数")
+    args = parser.parse_args()
+
+    from main_inventory import APP_ID, DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, DB_LOCAL_INFILE
+    app_id = args.app_id or APP_ID
+    if args.snapshot and args.all:
+        parser.error("--snapshot 只接受一次完整运行，不能与 --all 同用")
+    if args.files:
+        paths = args.files
+    elif args.all:
+        paths = spool_files(args.spool_dir, args.target, app_id)
+    else:
+        latest = latest_complete_spool(args.spool_dir, args.target, app_id)
+        paths = [latest] if latest else []
+    if not paths:
+        print(f"❌ 没有找到{'' if args.all or args.files else '完整运行的'} spool 文件：{args.spool_dir}/{app_id}/{args.target}")
+        return
+    if args.snapshot and (len(paths) != 1 or not is_complete(paths[0])):
+        print(f"❌ --snapshot 只接受恰好一个完整运行的 spool 文件（*.complete.jsonl.gz）：{paths}")
+        return
+
+    db = DBHelper(DB_HOST, DB_PORT, DB_USER, DB_PASSWORD, DB_NAME, local_infile=DB_LOCAL_INFILE)
+    db.connect()
+    try:
+        print(f"=== 重放 {len(paths)} 个 spool 文件（{app_id}）→ {args.target} ===")
+        if args.target == "inventory":
+            rows, affected = replay_inventory(db, paths, snapshot=args.snapshot, writers=args.writers, app_id=app_id)
+        else:
+            rows, affected = replay_stores(db, paths, app_id=app_id)
+        print(f"✅ 重放完成：rows={rows}, affected={affected}")
+    except Exception as e:
+        print(f"❌ 重放失败：{e}")
+        if db.progress_note():
+            print(f"progress: {db.progress_note()}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+# runner.py
+"""
+多账号分片同步：把 (账号 × 作业) 分发到进程池，每个组合一个独立进程任务：
+- 独立的 OpenApiBase（token/签名策略缓存放在各自的 cache_dir，限流预算各自独立）
+- 独立的 DB 连接，并各写一条 ingestion_runs（job_name 形如 "sync_inventory_from_lingxing@店铺A"）
+- 最后打印汇总
+
+用法：python runner.py accounts.json --jobs stores,inventory --workers 4
+accounts.json 示例：
+[
+  {"name": "acc1", "app_id": "ak_xxx", "app_secret": "...",
+   "db": {"host": "127.0.0.1", "port": 3306, "user": "root", "password": "...", "db_name": "LXTESTN8N"},
+   "rate": 5, "burst": 5}
+]
+"""
+import argparse
+import importlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from db_utils import DBHelper
+from http_retry import EndpointRateLimiter
+from ingestion_runs_repo import IngestionRunsRepo, IngestionRun
+
+LINGXING_HOST = "https://openapi.lingxing.com"
+
+# 作业名 → (模块, 作业函数, 运行记录里的 job_name 前缀)
+JOBS = {
+    "stores": ("main", "sync_stores", "sync_stores_from_lingxing"),
+    "inventory": ("main_inventory", "sync_inventory", "sync_inventory_from_lingxing"),
+}
+
+
+@dataclass
+class Account:
+    name: str
+    app_id: str
+    app_secret: str
+    db: Dict[str, Any]
+    host: str = LINGXING_HOST
+    rate: float = 5.0            # 该账号每个接口的 QPS 预算
+    burst: int = 5
+    cache_dir: Optional[str] = None  # 默认 .cache/<name>
+
+    def resolved_cache_dir(self) -> str:
+        return self.cache_dir or os.path.join(".cache", self.name)
+
+
+@dataclass
+class JobResult:
+    account: str
+    job: str
+    started_at: datetime
+    ended_at: datetime
+    success_count: int = 0
+    fail_count: int = 0
+    note: Optional[str] = None
+
+
+def _build_api(account: Account, job: str):
+    cache_dir = account.resolved_cache_dir()
+    os.makedirs(cache_dir, exist_ok=True)
+    limiter = EndpointRateLimiter(rate=account.rate, burst=account.burst)
+    if job == "inventory":
+        from main_inventory import build_inventory_api
+        return build_inventory_api(account.host, account.app_id, account.app_secret,
+                                   rate_limiter=limiter, cache_dir=cache_dir)
+    from openapi import OpenApiBase
+    return OpenApiBase(account.host, account.app_id, account.app_secret,
+                       rate_limiter=limiter, cache_dir=cache_dir)
+
+
+def run_account_job(account: Account, job: str) -> JobResult:
+    """在子进程里跑一个 (账号, 作业)，无论成败都写一条 ingestion_runs。"""
+    module_name, func_name, job_prefix = JOBS[job]
+    job_name = f"{job_prefix}@{account.name}"
+    started_at = datetime.now()
+    result = JobResult(account=account.name, job=job, started_at=started_at, ended_at=started_at)
+
+    db = DBHelper(**account.db)
+    try:
+        db.connect()
+        api = _build_api(account, job)
+        job_func = getattr(importlib.import_module(module_name), func_name)
+        result.success_count, result.note = job_func(api, db)
+    except Exception as e:
+        result.fail_count = 1
+        result.note = f"error: {e}"
+        if db.progress_note():  # 已提交到哪一块，便于判断部分写入
+            result.note += f"; progress: {db.progress_note()}"
+        print(f"❌ [{job_name}] 执行错误：{e}")
+    finally:
+        result.ended_at = datetime.now()
+        try:
+            repo = IngestionRunsRepo(db)
+            repo.ensure_table()
+            repo.insert_run(IngestionRun(
+                job_name=job_name,
+                started_at=result.started_at,
+                ended_at=result.ended_at,
+                success_count=result.success_count,
+                fail_count=result.fail_count,
+                note=result.note,
+            ))
+        except Exception as e2:
+            print(f"⚠️ [{job_name}] 写运行记录失败：{e2}")
+        finally:
+            db.close()
+    return result
+
+
+def run_all(accounts: List[Account], jobs: List[str], max_workers: int = 4) -> List[JobResult]:
+    """把 accounts × jobs 分发到进程池，返回全部结果（按账号、作业排序）。"""
+    for job in jobs:
+        if job not in JOBS:
+            raise ValueError(f"未知作业：{job}（可选：{', '.join(JOBS)}）")
+
+    results: List[JobResult] = []
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(run_account_job, acc, job): (acc.name, job) for acc in accounts for job in jobs}
+        for fut in as_completed(futures):
+            name, job = futures[fut]
+            try:
+                results.append(fut.result())
+            except Exception as e:  # 子进程崩溃等
+                now = datetime.now()
+                results.append(JobResult(account=name, job=job, started_at=now, ended_at=now,
+                                         fail_count=1, note=f"worker crashed: {e}"))
+    results.sort(key=lambda r: (r.account, r.job))
+    return results
+
+
+def print_summary(results: List[JobResult]) -> None:
+    print("\n====== 多账号同步汇总 ======")
+    for r in results:
+        status = "✅" if r.fail_count == 0 else "❌"
+        secs = (r.ended_at - r.started_at).total_seconds()
+        print(f"{status} {r.account:<20} {r.job:<10} {secs:>8.1f}s  success={r.success_count}  {r.note}")
+    ok = sum(1 for r in results if r.fail_count == 0)
+    print(f"合计：{len(results)} 个任务，成功 {ok}，失败 {len(results) - ok}")
+    print("============================\n")
+
+
+def load_accounts(path: str) -> List[Account]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [Account(**item) for item in json.load(f)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="多账号分片同步")
+    parser.add_argument("accounts", help="账号配置 JSON 文件")
+    parser.add_argument("--jobs", default="stores,inventory", help="逗号分隔：stores,inventory")
+    parser.add_argument("--workers", type=int, default=4, help="进程数")
+    args = parser.parse_args()
+
+    results = run_all(load_accounts(args.accounts), [j.strip() for j in args.jobs.split(",") if j.strip()],
+                      max_workers=args.workers)
+    print_summary(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,75 @@
 import hashlib
 import base64
+import logging
+import threading
+from typing import Dict, Iterable, List
+
 from Crypto.Cipher import AES
 from Crypto.Util.Padding import pad
 
-class SignBase:
-    @staticmethod
-    def generate_sign(query_param: dict, app_id: str) -> str:
-        """按领星文档生成签名：参数ASCII排序→拼接→MD5大写→AES-ECB-PKCS5→Base64"""
-        # 1. 过滤value为空的参数（value为None保留）
-        filtered_params = {}
-        for k, v in query_param.items():
-            if v == "" or v is None:
-                continue
-            filtered_params[k] = str(v)
+logger = logging.getLogger(__name__)
 
-        # 2. 按ASCII排序
-        sorted_items = sorted(filtered_params.items(), key=lambda x: x[0])
 
-        # 3. 拼接成 key1=value1&key2=value2 格式
-        concat_str = "&".join([f"{k}={v}" for k, v in sorted_items])
-        print(f"签名-拼接字符串：{concat_str}")
+class Signer:
+    """
+    绑定单个 app_id 的签名器：AES 密钥与 cipher 只准备一次（cipher 按线程复用），
+    调试信息只在 logging 打开 DEBUG 时输出，不再每次 print。
+    """
+    _instances: Dict[str, "Signer"] = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, app_id: str):
+        self.app_id = app_id
+        # AES-ECB-PKCS5PADDING 的密钥为 app_id，补齐16字节（AES密钥必须16/24/32字节）
+        self._key = app_id.ljust(16, '\0').encode("utf-8")
+        self._local = threading.local()
+
+    @classmethod
+    def for_app(cls, app_id: str) -> "Signer":
+        """按 app_id 复用的签名器实例。"""
+        signer = cls._instances.get(app_id)
+        if signer is None:
+            with cls._instances_lock:
+                signer = cls._instances.setdefault(app_id, cls(app_id))
+        return signer
+
+    def _cipher(self):
+        cipher = getattr(self._local, "cipher", None)
+        if cipher is None:
+            # ECB 无状态，同一线程内可以反复 encrypt
+            cipher = self._local.cipher = AES.new(self._key, AES.MODE_ECB)
+        return cipher
+
+    def sign(self, query_param: dict) -> str:
+        """按领星文档生成签名：参数ASCII排序→拼接→MD5大写→AES-ECB-PKCS5→Base64"""
+        # 1~3. 过滤空值（"" / None）→ 按 key 的 ASCII 排序 → key1=value1&key2=value2
+        concat_str = "&".join(
+            f"{k}={v}" for k, v in sorted(
+                (k, str(v)) for k, v in query_param.items() if not (v == "" or v is None)
+            )
+        )
 
         # 4. MD5加密（32位大写）
-        md5 = hashlib.md5()
-        md5.update(concat_str.encode("utf-8"))
-        md5_str = md5.hexdigest().upper()
-        print(f"签名-MD5结果：{md5_str}")
+        md5_str = hashlib.md5(concat_str.encode("utf-8")).hexdigest().upper()
 
-        # 5. AES-ECB-PKCS5PADDING加密（密钥为app_id，补齐16字节）
-        key = app_id.ljust(16, '\0').encode("utf-8")  # AES密钥必须16/24/32字节
-        cipher = AES.new(key, AES.MODE_ECB)
-        padded_data = pad(md5_str.encode("utf-8"), AES.block_size, style='pkcs7')  # PKCS5兼容PKCS7
-        aes_encrypted = cipher.encrypt(padded_data)
+        # 5. AES-ECB-PKCS5PADDING加密（PKCS5兼容PKCS7）
+        aes_encrypted = self._cipher().encrypt(pad(md5_str.encode("utf-8"), AES.block_size, style='pkcs7'))
 
         # 6. Base64编码
         sign = base64.b64encode(aes_encrypted).decode("utf-8")
-        print(f"签名-最终结果：{sign}")
-        return sign
\ No newline at end of file
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("签名-拼接字符串：%s", concat_str)
+            logger.debug("签名-MD5结果：%s", md5_str)
+            logger.debug("签名-最终结果：%s", sign)
+        return sign
+
+    def sign_many(self, queries: Iterable[dict]) -> List[str]:
+        """批量签名（例如一次性为一个并发窗口里的所有页签名）。"""
+        return [self.sign(q) for q in queries]
+
+
+class SignBase:
+    @staticmethod
+    def generate_sign(query_param: dict, app_id: str) -> str:
+        """按领星文档生成签名：参数ASCII排序→拼接→MD5大写→AES-ECB-PKCS5→Base64"""
+        return Signer.for_app(app_id).sign(query_param)
@@ -0,0 +1,122 @@
+# sync_checkpoints_repo.py
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+DDL_SYNC_CHECKPOINTS = """
+CREATE TABLE IF NOT EXISTS sync_checkpoints (
+  id BIGINT PRIMARY KEY AUTO_INCREMENT,
+  account VARCHAR(100) NOT NULL COMMENT '账号（app_id）',
+  endpoint VARCHAR(200) NOT NULL COMMENT '接口路径',
+  high_water_mark DATETIME NULL COMMENT '上次成功同步的起始时间（下次只要此后变化的行）',
+  cursor_value VARCHAR(255) NULL COMMENT '轮转分片的下一个起点（sid 列表下标）',
+  last_full_at DATETIME NULL COMMENT '上次全量对账的起始时间',
+  updated_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  UNIQUE KEY uk_account_endpoint (account, endpoint)
+) COMMENT='增量同步水位线';
+"""
+
+@dataclass
+class SyncCheckpoint:
+    account: str
+    endpoint: str
+    high_water_mark: object = None  # datetime
+    cursor_value: str = None
+    last_full_at: object = None     # datetime
+
+@dataclass
+class SyncPlan:
+    """
+    本次同步怎么拉：
+    - mode="full"：全量对账
+    - mode="changed_since"：接口支持变更时间过滤，filters 里带上水位线
+    - mode="sid_slice"：按 sid 轮转，只拉 sids 这一片
+    next_checkpoint 在同步成功后保存。
+    """
+    mode: str
+    filters: Dict[str, str] = field(default_factory=dict)
+    sids: List[int] = field(default_factory=list)
+    next_checkpoint: SyncCheckpoint = None
+
+def plan_incremental_sync(checkpoint: Optional[SyncCheckpoint], account: str, endpoint: str, now: datetime,
+                          sids: List[int], full_every: timedelta, changed_since_filter: Optional[str] = None,
+                          sid_slice: int = 20) -> SyncPlan:
+    """
+    根据水位线决定本次拉取范围：
+    - 没有水位线，或距上次全量对账超过 full_every：全量
+    - 配了 changed_since_filter（接口的变更时间参数名）：只要水位线之后变化的行
+    - 否则按 sid 轮转：每次 sid_slice 个店铺，下一次从上次停下的位置继续，绕回开头
+    now 作为新的水位线（取拉取开始的时间，拉取期间发生的变化下次还会再拉到）。
+    """
+    prev = checkpoint or SyncCheckpoint(account=account, endpoint=endpoint)
+    nxt = SyncCheckpoint(account=account, endpoint=endpoint, high_water_mark=now,
+                         cursor_value=prev.cursor_value, last_full_at=prev.last_full_at)
+
+    if prev.high_water_mark is None or prev.last_full_at is None or now - prev.last_full_at >= full_every:
+        nxt.last_full_at = now
+        return SyncPlan(mode="full", next_checkpoint=nxt)
+
+    if changed_since_filter:
+        since = prev.high_water_mark.strftime("%Y-%m-%d %H:%M:%S")
+        return SyncPlan(mode="changed_since", filters={changed_since_filter: since}, next_checkpoint=nxt)
+
+    ordered = sorted(set(sids))
+    if not ordered:  # 还没有店铺列表时只能全量
+        nxt.last_full_at = now
+        return SyncPlan(mode="full", next_checkpoint=nxt)
+    start = int(prev.cursor_value or 0) % len(ordered)
+    n = min(max(1, int(sid_slice)), len(ordered))
+    part = (ordered + ordered)[start:start + n]
+    nxt.cursor_value = str((start + n) % len(ordered))
+    return SyncPlan(mode="sid_slice", filters={"sid": ",".join(str(s) for s in part)}, sids=part,
+                    next_checkpoint=nxt)
+
+class SyncCheckpointsRepo:
+    def __init__(self, db_helper):
+        self.db = db_helper
+
+    def _ensure_connected(self):
+        if not getattr(self.db, "cursor", None):
+            self.db.connect()
+        if not getattr(self.db, "cursor", None):
+            raise RuntimeError("DB not connected; cannot operate sync_checkpoints")
+
+    def ensure_table(self):
+        self._ensure_connected()
+        self.db.cursor.execute(DDL_SYNC_CHECKPOINTS)
+        self.db.conn.commit()
+
+    def get(self, account: str, endpoint: str) -> Optional[SyncCheckpoint]:
+        self._ensure_connected()
+        self.db.cursor.execute(
+            "SELECT high_water_mark, cursor_value, last_full_at FROM sync_checkpoints "
+            "WHERE account = %s AND endpoint = %s",
+            (account, endpoint),
+        )
+        row = self.db.cursor.fetchone()
+        if not row:
+            return None
+        if not isinstance(row, dict):
+            row = dict(zip(("high_water_mark", "cursor_value", "last_full_at"), row))
+        return SyncCheckpoint(account=account, endpoint=endpoint, **row)
+
+    def save(self, cp: SyncCheckpoint):
+        self._ensure_connected()
+        sql = """
+        INSERT INTO sync_checkpoints (account, endpoint, high_water_mark, cursor_value, last_full_at)
+        VALUES (%s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE
+          high_water_mark = VALUES(high_water_mark),
+          cursor_value = VALUES(cursor_value),
+          last_full_at = VALUES(last_full_at)
+        """
+        def _save():
+            self.db.cursor.execute(sql, (cp.account, cp.endpoint, cp.high_water_mark,
+                                         cp.cursor_value, cp.last_full_at))
+            self.db.conn.commit()
+
+        with_reconnect = getattr(self.db, "_with_reconnect", None)
+        if with_reconnect is not None:
+            with_reconnect(_save)
+        else:
+            _save()
@@ -1,6 +1,133 @@
 # tests/conftest.py
 import os, sys
+import threading
+
+import pytest
+from pymysql.err import IntegrityError, OperationalError
+
 # 把项目根目录加入 sys.path（tests 的上一级目录）
 ROOT = os.path.dirname(os.path.dirname(__file__))
 if ROOT not in sys.path:
     sys.path.insert(0, ROOT)
+
+
+# ===================== 假 MySQL（DBHelper 单元测试共用） =====================
+class FakeServer:
+    """按调用次数注入故障：第 N 次 executemany 断线（fail_on）或死锁（deadlock_on），LOAD DATA 依次报 load_data_errors。"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fail_on = set()
+        self.deadlock_on = set()
+        self.load_data_errors = []
+        self.calls = 0
+        self.connects = 0
+        self.chunks = []  # 每次提交的一块
+        self.threads = set()
+        self.executed = []  # execute() 过的 (sql, args)
+        self.reject = None  # 可选：reject(row) 为真时含该行的 INSERT 报错（模拟单行坏数据）
+
+    @property
+    def committed(self):
+        return [r for chunk in self.chunks for r in chunk]
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.rowcount = 0
+
+    def executemany(self, sql, rows):
+        server = self.conn.server
+        with server.lock:
+            server.calls += 1
+            server.threads.add(threading.current_thread().name)
+            if server.calls in server.fail_on:
+                raise OperationalError(2013, "Lost connection to MySQL server during query")
+            if server.calls in server.deadlock_on:
+                raise OperationalError(1213, "Deadlock found when trying to get lock")
+        self.conn.pending.extend(rows)
+        self.rowcount = len(rows)
+
+    def execute(self, sql, args=None):
+        self.rowcount = 0
+        server = self.conn.server
+        with server.lock:
+            server.executed.append((sql, args))
+        if sql.startswith("LOAD DATA") and server.load_data_errors:
+            raise OperationalError(server.load_data_errors.pop(0), "LOAD DATA failed")
+        if sql.lstrip().startswith("INSERT") and args:
+            # 多行 VALUES 按占位元组个数切回一行一组，和 executemany 一样先挂在连接上等提交
+            width = len(args) // sql.count("(%s")
+            rows = [tuple(args[i:i + width]) for i in range(0, len(args), width)]
+            if server.reject and any(server.reject(r) for r in rows):
+                raise IntegrityError(1366, "Incorrect integer value")
+            self.conn.pending.extend(rows)
+            self.rowcount = len(rows)
+
+    def close(self):
+        pass
+
+
+class FakeConn:
+    """未提交的行留在连接上，断线重连换新连接时随之丢失。"""
+
+    def __init__(self, server):
+        self.server = server
+        self.pending = []
+
+    def cursor(self, *_):
+        return FakeCursor(self)
+
+    def commit(self):
+        if self.pending:
+            with self.server.lock:
+                self.server.chunks.append(list(self.pending))
+        self.pending.clear()
+
+    def rollback(self):
+        self.pending.clear()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def fake_server():
+    return FakeServer()
+
+
+@pytest.fixture
+def fake_db(fake_server, monkeypatch):
+    """直连 fake_server 的 DBHelper（pymysql.connect 被替换），重连/锁冲突重试都不等待。"""
+    import db_utils
+
+    def fake_connect(**_):
+        fake_server.connects += 1
+        return FakeConn(fake_server)
+
+    monkeypatch.setattr(db_utils.pymysql, "connect", fake_connect)
+    db = db_utils.DBHelper("h", 3306, "u", "p", "d")
+    db.RECONNECT_BACKOFF = 0
+    db.LOCK_CONFLICT_BACKOFF = 0
+    db.connect()
+    return db
+
+
+@pytest.fixture
+def make_pooled_db(fake_server):
+    """工厂：连接都从连 fake_server 的连接池里借的 DBHelper。"""
+    from db_pool import ConnectionPool
+    from db_utils import DBHelper
+
+    def _make(max_size=8):
+        pool = ConnectionPool(lambda: FakeConn(fake_server), max_size=max_size)
+        db = DBHelper("h", 3306, "u", "p", "d", pool=pool)
+        db.LOCK_CONFLICT_BACKOFF = 0
+        db.connect()
+        return db
+
+    return _make
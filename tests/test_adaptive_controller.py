@@ -0,0 +1,101 @@
+# tests/test_adaptive_controller.py
+from http_retry import AdaptiveConcurrencyController, TokenBucketLimiter, parse_retry_after
+
+
+def make(**kw):
+    kw.setdefault("min_decrease_interval", 0)
+    return AdaptiveConcurrencyController(**kw)
+
+
+def test_additive_increase_after_healthy_window():
+    c = make(initial_concurrency=2, max_concurrency=4, initial_rate=5, rate_step=1, success_window=3)
+    for _ in range(3):
+        c.record(200, latency=0.1)
+    assert c.concurrency == 3
+    assert c.rate == 6
+    for _ in range(30):
+        c.record(200, latency=0.1)
+    assert c.concurrency == 4  # 不超过上限
+
+
+def test_multiplicative_decrease_on_429_and_5xx():
+    limiter = TokenBucketLimiter(rate=1, burst=1)
+    c = make(initial_concurrency=8, initial_rate=8, limiter=limiter)
+    assert limiter.rate == 8
+    c.record(429)
+    assert (c.concurrency, c.rate) == (4, 4)
+    c.record(503)
+    assert (c.concurrency, c.rate) == (2, 2)
+    assert limiter.rate == 2
+    snap = c.snapshot()
+    assert snap["throttled"] == 2 and snap["decreases"] == 2
+
+
+def test_decrease_on_latency_spike():
+    c = make(initial_concurrency=8, success_window=100, latency_factor=2.0)
+    for _ in range(5):
+        c.record(200, latency=0.1)
+    for _ in range(10):
+        c.record(200, latency=1.0)
+    assert c.concurrency < 8
+
+
+def test_retry_after_pauses_and_is_parsed():
+    c = make()
+    c.record(429, retry_after=parse_retry_after("2"))
+    assert c.snapshot()["paused_for"] > 1.5
+    assert parse_retry_after(None) is None
+    assert parse_retry_after("abc") is None
+
+
+def test_inventory_api_controller_drives_endpoint_bucket(tmp_path):
+    from http_retry import EndpointRateLimiter
+    from main_inventory import INV_INITIAL_QPS, INV_MAX_QPS, build_inventory_api
+
+    class CountingBucketLimiter(EndpointRateLimiter):
+        waits = 0
+
+        def wait(self, key=None):
+            CountingBucketLimiter.waits += 1
+            super().wait(key)
+
+    class FakeResp:
+        status_code = 200
+        headers = {}
+
+    class FakeSession:
+        status_code = 200
+
+        def request(self, method, url, **kwargs):
+            resp = FakeResp()
+            resp.status_code = self.status_code
+            return resp
+
+    session = FakeSession()
+    limiter = CountingBucketLimiter(rate=50, burst=50)
+    api = build_inventory_api("https://example.com", "ak_test", "secret", rate_limiter=limiter,
+                              session=session, cache_dir=str(tmp_path))
+    controller = api.controller
+    controller.min_decrease_interval = 0
+    bucket = limiter.bucket(api.FBA_INVENTORY_PATH)
+    assert controller.limiter is bucket
+    assert bucket.rate == INV_INITIAL_QPS < INV_MAX_QPS  # 有上调的余地
+
+    # 健康时速率逐步加到 INV_MAX_QPS，且真正作用到接口的令牌桶上
+    for _ in range(controller.success_window * 20):
+        controller.record(200, latency=0.01)
+    assert bucket.rate == INV_MAX_QPS
+    controller.record(429)
+    assert bucket.rate == INV_MAX_QPS / 2
+
+    api._request("POST", "https://example.com" + api.FBA_INVENTORY_PATH)
+    assert CountingBucketLimiter.waits == 0  # 库存接口的令牌只由 controller.slot() 取一次
+    assert controller.snapshot()["ok"] == 1 + controller.success_window * 20
+
+    # 其它接口走自己的令牌桶，429 也不影响库存接口的 AIMD
+    session.status_code = 429
+    api._request("GET", "https://example.com" + api.SHOP_LIST_PATH)
+    api._request("POST", "https://example.com" + api.TOKEN_PATH)
+    assert CountingBucketLimiter.waits == 2
+    assert controller.snapshot()["throttled"] == 1
+    assert bucket.rate == INV_MAX_QPS / 2
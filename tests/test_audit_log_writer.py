@@ -0,0 +1,137 @@
+# tests/test_audit_log_writer.py
+import json
+import os
+import threading
+import time
+
+from log_creator import AuditLogWriter, process_spill_path
+
+
+class FakeSink:
+    def __init__(self):
+        self.batches = []
+        self.down = False
+        self.lock = threading.Lock()
+
+    def __call__(self, rows):
+        if self.down:
+            raise ConnectionError("db down")
+        with self.lock:
+            self.batches.append(list(rows))
+
+
+def row(i):
+    return ("u1", "update", f"action {i}", "127.0.0.1", None, "success", None)
+
+
+def test_rows_are_written_in_batches_and_flushed_on_close():
+    sink = FakeSink()
+    w = AuditLogWriter(sink, batch_size=10, flush_interval=5.0)
+    for i in range(25):
+        w.log(row(i))
+    w.close()
+
+    written = [r for b in sink.batches for r in b]
+    assert written == [row(i) for i in range(25)]
+    assert all(len(b) <= 10 for b in sink.batches)
+    assert len(sink.batches) < 25
+
+
+def test_partial_batch_is_written_after_flush_interval():
+    sink = FakeSink()
+    w = AuditLogWriter(sink, batch_size=100, flush_interval=0.05)
+    w.log(row(1))
+    assert w.flush(timeout=2)
+    assert sink.batches == [[row(1)]]
+    w.close()
+
+
+def test_rows_spill_to_file_while_db_is_down_and_replay_later(tmp_path):
+    sink = FakeSink()
+    sink.down = True
+    spill = str(tmp_path / "spill.jsonl")
+    w = AuditLogWriter(sink, batch_size=5, flush_interval=0.01, spill_path=spill)
+    for i in range(7):
+        w.log(row(i))
+    w.flush(timeout=2)
+    assert sink.batches == [] and w.stats["spilled"] == 7
+
+    sink.down = False
+    w.log(row(7))
+    w.close()
+    written = sorted(r[2] for b in sink.batches for r in b)
+    assert written == sorted(f"action {i}" for i in range(8))
+    assert w.stats["replayed"] == 7
+    assert not (tmp_path / "spill.jsonl").exists()
+
+
+def test_full_queue_applies_backpressure_then_spills(tmp_path):
+    release = threading.Event()
+    calls = []
+
+    def slow_sink(rows):
+        calls.append(len(rows))
+        release.wait(5)
+
+    spill = tmp_path / "spill.jsonl"
+    w = AuditLogWriter(slow_sink, max_queue=2, batch_size=1, flush_interval=0, put_timeout=0.01,
+                       spill_path=str(spill))
+    for i in range(10):
+        w.log(row(i))
+    assert w.stats["spilled"] > 0
+    assert len(spill.read_text(encoding="utf-8").splitlines()) == w.stats["spilled"]
+    release.set()
+    w.close()
+
+
+def test_spill_file_is_per_process_and_orphans_are_adopted(tmp_path):
+    base = str(tmp_path / "system_log_spill.jsonl")
+    own = process_spill_path(base)
+    assert own.endswith(f"system_log_spill.{os.getpid()}.jsonl")
+
+    dead = process_spill_path(base, pid=999999999)  # 已退出的进程
+    alive = process_spill_path(base, pid=os.getppid())  # 还在运行的进程，不能动它的文件
+    for path, n in ((dead, 2), (alive, 3), (base, 1)):  # base：改按进程分文件之前的旧文件
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(n):
+                f.write(json.dumps(list(row(i))) + "\n")
+
+    sink = FakeSink()
+    w = AuditLogWriter(sink, batch_size=10, flush_interval=0.01, spill_path=own)
+    w.adopt_orphan_spills(base)
+    assert not os.path.exists(dead) and not os.path.exists(base)
+    assert os.path.exists(alive)
+
+    w.log(row(9))
+    w.close()
+    assert w.stats["replayed"] == 3
+    assert not os.path.exists(own)
+
+
+def test_leftover_replaying_files_are_adopted(tmp_path):
+    base = str(tmp_path / "system_log_spill.jsonl")
+    own = process_spill_path(base)
+
+    def write(path, n):
+        with open(path, "w", encoding="utf-8") as f:
+            for i in range(n):
+                f.write(json.dumps(list(row(i))) + "\n")
+
+    dead = process_spill_path(base, pid=999999999) + ".replaying"  # 补写到一半进程退出
+    stale = process_spill_path(base, pid=os.getppid()) + ".replaying"  # 进程号还在但早就不动了
+    fresh = process_spill_path(base, pid=os.getppid()) + ".adopt-1"  # 可能正在接管，留着
+    for path, n in ((dead, 2), (stale, 3), (fresh, 4)):
+        write(path, n)
+    old = time.time() - 3600
+    os.utime(stale, (old, old))
+
+    sink = FakeSink()
+    w = AuditLogWriter(sink, batch_size=10, flush_interval=0.01, spill_path=own)
+    w.adopt_orphan_spills(base, grace=60)
+    assert not os.path.exists(dead) and not os.path.exists(stale)
+    assert os.path.exists(fresh)
+
+    w.log(row(9))
+    w.close()
+    assert w.stats["replayed"] == 5
+    assert not os.path.exists(own)
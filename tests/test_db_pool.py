@@ -0,0 +1,107 @@
+# tests/test_db_pool.py
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeoutError
+
+
+class FakeConn:
+    def __init__(self):
+        self.alive = True
+        self.closed = False
+        self.rollbacks = 0
+        self.server_status = 0
+
+    def ping(self, reconnect=False):
+        if not self.alive:
+            raise ConnectionError("gone away")
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.server_status = 0
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kw):
+    created = []
+
+    def factory():
+        c = FakeConn()
+        created.append(c)
+        return c
+
+    return ConnectionPool(factory, **kw), created
+
+
+def test_reuses_connection():
+    pool, created = make_pool(max_size=2)
+    c1 = pool.acquire()
+    pool.release(c1)
+    c2 = pool.acquire()
+    assert c2 is c1
+    assert len(created) == 1
+    assert pool.stats()["reused"] == 1
+
+
+def test_dead_connection_replaced_on_borrow():
+    pool, created = make_pool(max_size=2)
+    c1 = pool.acquire()
+    pool.release(c1)
+    c1.alive = False
+    c2 = pool.acquire()
+    assert c2 is not c1 and c1.closed
+    assert pool.stats()["health_failures"] == 1
+    assert pool.stats()["size"] == 1
+
+
+def test_idle_timeout_expires_connection():
+    pool, created = make_pool(max_size=2, idle_timeout=0.05)
+    c1 = pool.acquire()
+    pool.release(c1)
+    time.sleep(0.1)
+    c2 = pool.acquire()
+    assert c2 is not c1 and c1.closed
+    assert pool.stats()["expired"] == 1
+
+
+def test_release_rolls_back_open_transaction():
+    pool, _ = make_pool()
+    c = pool.acquire()
+    c.server_status = 0x0001  # SERVER_STATUS_IN_TRANS
+    pool.release(c)
+    assert c.rollbacks == 1
+
+
+def test_max_size_blocks_then_times_out():
+    pool, created = make_pool(max_size=1, acquire_timeout=0.1)
+    c1 = pool.acquire()
+    with pytest.raises(PoolTimeoutError):
+        pool.acquire()
+
+    threading.Timer(0.05, pool.release, args=(c1,)).start()
+    c2 = pool.acquire(timeout=1)
+    assert c2 is c1
+    s = pool.stats()
+    assert s["timeouts"] == 1 and s["waits"] >= 1 and len(created) == 1
+
+
+def test_concurrent_borrowers_never_exceed_max_size():
+    pool, created = make_pool(max_size=3)
+
+    def worker():
+        for _ in range(50):
+            with pool.connection():
+                time.sleep(0.0005)
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    s = pool.stats()
+    assert len(created) <= 3
+    assert s["max_in_use"] <= 3 and s["in_use"] == 0
@@ -0,0 +1,63 @@
+# tests/test_db_reconnect.py
+import pytest
+from pymysql.err import OperationalError
+
+
+def test_inventory_upsert_resumes_from_failed_chunk(fake_db, fake_server):
+    db, server = fake_db, fake_server
+    server.fail_on = {2}
+    rows = [{"sid": 1, "seller_sku": f"SKU-{i}", "total": i} for i in range(10)]
+    db.upsert_inventory_fba_current_from_api(rows, chunk_size=3)
+
+    skus = [r[3] for r in server.committed]
+    assert skus == [f"sku-{i}" for i in range(10)]  # 不丢不重
+    assert server.connects == 2 and db.reconnects == 1
+    assert db.progress["inventory_fba_current"] == {"chunks_done": 4, "chunks_total": 4,
+                                                    "rows_done": 10, "rows_total": 10}
+    assert "reconnects=1" in db.progress_note()
+
+
+def test_stores_upsert_gives_up_after_retries(fake_db, fake_server):
+    db, server = fake_db, fake_server
+    server.fail_on = set(range(2, 100))
+    db.RECONNECT_RETRIES = 2
+    shops = [{"sid": i, "seller_id": "S", "marketplace_id": f"M{i}"} for i in range(1, 6)]
+    with pytest.raises(Exception, match="UPSERT stores 失败"):
+        db.upsert_stores_from_api(shops, chunk_size=2)
+    assert len(server.committed) == 2  # 第一块已提交
+    assert db.progress["stores"]["chunks_done"] == 1
+    assert db.progress_note().startswith("stores 1/3 chunks (2/5 rows)")
+
+
+def test_auto_engine_falls_back_when_load_data_is_refused(fake_db, fake_server):
+    db, server = fake_db, fake_server
+    server.load_data_errors = [1148]  # The used command is not allowed with this MySQL version
+    db.local_infile = True
+    db.LOAD_DATA_MIN_ROWS = 5
+    rows = [{"sid": 1, "seller_sku": f"SKU-{i}", "total": i} for i in range(10)]
+    db.upsert_inventory_fba_current_from_api(rows, chunk_size=3)
+
+    assert [r[3] for r in server.committed] == [f"sku-{i}" for i in range(10)]
+    # 之后的批次不再尝试 LOAD DATA，按 executemany 分块提交
+    db.upsert_inventory_fba_current_from_api(rows, chunk_size=3)
+    assert db.progress["inventory_fba_current"]["chunks_total"] == 1 + 4
+
+
+def test_explicit_load_data_error_is_not_wrapped(fake_db, fake_server):
+    db, server = fake_db, fake_server
+    server.load_data_errors = [1148]
+    db.local_infile = True
+    with pytest.raises(OperationalError) as exc:
+        db.upsert_inventory_fba_current_from_api([{"sid": 1, "seller_sku": "A"}], engine="load_data")
+    assert exc.value.args[0] == 1148
+
+
+def test_lost_connection_during_load_data_reconnects(fake_db, fake_server):
+    db, server = fake_db, fake_server
+    server.load_data_errors = [2013]
+    db.local_infile = True
+    db.LOAD_DATA_MIN_ROWS = 1
+    db.upsert_inventory_fba_current_from_api([{"sid": 1, "seller_sku": "A"}])
+
+    assert db.reconnects == 1 and server.connects == 2
+    assert not db._load_data_unavailable  # 断线不算 LOAD DATA 不可用
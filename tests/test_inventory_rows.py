@@ -0,0 +1,101 @@
+# tests/test_inventory_rows.py
+import random
+from decimal import Decimal
+
+from db_utils import normalize_inventory_rows
+from inventory_rows import decimal_text
+
+NUMERIC_FIELDS = (
+    "total", "available_total", "reserved_fc_transfers", "reserved_fc_processing",
+    "reserved_customerorders", "afn_unsellable_quantity", "afn_inbound_working_quantity",
+    "afn_inbound_shipped_quantity", "afn_inbound_receiving_quantity", "stock_up_num",
+)
+ODD_VALUES = [None, "", "abc", "1.5", " 2 ", True, 0.1, 3, -7, "1e3", "nan", {"x": 1}]
+
+
+def make_rows(n, seed=7):
+    rnd = random.Random(seed)
+    rows = []
+    for i in range(n):
+        r = {
+            "sid": rnd.choice([i + 1, str(i + 1), 0, None, "x"]),
+            "seller_sku": rnd.choice([f" SKU-{i} ", f"sku-{i}", "", None]),
+            "sku": rnd.choice([f"Inner-{i}", None, "  "]),
+            "asin": rnd.choice([f"B0{i:08d}", None]),
+            "name": rnd.choice(["美国仓", None, " EU "]),
+            "fulfillment_channel": rnd.choice(["AMAZON_NA", "amazon_eu", None, ""]),
+            "share_type": rnd.choice([0, 1, 2, "1", None]),
+        }
+        for k in NUMERIC_FIELDS:
+            r[k] = rnd.choice(ODD_VALUES) if rnd.random() < 0.2 else rnd.choice([rnd.randint(0, 500), rnd.random() * 100])
+        if rnd.random() < 0.3:
+            r["fba_storage_quantity_list"] = [
+                {"sid": rnd.choice([100 + j, 0, "7"]), "name": rnd.choice(["DE", None]),
+                 "quantity_for_local_fulfillment": rnd.choice([j, "2.5", None, 0.3])}
+                for j in range(rnd.randint(0, 3))
+            ]
+        rows.append(r)
+    return rows
+
+
+def test_inventory_batch_roundtrip():
+    from decimal import Decimal
+    from inventory_rows import InventoryBatch
+
+    rows = make_rows(1000)
+    tuples = normalize_inventory_rows(rows)
+    batch = InventoryBatch.from_api_rows(rows, chunk=128)
+    assert len(batch) == len(tuples)
+    for got, exp in zip(batch, tuples):
+        assert got[:9] == exp[:9]
+        for g, e in zip(got[9:], exp[9:]):
+            assert type(g) in (int, str)  # DECIMAL 传精确值（int / 定点文本），不传 float
+            e = 0.0 if e != e or e in (float("inf"), float("-inf")) else e  # DECIMAL 存不了 nan/inf，按 0
+            assert Decimal(str(g)) == Decimal(repr(float(e))).quantize(Decimal("0.01"), rounding="ROUND_HALF_UP")
+    assert batch[-1] == list(batch)[-1]
+    assert batch[2:5] == list(batch)[2:5]
+    assert batch[1:9:3] == list(batch)[1:9:3]
+
+
+def test_inventory_batch_fixed_precision():
+    from decimal import Decimal
+    from inventory_rows import InventoryBatch
+
+    batch = InventoryBatch.from_api_rows([
+        {"sid": 1, "seller_sku": "A", "total": "1.005", "available_total": 0.1,
+         "reserved_fc_transfers": 0.1, "reserved_fc_processing": 0.2, "afn_unsellable_quantity": -2.5},
+    ])
+    rec = next(batch.records())
+    assert rec.seller_sku == "a"
+    assert rec.total == Decimal("1.01")             # 十进制文本四舍五入，不受二进制浮点影响
+    assert rec.reserved_total == Decimal("0.30")    # 0.1 + 0.2 = 0.30000000000000004 → 0.30
+    assert rec.afn_unsellable_quantity == Decimal("-2.5")
+    assert batch.decimal("available_total", 0) == Decimal("0.10")
+    assert batch[0][9:12] == ("1.01", "0.10", "0.10")  # 传参为定点文本
+
+
+def test_decimal_text_is_canonical():
+    assert decimal_text(0.0) == decimal_text(0) == decimal_text(-0.0) == decimal_text(Decimal("0.00")) == "0"
+    assert decimal_text(12.0) == decimal_text(12) == "12"
+    assert decimal_text(0.1 + 0.2) == decimal_text(Decimal("0.3")) == "0.30"
+    assert decimal_text(1.005) == "1.01"
+    assert decimal_text(float("nan")) == decimal_text(float("inf")) == "0"
+
+
+def test_batch_fast_path_matches_row_loop_and_hashes():
+    from db_utils import DBHelper
+    from inventory_rows import InventoryBatch
+
+    rows = make_rows(3000, seed=11)
+    for r in rows:
+        r.pop("fba_storage_quantity_list", None)  # 不含要展开的子项：整段走按列构建
+    clean = [{"sid": i % 7 + 1, "seller_sku": f"S{i}", "name": "US", "share_type": 0,
+              **{k: i % 300 for k in NUMERIC_FIELDS}} for i in range(3000)]
+    for data in (rows, clean, make_rows(3000)):
+        tuples = normalize_inventory_rows(data)
+        batch = InventoryBatch.from_api_rows(data)
+        assert len(batch) == len(tuples)
+        for got, exp in zip(batch, tuples):
+            assert got[:9] == exp[:9]
+            # 逐行版（float）与批次（int / 定点文本）对同一落库值的行哈希必须相同
+            assert DBHelper._inventory_row_hash(got) == DBHelper._inventory_row_hash(exp)
@@ -0,0 +1,47 @@
+# tests/test_json_codec.py
+import json
+
+import pytest
+
+import json_codec
+
+PAGE = {"code": 0, "message": "success", "data": [
+    {"sid": 1, "name": "美国店", "total": 12.5, "fba_storage_quantity_list": [{"name": "仓A", "qty": 3}]},
+    {"sid": 2, "name": None, "flag": True},
+]}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def codec(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_codec, "orjson", None)
+    elif json_codec.orjson is None:
+        pytest.skip("orjson 未安装")
+    return json_codec
+
+
+def test_roundtrip_matches_stdlib(codec):
+    raw = json.dumps(PAGE, ensure_ascii=False).encode("utf-8")
+    assert codec.loads(raw) == json.loads(raw)
+    assert json.loads(codec.dumps(PAGE)) == PAGE
+    assert "美国店" in codec.dumps(PAGE)  # 中文不转义
+    assert codec.dumps_bytes(PAGE) == codec.dumps(PAGE).encode("utf-8")
+
+
+def test_unsupported_types_fall_back_to_stdlib(codec):
+    from decimal import Decimal
+    with pytest.raises(TypeError):
+        codec.dumps({"v": Decimal("1.5")})  # 与 json.dumps 行为一致：不认识的类型照常报错
+
+
+class FakeResp:
+    def __init__(self, content):
+        self.content = content
+
+    def json(self):
+        return json.loads(self.content.decode("gbk"))
+
+
+def test_response_json_falls_back_for_non_utf8(codec):
+    assert codec.response_json(FakeResp('{"a": 1}'.encode("utf-8"))) == {"a": 1}
+    assert codec.response_json(FakeResp('{"名": "店"}'.encode("gbk"))) == {"名": "店"}
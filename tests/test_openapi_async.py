@@ -0,0 +1,150 @@
+# tests/test_openapi_async.py
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import pytest
+
+pytest.importorskip("httpx")
+from openapi_async import AsyncOpenApiBase
+
+TOTAL_SHOPS = 45
+TOTAL_INV = 130
+
+
+class StubLingxing(BaseHTTPRequestHandler):
+    """本地替身：token / 店铺列表 / FBA 库存三个接口。"""
+    token_calls = 0
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        u = urlparse(self.path)
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n)
+        if u.path == AsyncOpenApiBase.TOKEN_PATH:
+            StubLingxing.token_calls += 1
+            self._send({"code": 200, "data": {"access_token": "tok-123", "expires_in": 7200}})
+        elif u.path == AsyncOpenApiBase.FBA_INVENTORY_PATH:
+            q = parse_qs(u.query)
+            assert q.get("sign") and q.get("access_token") == ["tok-123"]
+            body = json.loads(raw)
+            start, length = int(body["offset"]), int(body["length"])
+            rows = [{"seller_sku": f"SKU-{i}", "sid": 1} for i in range(start, min(start + length, TOTAL_INV))]
+            self._send({"code": 0, "data": rows})
+        else:
+            self.send_error(404)
+
+    def do_GET(self):
+        u = urlparse(self.path)
+        if u.path == AsyncOpenApiBase.SHOP_LIST_PATH:
+            q = parse_qs(u.query)
+            page, size = int(q["page"][0]), int(q["page_size"][0])
+            start = (page - 1) * size
+            rows = [{"sid": i} for i in range(start, min(start + size, TOTAL_SHOPS))]
+            self._send({"code": 0, "data": rows})
+        else:
+            self.send_error(404)
+
+
+@pytest.fixture()
+def stub_host(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # token / 签名策略缓存写到临时目录
+    StubLingxing.token_calls = 0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubLingxing)
+    t = threading.Thread(target=server.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_async_pagination_matches_stub(stub_host):
+    async def run():
+        async with AsyncOpenApiBase(stub_host, "ak_async", "secret") as api:
+            token = await api.generate_access_token()
+            shops, inv = await asyncio.gather(
+                api.fetch_amazon_shop_data(token, page_size=20),
+                api.fetch_inventory_fba_data(token, length=20, concurrency=3),
+            )
+            return token, shops, inv
+
+    token, shops, inv = asyncio.run(run())
+    assert token == "tok-123"
+    assert [s["sid"] for s in shops["data"]] == list(range(TOTAL_SHOPS))
+    assert [r["seller_sku"] for r in inv] == [f"SKU-{i}" for i in range(TOTAL_INV)]
+
+
+def test_gather_across_accounts_shares_nothing(stub_host):
+    async def one(app_id):
+        async with AsyncOpenApiBase(stub_host, app_id, "secret") as api:
+            tokens = await asyncio.gather(*(api.generate_access_token() for _ in range(5)))
+            assert set(tokens) == {"tok-123"}
+            return await api.fetch_inventory_fba_data(tokens[0], length=50)
+
+    async def run():
+        return await asyncio.gather(one("ak_a"), one("ak_b"))
+
+    a, b = asyncio.run(run())
+    assert len(a) == len(b) == TOTAL_INV
+    # 每个账号只取一次 token（同实例并发调用走单飞锁 + 缓存）
+    assert StubLingxing.token_calls == 2
+
+
+class FakeAsyncResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.status_code = 200
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class ExpiringAsyncClient:
+    """第一个 token 拉库存时报 2001003（过期），新 token 正常返回。"""
+    def __init__(self):
+        self.token_calls = 0
+
+    async def request(self, method, url, params=None, **kwargs):
+        if url.endswith(AsyncOpenApiBase.TOKEN_PATH):
+            self.token_calls += 1
+            await asyncio.sleep(0.01)  # 放大并发窗口
+            return FakeAsyncResponse({"code": 200, "data": {"access_token": f"tok-{self.token_calls}",
+                                                            "expires_in": 7200}})
+        if params["access_token"] == "tok-1":
+            return FakeAsyncResponse({"code": 2001003, "message": "access_token expired"})
+        return FakeAsyncResponse({"code": 0, "data": [{"seller_sku": "A"}]})
+
+
+def test_async_page_retries_once_after_token_expired(tmp_path):
+    client = ExpiringAsyncClient()
+
+    async def run():
+        api = AsyncOpenApiBase("https://example.invalid", "ak_test", "secret", client=client, cache_dir=str(tmp_path))
+        token = await api.generate_access_token()
+        pages = await asyncio.gather(*(api.fetch_inventory_fba_data(token, length=50) for _ in range(3)))
+        current = await api.token_provider.current("tok-1")
+        await api.aclose()
+        return token, pages, current
+
+    token, pages, current = asyncio.run(run())
+    assert token == "tok-1"
+    assert pages == [[{"seller_sku": "A"}]] * 3
+    assert client.token_calls == 2  # 三个协程同时报过期，只刷新一次
+    assert current == "tok-2"
+    # 磁盘缓存与同步版同一格式，另一个进程可直接复用
+    assert json.loads((tmp_path / ".token_cache_ak_test.json").read_text())["access_token"] == "tok-2"
@@ -0,0 +1,112 @@
+# tests/test_openapi_pagination.py
+import json
+import threading
+import time
+
+from openapi import OpenApiBase
+
+
+class FakePagesApi(OpenApiBase):
+    """用内存数据代替真实接口，只覆盖单页请求。"""
+    def __init__(self, total_rows, delay=0.0):
+        super().__init__("https://example.invalid", "ak_test", "secret")
+        self.total_rows = total_rows
+        self.delay = delay
+        self.offsets = []
+        self._lock = threading.Lock()
+
+    def _fetch_inventory_page(self, url, access_token, offset, length, extra_filters):
+        with self._lock:
+            self.offsets.append(offset)
+        # 越靠前的页返回越慢，验证结果仍按 offset 顺序合并
+        time.sleep(self.delay / (1 + offset // length))
+        end = min(offset + length, self.total_rows)
+        return [{"seller_sku": f"SKU-{i}"} for i in range(offset, end)]
+
+
+def test_parallel_keeps_offset_order():
+    api = FakePagesApi(total_rows=1010, delay=0.02)
+    rows = api.fetch_inventory_fba_data("tok", length=100, concurrency=4)
+    assert [r["seller_sku"] for r in rows] == [f"SKU-{i}" for i in range(1010)]
+
+
+def test_parallel_matches_sequential_on_exact_multiple():
+    seq = FakePagesApi(total_rows=600).fetch_inventory_fba_data("tok", length=100)
+    par = FakePagesApi(total_rows=600).fetch_inventory_fba_data("tok", length=100, concurrency=3)
+    assert par == seq
+
+
+def test_parallel_stops_after_short_page():
+    api = FakePagesApi(total_rows=250)
+    api.fetch_inventory_fba_data("tok", length=100, concurrency=4)
+    # 第一页 + 一个窗口（4 页），不会再发起下一轮
+    assert sorted(api.offsets) == [0, 100, 200, 300, 400]
+
+
+class FlakyPagesApi(FakePagesApi):
+    """拉到 fail_at 这个 offset 时抛错一次。"""
+    def __init__(self, total_rows, fail_at, cache_dir):
+        OpenApiBase.__init__(self, "https://example.invalid", "ak_test", "secret", cache_dir=cache_dir)
+        self.total_rows = total_rows
+        self.delay = 0.0
+        self.offsets = []
+        self._lock = threading.Lock()
+        self.fail_at = fail_at
+
+    def _fetch_inventory_page(self, url, access_token, offset, length, extra_filters):
+        if offset == self.fail_at:
+            self.fail_at = None
+            raise RuntimeError("boom")
+        return super()._fetch_inventory_page(url, access_token, offset, length, extra_filters)
+
+
+def test_resume_continues_from_last_good_page(tmp_path):
+    api = FlakyPagesApi(total_rows=950, fail_at=400, cache_dir=str(tmp_path))
+    try:
+        api.fetch_inventory_fba_data("tok", length=100, resume=True)
+    except RuntimeError:
+        pass
+    assert api.offsets == [0, 100, 200, 300]
+
+    api.offsets.clear()
+    rows = api.fetch_inventory_fba_data("tok", length=100, resume=True)
+    assert [r["seller_sku"] for r in rows] == [f"SKU-{i}" for i in range(950)]
+    assert api.offsets == [400, 500, 600, 700, 800, 900]  # 已拉过的页不再请求
+    assert not any((tmp_path / ".page_checkpoints").iterdir())  # 拉完即清理断点
+
+
+def test_resume_with_other_filters_starts_over(tmp_path):
+    api = FlakyPagesApi(total_rows=500, fail_at=200, cache_dir=str(tmp_path))
+    try:
+        api.fetch_inventory_fba_data("tok", length=100, resume=True, extra_filters={"sid": "1"})
+    except RuntimeError:
+        pass
+    api.offsets.clear()
+    api.fetch_inventory_fba_data("tok", length=100, resume=True, extra_filters={"sid": "2"})
+    assert api.offsets[0] == 0
+
+
+def test_stale_checkpoint_is_dropped_and_old_scopes_pruned(tmp_path):
+    api = FlakyPagesApi(total_rows=500, fail_at=200, cache_dir=str(tmp_path))
+    try:
+        api.fetch_inventory_fba_data("tok", length=100, resume=True)
+    except RuntimeError:
+        pass
+    root = tmp_path / ".page_checkpoints"
+    (cursor_file,) = root.glob("*/cursor.json")
+    cursor = json.loads(cursor_file.read_text())
+    assert cursor["next"] == 200
+    # 让断点变成两天前的；另留一个范围早已不用的旧断点目录
+    cursor["started_at"] -= 2 * 86400
+    cursor_file.write_text(json.dumps(cursor))
+    orphan = root / "0ldsc0pe"
+    orphan.mkdir()
+    (orphan / "cursor.json").write_text(json.dumps({"next": 3, "started_at": time.time() - 2 * 86400}))
+
+    api.offsets.clear()
+    api.resume_max_age = 3600
+    rows = api.fetch_inventory_fba_data("tok", length=100, resume=True)
+    assert api.offsets[:3] == [0, 100, 200]  # 过期断点作废，从头拉
+    assert len(rows) == 500
+    assert not orphan.exists()
+    assert not any(root.iterdir())
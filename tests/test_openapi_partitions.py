@@ -0,0 +1,69 @@
+# tests/test_openapi_partitions.py
+import threading
+
+import pytest
+
+from fetch_checkpoints import PartitionCheckpoint, scope_key
+from openapi import OpenApiBase, PartitionFetchError
+
+
+class FakeShopsApi(OpenApiBase):
+    """每个 sid 有 rows_per_sid 行；fail_times[sid] 为该店铺前几次请求报错的次数。"""
+    def __init__(self, rows_per_sid, fail_times=None):
+        super().__init__("https://example.invalid", "ak_test", "secret")
+        self.rows_per_sid = rows_per_sid
+        self.fail_times = dict(fail_times or {})
+        self.calls = []
+        self._lock = threading.Lock()
+
+    def _fetch_inventory_page(self, url, access_token, offset, length, extra_filters):
+        sid = int(extra_filters["sid"])
+        with self._lock:
+            self.calls.append((sid, offset))
+            if self.fail_times.get(sid, 0) > 0 and offset > 0:  # 分页走到一半时失败
+                self.fail_times[sid] -= 1
+                raise RuntimeError("boom")
+        end = min(offset + length, self.rows_per_sid[sid])
+        return [{"sid": sid, "seller_sku": f"S{sid}-{i}"} for i in range(offset, end)]
+
+
+def collect(api, sids, **kw):
+    return {part: rows for part, rows in api.iter_inventory_fba_partitions(
+        "tok", sids, length=20, retry_backoff=0, **kw)}
+
+
+def test_each_sid_is_paged_independently():
+    api = FakeShopsApi({1: 45, 2: 0, 3: 20})
+    got = collect(api, [3, 1, 2], workers=3)
+    assert {p: len(r) for p, r in got.items()} == {(1,): 45, (2,): 0, (3,): 20}
+    assert sorted(o for s, o in api.calls if s == 1) == [0, 20, 40]
+
+
+def test_failed_partition_is_retried_alone():
+    api = FakeShopsApi({1: 50, 2: 50}, fail_times={1: 1})
+    got = collect(api, [1, 2], workers=2)
+    assert len(got[(1,)]) == 50 and len(got[(2,)]) == 50
+    assert [o for s, o in api.calls if s == 2] == [0, 20, 40]  # 店铺 2 没有被重拉
+
+
+def test_partition_that_keeps_failing_does_not_block_others():
+    api = FakeShopsApi({1: 50, 2: 30, 3: 10}, fail_times={2: 99})
+    got = {}
+    with pytest.raises(PartitionFetchError) as ei:
+        for part, rows in api.iter_inventory_fba_partitions("tok", [1, 2, 3], length=20, retries=1,
+                                                           retry_backoff=0, workers=2):
+            got[part] = rows
+    assert set(got) == {(1,), (3,)}
+    assert set(ei.value.failed) == {(2,)}
+
+
+def test_partition_checkpoint_roundtrip_and_scope(tmp_path):
+    path = tmp_path / "parts.json"
+    scope = scope_key(filters={"is_hide_zero_stock": "0"}, sids=[1, 2, 3])
+    cp = PartitionCheckpoint(path, scope)
+    cp.mark_done((1,))
+    cp.mark_done((3,))
+    assert PartitionCheckpoint(path, scope).done == {1, 3}
+    assert PartitionCheckpoint(path, scope_key(sids=[1, 2])).done == set()  # 范围变了，断点作废
+    cp.clear()
+    assert not path.exists()
@@ -0,0 +1,137 @@
+# tests/test_page_spool.py
+import gzip
+import json
+import os
+import time
+
+import pytest
+
+from openapi import OpenApiCore
+from page_spool import PageSpool, is_complete, latest_complete_spool, read_spool, spool_files
+from replay import replay_inventory
+from test_openapi_pagination import FakePagesApi, FlakyPagesApi
+
+
+def test_spool_records_every_page_with_request_metadata(tmp_path):
+    spool = PageSpool(tmp_path / "inv.jsonl.gz")
+    api = FakePagesApi(total_rows=250)
+    rows = api.fetch_inventory_fba_data("tok", length=100, concurrency=2,
+                                        extra_filters={"is_hide_zero_stock": "0"}, spool=spool)
+
+    records = list(read_spool([spool.path]))
+    assert [r["request"]["offset"] for r in records] == [0, 100, 200]
+    assert records[0]["request"]["filters"] == {"is_hide_zero_stock": "0"}
+    assert records[0]["endpoint"] == OpenApiCore.FBA_INVENTORY_PATH
+    assert [row for r in records for row in r["rows"]] == rows
+    assert spool.pages == 3 and spool.rows == 250
+
+
+def test_truncated_tail_keeps_earlier_records(tmp_path):
+    path = tmp_path / "s.jsonl.gz"
+    spool = PageSpool(path)
+    for i in range(3):
+        spool.write("/x", "ak", {"page": i + 1}, [{"i": i}])
+    data = path.read_bytes()
+    path.write_bytes(data[:-10])  # 模拟写到一半被杀
+    assert [r["request"]["page"] for r in read_spool([path])] == [1, 2]
+
+
+def test_spool_files_sorted_and_gzip_readable(tmp_path):
+    for name in ("20260502-000000-1.jsonl.gz", "20260501-000000-1.jsonl.gz"):
+        PageSpool(tmp_path / "ak" / "stores" / name).write("/x", "ak", {}, [{"a": 1}])
+    PageSpool(tmp_path / "ak_other" / "stores" / "20260503-000000-1.jsonl.gz").write("/x", "ak_other", {}, [])
+    files = spool_files(tmp_path, "stores", "ak")
+    assert [f.name for f in files] == ["20260501-000000-1.jsonl.gz", "20260502-000000-1.jsonl.gz"]
+    with gzip.open(files[0], "rt", encoding="utf-8") as f:
+        assert json.loads(f.readline())["rows"] == [{"a": 1}]
+
+
+class FakeDB:
+    def __init__(self):
+        self.batches = []
+
+    def create_inventory_fba_current_table(self):
+        pass
+
+    def upsert_inventory_fba_current_from_api(self, batch, **kw):
+        self.batches.append(list(batch))
+        return len(batch)
+
+
+def test_replay_inventory_upserts_spooled_pages_without_api(tmp_path):
+    spool = PageSpool(tmp_path / "inv.jsonl.gz")
+    for off in range(0, 120, 50):
+        spool.write(OpenApiCore.FBA_INVENTORY_PATH, "ak", {"offset": off, "length": 50},
+                    [{"sid": 1, "seller_sku": f"SKU-{i}"} for i in range(off, min(off + 50, 120))])
+    spool.write(OpenApiCore.SHOP_LIST_PATH, "ak", {"page": 1}, [{"sid": 1}])  # 其它接口的页不参与
+    db = FakeDB()
+    rows, affected = replay_inventory(db, [spool.path], pages_per_batch=2)
+    assert rows == affected == 120
+    assert [len(b) for b in db.batches] == [100, 20]
+    assert db.batches[0][0][3] == "sku-0"
+
+
+def test_replay_skips_other_accounts_pages(tmp_path):
+    spool = PageSpool(tmp_path / "inv.jsonl.gz")
+    spool.write(OpenApiCore.FBA_INVENTORY_PATH, "ak_a", {"offset": 0}, [{"sid": 1, "seller_sku": "A"}])
+    spool.write(OpenApiCore.FBA_INVENTORY_PATH, "ak_b", {"offset": 0}, [{"sid": 2, "seller_sku": "B"}])
+    db = FakeDB()
+    rows, _ = replay_inventory(db, [spool.path], app_id="ak_a")
+    assert rows == 1
+    assert [r[3] for b in db.batches for r in b] == ["a"]
+
+
+def test_for_run_uses_account_dir_and_prunes_old_files(tmp_path):
+    old = tmp_path / "ak" / "inventory" / "20200101-000000-1.jsonl.gz"
+    PageSpool(old).write("/x", "ak", {}, [])
+    os.utime(old, (time.time() - 10 * 86400,) * 2)
+    other = tmp_path / "ak_other" / "inventory" / "20200101-000000-1.jsonl.gz"
+    PageSpool(other).write("/x", "ak_other", {}, [])
+    os.utime(other, (time.time() - 10 * 86400,) * 2)
+
+    spool = PageSpool.for_run(tmp_path, "inventory", "ak", keep_days=7)
+    assert spool.path.parent == tmp_path / "ak" / "inventory"
+    assert not old.exists()
+    assert other.exists()  # 只清理本账号的目录
+
+
+def test_mark_complete_and_latest_complete_run(tmp_path):
+    d = tmp_path / "ak" / "inventory"
+    done = PageSpool(d / "20260501-000000-1.jsonl.gz")
+    done.write("/x", "ak", {}, [{"a": 1}])
+    done.mark_complete()
+    PageSpool(d / "20260502-000000-1.jsonl.gz").write("/x", "ak", {}, [{"a": 2}])  # 中途失败的运行
+    empty = PageSpool(d / "20260503-000000-1.jsonl.gz").mark_complete()  # 一页都没有也算一次完整运行
+
+    assert done.path.name == "20260501-000000-1.complete.jsonl.gz" and is_complete(done.path)
+    assert [r["rows"] for r in read_spool([done.path])] == [[{"a": 1}]]
+    assert latest_complete_spool(tmp_path, "inventory", "ak") == empty
+    empty.unlink()
+    assert latest_complete_spool(tmp_path, "inventory", "ak") == done.path
+    assert latest_complete_spool(tmp_path, "inventory", "ak_other") is None
+
+
+def test_snapshot_replay_needs_exactly_one_complete_run(tmp_path):
+    partial = PageSpool(tmp_path / "20260501-000000-1.jsonl.gz")
+    partial.write(OpenApiCore.FBA_INVENTORY_PATH, "ak", {"offset": 0}, [{"sid": 1, "seller_sku": "A"}])
+    full = PageSpool(tmp_path / "20260502-000000-1.jsonl.gz")
+    full.write(OpenApiCore.FBA_INVENTORY_PATH, "ak", {"offset": 0}, [{"sid": 1, "seller_sku": "B"}])
+    full.mark_complete()
+
+    for paths in ([partial.path], [partial.path, full.path]):
+        with pytest.raises(ValueError, match="完整运行"):
+            replay_inventory(FakeDB(), paths, snapshot=True)
+
+
+def test_resumed_pages_are_spooled_too(tmp_path):
+    api = FlakyPagesApi(total_rows=450, fail_at=300, cache_dir=tmp_path)
+    with pytest.raises(RuntimeError):
+        api.fetch_inventory_fba_data("tok", length=100, resume=True, spool=PageSpool(tmp_path / "run1.jsonl.gz"))
+
+    spool = PageSpool(tmp_path / "run2.jsonl.gz")
+    rows = api.fetch_inventory_fba_data("tok", length=100, resume=True, spool=spool)
+    assert len(rows) == 450
+    # 第二次运行的 spool 里要有断点交出的前 3 页，才是一次完整的拉取
+    records = list(read_spool([spool.path]))
+    assert [r["request"]["offset"] for r in records] == [0, 100, 200, 300, 400]
+    assert sum(len(r["rows"]) for r in records) == 450
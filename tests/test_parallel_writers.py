@@ -0,0 +1,69 @@
+# tests/test_parallel_writers.py
+import pytest
+from pymysql.err import OperationalError
+
+import db_utils
+from inventory_rows import InventoryBatch
+
+
+def inventory_rows(n):
+    # 故意打乱顺序：sid 倒序、sku 交错
+    return [{"sid": 3 - i % 3, "seller_sku": f"SKU-{(i * 7) % n:04d}", "total": i} for i in range(n)]
+
+
+def test_parallel_upsert_writes_every_row_once_in_key_order_chunks(make_pooled_db, fake_server):
+    server = fake_server
+    db = make_pooled_db()
+    affected = db.upsert_inventory_fba_current_from_api(inventory_rows(100), chunk_size=10, writers=4)
+
+    assert affected == 100
+    assert len(server.committed) == 100
+    assert len(server.threads) > 1
+    # 每块内部按唯一键有序，块与块的键区间互不重叠
+    keys = [[(r[0], r[2], r[3], r[7]) for r in chunk] for chunk in server.chunks]
+    assert all(k == sorted(k) for k in keys)
+    spans = sorted((k[0], k[-1]) for k in keys)
+    assert all(a[1] < b[0] for a, b in zip(spans, spans[1:]))
+    assert db.progress["inventory_fba_current"]["chunks_done"] == 10
+
+
+def test_parallel_upsert_accepts_inventory_batch(make_pooled_db, fake_server):
+    server = fake_server
+    db = make_pooled_db()
+    batch = InventoryBatch.from_api_rows(inventory_rows(50))
+    db.upsert_inventory_fba_current_from_api(batch, chunk_size=8, writers=3)
+
+    written = sorted(server.committed)
+    assert written == sorted(batch)
+
+
+def test_same_key_rows_never_split_across_chunks(make_pooled_db, fake_server):
+    server = fake_server
+    db = make_pooled_db()
+    rows = [{"sid": 1, "seller_sku": "DUP", "total": i} for i in range(5)] + \
+           [{"sid": 1, "seller_sku": f"S{i}", "total": i} for i in range(20)]
+    db.upsert_inventory_fba_current_from_api(rows, chunk_size=3, writers=4)
+
+    dup_chunks = [c for c in server.chunks if any(r[3] == "dup" for r in c)]
+    assert len(dup_chunks) == 1
+    assert [r[9] for r in dup_chunks[0] if r[3] == "dup"] == [0, 1, 2, 3, 4]  # 原先后顺序保留
+
+
+def test_deadlocked_chunk_is_rolled_back_and_retried(make_pooled_db, fake_server):
+    server = fake_server
+    server.deadlock_on = {3}
+    db = make_pooled_db()
+    affected = db.upsert_inventory_fba_current_from_api(inventory_rows(40), chunk_size=10, writers=2)
+
+    assert affected == 40
+    assert sorted(r[3] for r in server.committed) == sorted(r[3] for r in db_utils.normalize_inventory_rows(
+        inventory_rows(40), "LINGXING", "AMAZON"))
+
+
+def test_non_retryable_error_is_raised_after_workers_stop(make_pooled_db, fake_server):
+    fake_server.deadlock_on = {2}
+    db = make_pooled_db()
+    db.LOCK_CONFLICT_RETRIES = 0
+    with pytest.raises(OperationalError):
+        db.upsert_inventory_fba_current_from_api(inventory_rows(100), chunk_size=5, writers=3)
+    assert db.pool.stats()["in_use"] == 1  # 只剩主连接，工作线程的连接都已归还
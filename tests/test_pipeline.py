@@ -0,0 +1,22 @@
+# tests/test_pipeline.py
+import pytest
+
+from pipeline import prefetch, batched_pages
+
+
+def test_batched_pages_groups_n_pages():
+    pages = [[1, 2], [3], [4, 5], [6]]
+    assert list(batched_pages(pages, 3)) == [[1, 2, 3, 4, 5], [6]]
+
+
+def test_prefetch_preserves_order_and_reraises():
+    def gen():
+        yield 1
+        yield 2
+        raise ValueError("boom")
+
+    got = []
+    with pytest.raises(ValueError):
+        for x in prefetch(gen(), depth=1):
+            got.append(x)
+    assert got == [1, 2]
@@ -0,0 +1,53 @@
+# tests/test_rate_limiter.py
+import asyncio
+import threading
+import time
+
+from http_retry import TokenBucketLimiter, EndpointRateLimiter
+
+
+def test_burst_is_immediate_then_rate_limited():
+    lim = TokenBucketLimiter(rate=20, burst=5)
+    t0 = time.monotonic()
+    for _ in range(5):
+        lim.wait()
+    assert time.monotonic() - t0 < 0.05
+    for _ in range(4):
+        lim.wait()
+    # 透支 4 个令牌，按 20/s 约需 0.2s
+    assert time.monotonic() - t0 >= 0.18
+
+
+def test_waiting_threads_do_not_serialize_on_lock():
+    lim = TokenBucketLimiter(rate=50, burst=1)
+    lim.wait()
+    t0 = time.monotonic()
+    threads = [threading.Thread(target=lim.wait) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    # 10 个令牌按 50/s 约 0.2s（各线程在锁外并行等待）
+    assert 0.15 <= time.monotonic() - t0 < 0.5
+
+
+def test_endpoint_budgets_are_independent():
+    lim = EndpointRateLimiter(rate=1, burst=1, budgets={"/fast": (100, 10)})
+    assert lim.bucket("/fast").burst == 10
+    t0 = time.monotonic()
+    lim.wait("/a")
+    lim.wait("/b")  # 另一个 key 有自己的令牌
+    for _ in range(10):
+        lim.wait("/fast")
+    assert time.monotonic() - t0 < 0.1
+
+
+def test_async_acquire():
+    lim = TokenBucketLimiter(rate=20, burst=2)
+
+    async def run():
+        await asyncio.gather(*(lim.acquire() for _ in range(4)))
+
+    t0 = time.monotonic()
+    asyncio.run(run())
+    assert 0.08 <= time.monotonic() - t0 < 0.5
@@ -0,0 +1,81 @@
+# tests/test_runner.py
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import runner
+from runner import Account, run_account_job, run_all
+
+SEEN = {}  # 账号名 → 作业拿到的 api（检查 cache_dir / 限流器是否按账号独立）
+
+
+def fake_stores_job(api, db):
+    SEEN[(api.app_id, "stores")] = api
+    return 3, "shops=3"
+
+
+def fake_inventory_job(api, db):
+    SEEN[(api.app_id, "inventory")] = api
+    if api.app_id == "ak_bad":
+        raise RuntimeError("boom")
+    return 5, "rows=5"
+
+
+@pytest.fixture
+def stub_jobs(monkeypatch, fake_db):
+    SEEN.clear()
+    monkeypatch.setattr(runner, "JOBS", {
+        "stores": ("test_runner", "fake_stores_job", "sync_stores_from_lingxing"),
+        "inventory": ("test_runner", "fake_inventory_job", "sync_inventory_from_lingxing"),
+    })
+    # 进程池换成线程池：子进程里看不到 fake_db 打的补丁，作业与运行记录的逻辑与进程池一致
+    monkeypatch.setattr(runner, "ProcessPoolExecutor", ThreadPoolExecutor)
+
+
+def make_account(tmp_path, name, app_id, rate=5.0):
+    db = {"host": "h", "port": 3306, "user": "u", "password": "p", "db_name": "d"}
+    return Account(name=name, app_id=app_id, app_secret="secret", db=db, rate=rate,
+                   cache_dir=str(tmp_path / name))
+
+
+def run_rows(server):
+    """fake_server 上写进 ingestion_runs 的 (job_name, success_count, fail_count, note)。"""
+    return [(args[0], args[3], args[4], args[5]) for sql, args in server.executed
+            if "INSERT INTO ingestion_runs" in sql]
+
+
+def test_one_run_row_per_account_job_and_failure_is_isolated(stub_jobs, fake_server, tmp_path):
+    accounts = [make_account(tmp_path, "acc1", "ak_1"), make_account(tmp_path, "bad", "ak_bad"),
+                make_account(tmp_path, "acc2", "ak_2", rate=2.0)]
+    results = run_all(accounts, ["stores", "inventory"], max_workers=3)
+
+    assert [(r.account, r.job, r.fail_count) for r in results] == [
+        ("acc1", "inventory", 0), ("acc1", "stores", 0),
+        ("acc2", "inventory", 0), ("acc2", "stores", 0),
+        ("bad", "inventory", 1), ("bad", "stores", 0),
+    ]
+    rows = sorted(run_rows(fake_server))
+    assert [r[0] for r in rows] == sorted(f"{prefix}@{acc}" for acc in ("acc1", "acc2", "bad") for prefix in (
+        "sync_stores_from_lingxing", "sync_inventory_from_lingxing"))
+    bad = [r for r in rows if r[0] == "sync_inventory_from_lingxing@bad"][0]
+    assert bad[1:3] == (0, 1) and "boom" in bad[3]
+    ok = [r for r in rows if r[0] == "sync_inventory_from_lingxing@acc1"][0]
+    assert ok[1:] == (5, 0, "rows=5")
+
+
+def test_each_account_gets_its_own_cache_dir_and_rate_limiter(stub_jobs, tmp_path):
+    a, b = make_account(tmp_path, "acc1", "ak_1"), make_account(tmp_path, "acc2", "ak_2", rate=2.0)
+    for acc in (a, b):
+        assert run_account_job(acc, "stores").fail_count == 0
+
+    api_a, api_b = SEEN[("ak_1", "stores")], SEEN[("ak_2", "stores")]
+    assert api_a.cache_dir == tmp_path / "acc1" and api_a.cache_dir.is_dir()
+    assert api_b.token_cache_file.parent == tmp_path / "acc2"
+    assert api_a.rate_limiter is not api_b.rate_limiter
+    assert api_b.rate_limiter.bucket(api_b.SHOP_LIST_PATH).rate == 2.0
+    assert Account(name="x", app_id="ak", app_secret="s", db={}).resolved_cache_dir().endswith("x")
+
+
+def test_unknown_job_is_rejected(tmp_path):
+    with pytest.raises(ValueError, match="未知作业"):
+        run_all([make_account(tmp_path, "acc1", "ak_1")], ["nope"])
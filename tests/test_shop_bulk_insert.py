@@ -0,0 +1,69 @@
+# tests/test_shop_bulk_insert.py
+from datetime import datetime
+
+import main
+from openapi import OpenApiCore
+
+RESPONSE = {"code": 0, "message": "success", "error_details": [], "response_time": "2024-05-01 10:00:00"}
+
+
+def shops(n, start=1):
+    return [{"sid": i, "name": f"shop{i}", "seller_id": f"S{i}", "status": 1} for i in range(start, start + n)]
+
+
+def test_bulk_insert_writes_multi_row_chunks(fake_db, fake_server):
+    result = fake_db.insert_shop_data_bulk(RESPONSE, shops(5), chunk_size=2)
+
+    assert result == {"written": 5, "errors": []}
+    # 每块一条多行 INSERT、一次提交：2 + 2 + 1
+    assert [len(c) for c in fake_server.chunks] == [2, 2, 1]
+    inserts = [sql for sql, _ in fake_server.executed if "INSERT INTO original_data" in sql]
+    assert len(inserts) == 3
+    row = fake_server.committed[0]
+    assert row[:4] == (0, "success", "[]", datetime(2024, 5, 1, 10, 0, 0))
+    assert [r[5] for r in fake_server.committed] == [1, 2, 3, 4, 5]
+
+
+def test_bulk_insert_isolates_bad_row(fake_db, fake_server):
+    fake_server.reject = lambda row: row[5] == 3  # sid=3 这一行写不进去
+
+    result = fake_db.insert_shop_data_bulk(RESPONSE, shops(5), chunk_size=2)
+
+    assert result["written"] == 4
+    assert [sid for sid, _ in result["errors"]] == [3]
+    assert "Incorrect integer value" in result["errors"][0][1]
+    # 出错那块回滚后逐条重试，同块的 sid=4 照常写入，其它块不受影响
+    assert sorted(r[5] for r in fake_server.committed) == [1, 2, 4, 5]
+
+
+class FakeShopApi:
+    app_id = "ak_test"
+    build_shop_response = staticmethod(OpenApiCore.build_shop_response)
+
+    def generate_access_token(self):
+        return "tok"
+
+    def iter_amazon_shop_pages(self, access_token, spool=None):
+        yield shops(2)
+        yield shops(1, start=3)
+
+
+def test_sync_stores_passes_run_level_response(fake_db, monkeypatch):
+    monkeypatch.setattr(main, "SPOOL_DIR", None)
+    monkeypatch.setattr(fake_db, "upsert_stores_from_api", lambda rows, **_: len(rows))
+    seen = []
+    real_bulk = fake_db.insert_shop_data_bulk
+
+    def spy(response, shop_list):
+        seen.append((response, dict(response)))
+        return real_bulk(response, shop_list)
+
+    monkeypatch.setattr(fake_db, "insert_shop_data_bulk", spy)
+
+    count, note = main.sync_stores(FakeShopApi(), fake_db)
+
+    assert count == 3 and "ods_errors=0" in note
+    # 整次拉取共用同一个响应头（同一个 response_time），total 是累计店铺数而不是单页条数
+    assert seen[0][0] is seen[1][0]
+    assert [snap["total"] for _, snap in seen] == [2, 3]
+    assert seen[0][1]["response_time"] == seen[1][1]["response_time"]
@@ -0,0 +1,36 @@
+# tests/test_sign.py
+import logging
+
+from sign import SignBase, Signer
+
+APP_ID = "ak_wLdu8zy98S69k"
+QUERY = {
+    "app_key": APP_ID,
+    "access_token": "tok",
+    "timestamp": "1700000000",
+    "page": 1,
+    "page_size": 100,
+    "empty": "",   # 空值不参与签名
+    "none": None,
+}
+# 改造前实现算出的签名（固定向量）
+EXPECTED = "NjEvXH4Aq7W9tV1s4G1YLV2E/RSJ9C20FCTSWQTG6Ty5J5+Z+qJ31wyRCxTlHhoC"
+
+
+def test_signer_matches_legacy_vector():
+    assert Signer(APP_ID).sign(QUERY) == EXPECTED
+    assert SignBase.generate_sign(QUERY, APP_ID) == EXPECTED
+
+
+def test_sign_many_and_for_app_reuse():
+    signer = Signer.for_app(APP_ID)
+    assert Signer.for_app(APP_ID) is signer
+    assert signer.sign_many([QUERY, QUERY]) == [EXPECTED, EXPECTED]
+
+
+def test_no_stdout_unless_debug_logging(capsys, caplog):
+    Signer(APP_ID).sign(QUERY)
+    assert capsys.readouterr().out == ""
+    with caplog.at_level(logging.DEBUG, logger="sign"):
+        Signer(APP_ID).sign(QUERY)
+    assert any("签名-最终结果" in r.getMessage() for r in caplog.records)
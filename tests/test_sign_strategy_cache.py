@@ -0,0 +1,38 @@
+# tests/test_sign_strategy_cache.py
+from openapi import OpenApiBase
+
+
+def make_api(tmp_path):
+    api = OpenApiBase("https://example.invalid", "ak_test", "secret")
+    api.sign_strategy_file = tmp_path / ".sign_strategy_ak_test.json"
+    return api
+
+
+def test_known_strategy_goes_first_and_persists(tmp_path):
+    api = make_api(tmp_path)
+    assert api._strategy_order(api.FBA_INVENTORY_PATH, ["A", "B"]) == ["A", "B"]
+
+    api._remember_strategy(api.FBA_INVENTORY_PATH, "B", fell_back=True)
+    assert api._strategy_order(api.FBA_INVENTORY_PATH, ["A", "B"]) == ["B", "A"]
+    assert api.sign_fallback_count[api.FBA_INVENTORY_PATH] == 1
+
+    # 新实例（下一次运行）直接读到已知策略与回退计数
+    api2 = make_api(tmp_path)
+    assert api2._strategy_order(api2.FBA_INVENTORY_PATH, ["A", "B"]) == ["B", "A"]
+    assert api2._strategy_order(api2.SHOP_LIST_PATH, ["A", "B"]) == ["A", "B"]
+    assert api2.sign_fallback_count[api2.FBA_INVENTORY_PATH] == 1
+
+
+def test_strategy_file_is_replaced_atomically(tmp_path, monkeypatch):
+    import openapi
+
+    api = make_api(tmp_path)
+    api._remember_strategy(api.SHOP_LIST_PATH, "B", fell_back=False)
+    replaced = []
+    real_replace = openapi.os.replace
+    monkeypatch.setattr(openapi.os, "replace", lambda src, dst: (replaced.append((src, dst)), real_replace(src, dst)))
+
+    api._remember_strategy(api.FBA_INVENTORY_PATH, "B", fell_back=True)
+    assert replaced and replaced[0][1] == api.sign_strategy_file
+    assert sorted(p.name for p in tmp_path.iterdir()) == [".sign_strategy_ak_test.json"]  # 不留临时文件
+    assert make_api(tmp_path)._strategy_order(api.SHOP_LIST_PATH, ["A", "B"]) == ["B", "A"]
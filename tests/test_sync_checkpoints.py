@@ -0,0 +1,47 @@
+# tests/test_sync_checkpoints.py
+from datetime import datetime, timedelta
+
+from sync_checkpoints_repo import SyncCheckpoint, plan_incremental_sync
+
+ACC, EP = "ak_test", "/basicOpen/openapi/storage/fbaWarehouseDetail"
+DAY = timedelta(hours=24)
+
+
+def plan(cp, now, sids=(), **kw):
+    return plan_incremental_sync(cp, ACC, EP, now, list(sids), full_every=DAY, **kw)
+
+
+def test_first_run_is_full_and_sets_marks():
+    now = datetime(2026, 5, 1, 8, 0)
+    p = plan(None, now, sids=[1, 2, 3])
+    assert p.mode == "full" and p.filters == {}
+    assert p.next_checkpoint.high_water_mark == now and p.next_checkpoint.last_full_at == now
+
+
+def test_changed_since_uses_previous_high_water_mark():
+    prev = SyncCheckpoint(ACC, EP, high_water_mark=datetime(2026, 5, 1, 8, 0), last_full_at=datetime(2026, 5, 1, 0, 0))
+    p = plan(prev, datetime(2026, 5, 1, 8, 5), changed_since_filter="update_time_start")
+    assert p.mode == "changed_since"
+    assert p.filters == {"update_time_start": "2026-05-01 08:00:00"}
+    assert p.next_checkpoint.last_full_at == prev.last_full_at
+
+
+def test_sid_slices_rotate_and_wrap():
+    now = datetime(2026, 5, 1, 8, 0)
+    cp = SyncCheckpoint(ACC, EP, high_water_mark=now, last_full_at=now)
+    seen = []
+    for i in range(3):
+        p = plan(cp, now + timedelta(minutes=5 * (i + 1)), sids=[5, 1, 4, 2, 3], sid_slice=2)
+        assert p.mode == "sid_slice"
+        seen.append(p.filters["sid"])
+        cp = p.next_checkpoint
+    assert seen == ["1,2", "3,4", "5,1"]
+
+
+def test_full_reconcile_after_interval():
+    last_full = datetime(2026, 5, 1, 0, 0)
+    cp = SyncCheckpoint(ACC, EP, high_water_mark=datetime(2026, 5, 1, 23, 0), last_full_at=last_full,
+                        cursor_value="3")
+    p = plan(cp, last_full + DAY, sids=[1, 2, 3])
+    assert p.mode == "full" and p.next_checkpoint.last_full_at == last_full + DAY
+    assert p.next_checkpoint.cursor_value == "3"
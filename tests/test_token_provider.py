@@ -0,0 +1,101 @@
+# tests/test_token_provider.py
+import threading
+import time
+
+from token_provider import TokenProvider
+
+
+class CountingFetcher:
+    def __init__(self, expires_in=3600, delay=0.05):
+        self.calls = 0
+        self.expires_in = expires_in
+        self.delay = delay
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        time.sleep(self.delay)  # 放大并发窗口
+        with self._lock:
+            self.calls += 1
+            return f"tok-{self.calls}", self.expires_in
+
+
+def test_single_flight_across_threads(tmp_path):
+    fetch = CountingFetcher()
+    p = TokenProvider(tmp_path / ".token_cache_x.json", fetch, background_renew=False)
+    tokens = []
+    threads = [threading.Thread(target=lambda: tokens.append(p.get())) for _ in range(10)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert fetch.calls == 1
+    assert set(tokens) == {"tok-1"}
+
+
+def test_disk_tier_shared_between_providers(tmp_path):
+    fetch = CountingFetcher()
+    cache = tmp_path / ".token_cache_x.json"
+    p1 = TokenProvider(cache, fetch, background_renew=False)
+    p2 = TokenProvider(cache, fetch, background_renew=False)  # 相当于另一个进程
+    assert p1.get() == "tok-1"
+    assert p2.get() == "tok-1"
+    assert fetch.calls == 1
+
+    # p1 发现 token 失效并刷新；p2 随后也报告同一个失效 token 时直接用磁盘上的新 token
+    assert p1.refresh(stale="tok-1") == "tok-2"
+    assert p2.refresh(stale="tok-1") == "tok-2"
+    assert fetch.calls == 2
+    assert p2.current("tok-1") == "tok-2"
+
+
+def test_background_renewal_before_expiry(tmp_path):
+    fetch = CountingFetcher(expires_in=2, delay=0)
+    p = TokenProvider(tmp_path / ".token_cache_x.json", fetch, renew_margin=1.5)
+    assert p.get() == "tok-1"
+    time.sleep(1.5)  # 有效期 2s，提前量被限制为 1s → 约 1s 时后台续期
+    assert fetch.calls >= 2
+    assert p.get() != "tok-1"
+    p.close()
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.payload = payload
+        self.status_code = 200
+        self.headers = {}
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+
+class ExpiringSession:
+    """第一个 token 拉库存时报 2001003（过期），新 token 正常返回。"""
+    def __init__(self):
+        self.token_calls = 0
+
+    def request(self, method, url, params=None, **kwargs):
+        if url.endswith("/oauth/access-token"):
+            self.token_calls += 1
+            return FakeResponse({"code": 200, "data": {"access_token": f"tok-{self.token_calls}", "expires_in": 7200}})
+        if params["access_token"] == "tok-1":
+            return FakeResponse({"code": 2001003, "message": "access_token expired"})
+        return FakeResponse({"code": 0, "data": [{"seller_sku": "A"}]})
+
+
+def test_page_retries_once_after_token_expired(tmp_path):
+    from openapi import OpenApiBase
+
+    session = ExpiringSession()
+    api = OpenApiBase("https://example.invalid", "ak_test", "secret", session=session, cache_dir=str(tmp_path))
+    api._debug_prepared_request = lambda *a, **kw: None
+    token = api.generate_access_token()
+    assert token == "tok-1"
+    rows = api.fetch_inventory_fba_data(token, length=50)
+    assert rows == [{"seller_sku": "A"}]
+    assert session.token_calls == 2
+    # 之后的页直接用新 token
+    assert api.token_provider.current("tok-1") == "tok-2"
+    api.token_provider.close()
@@ -78,3 +78,122 @@ def test_upsert_inventory_idempotent(db):
     assert n3 >= 1
 
     cleanup(db)
+
+
+def test_upsert_inventory_skip_unchanged(db):
+    db.create_inventory_fba_current_table()
+    cleanup(db)
+
+    row = {
+        "sid": TEST_SID,
+        "name": "美国仓-测试",
+        "seller_sku": TEST_SELLER_SKU,
+        "fulfillment_channel": TEST_FC,
+        "total": 10,
+        "available_total": 8,
+    }
+
+    n1 = db.upsert_inventory_fba_current_from_api([row], source_system=TEST_SOURCE, platform=TEST_PLATFORM,
+                                                  skip_unchanged=True)
+    assert count_row(db) == 1
+    assert n1 == 1
+
+    # 没变化：不走 UPSERT
+    n2 = db.upsert_inventory_fba_current_from_api([row], source_system=TEST_SOURCE, platform=TEST_PLATFORM,
+                                                  skip_unchanged=True)
+    assert n2 == 0
+
+    # 有变化：照常写入
+    row["available_total"] = 7
+    n3 = db.upsert_inventory_fba_current_from_api([row], source_system=TEST_SOURCE, platform=TEST_PLATFORM,
+                                                  skip_unchanged=True)
+    assert count_row(db) == 1
+    assert n3 >= 1
+
+    cleanup(db)
+
+
+@pytest.fixture(scope="module")
+def db_infile():
+    dbh = DBHelper(
+        host=os.getenv("MYSQL_HOST", "121.43.123.62"),
+        port=int(os.getenv("MYSQL_PORT", "3316")),
+        user=os.getenv("MYSQL_USER", "root"),
+        password=os.getenv("MYSQL_PASSWORD", "Win2009@"),
+        db_name=os.getenv("MYSQL_DB", "LXTESTN8N"),
+        local_infile=True,
+    )
+    dbh.connect()
+    yield dbh
+    dbh.close()
+
+def test_upsert_inventory_load_data_engine(db_infile):
+    db_infile.create_inventory_fba_current_table()
+    cleanup(db_infile)
+    row = {
+        "sid": TEST_SID,
+        "name": "美国仓\t测试\\",  # 含制表符/反斜杠，验证 TSV 转义
+        "seller_sku": TEST_SELLER_SKU,
+        "fulfillment_channel": TEST_FC,
+        "total": 10,
+        "available_total": 8,
+    }
+    db_infile.upsert_inventory_fba_current_from_api([row], source_system=TEST_SOURCE, platform=TEST_PLATFORM,
+                                                    engine="load_data")
+    row["available_total"] = 7
+    db_infile.upsert_inventory_fba_current_from_api([row], source_system=TEST_SOURCE, platform=TEST_PLATFORM,
+                                                    engine="load_data")
+    assert count_row(db_infile) == 1
+    db_infile.cursor.execute(
+        "SELECT warehouse_name, available_total FROM inventory_fba_current "
+        "WHERE source_system=%s AND sid=%s AND seller_sku=%s AND fulfillment_channel=%s",
+        (TEST_SOURCE.lower(), TEST_SID, TEST_SELLER_SKU.lower(), TEST_FC.lower()),
+    )
+    got = db_infile.cursor.fetchone()
+    assert got["warehouse_name"] == "美国仓\t测试\\"
+    assert float(got["available_total"]) == 7
+    cleanup(db_infile)
+
+
+def test_inventory_snapshot_drops_stale_rows(db):
+    db.create_inventory_fba_current_table()
+    cleanup(db)
+    base = {"sid": TEST_SID, "name": "美国仓-测试", "fulfillment_channel": TEST_FC, "total": 1}
+    stale = dict(base, seller_sku="PYTEST-SKU-STALE")
+
+    db.upsert_inventory_fba_current_from_api([dict(base, seller_sku=TEST_SELLER_SKU), stale],
+                                             source_system=TEST_SOURCE, platform=TEST_PLATFORM)
+    db.replace_inventory_fba_current_snapshot([dict(base, seller_sku=TEST_SELLER_SKU)],
+                                              source_system=TEST_SOURCE, platform=TEST_PLATFORM)
+    assert count_row(db) == 1
+    db.cursor.execute(
+        "SELECT COUNT(*) AS cnt FROM inventory_fba_current WHERE source_system=%s AND seller_sku=%s",
+        (TEST_SOURCE.lower(), "pytest-sku-stale"),
+    )
+    assert db.cursor.fetchone()["cnt"] == 0
+    cleanup(db)
+
+
+def test_load_inventory_hashes_queries_only_batch_keys():
+    class RecordingCursor:
+        def __init__(self):
+            self.calls = []
+
+        def execute(self, sql, args=None):
+            self.calls.append((sql, list(args)))
+
+        def fetchall(self):
+            return [{"id": 7, "sid": 1, "seller_sku": "a", "fulfillment_channel": "amazon_na", "row_hash": "h"}]
+
+    dbh = DBHelper("h", 3306, "u", "p", "d")
+    dbh.cursor = RecordingCursor()
+    params = [("lingxing", "amazon", 1, f"sku-{i}", None, None, None, "amazon_na") for i in range(1500)]
+    params += params[:10]  # 同键重复出现只查一次
+    existing = dbh._load_inventory_hashes("inventory_fba_current", params)
+
+    assert existing == {(1, "a", "amazon_na"): (7, "h")}
+    assert len(dbh.cursor.calls) == 2  # 1500 个键按 1000 一块
+    sql, args = dbh.cursor.calls[0]
+    assert "(sid, seller_sku, fulfillment_channel) IN" in sql
+    assert args[:4] == ["lingxing", 1, "sku-0", "amazon_na"]
+    assert len(args) == 1 + 3 * 1000
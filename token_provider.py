@@ -0,0 +1,288 @@
+# token_provider.py
+import asyncio
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Awaitable, Callable, Optional, Set, Tuple
+
+try:
+    import fcntl  # POSIX
+except ImportError:
+    fcntl = None
+try:
+    import msvcrt  # Windows
+except ImportError:
+    msvcrt = None
+
+
+def acquire_file_lock(lock_path: Path):
+    """跨进程互斥（POSIX 用 flock，Windows 用 msvcrt.locking；都没有时退化为无锁）；返回需交给 release_file_lock 的文件。"""
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    f = open(lock_path, "a+")
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        elif msvcrt is not None:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.05)
+    except BaseException:
+        f.close()
+        raise
+    return f
+
+
+def release_file_lock(f) -> None:
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        elif msvcrt is not None:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+    finally:
+        f.close()
+
+
+@contextmanager
+def file_lock(lock_path: Path):
+    f = acquire_file_lock(lock_path)
+    try:
+        yield
+    finally:
+        release_file_lock(f)
+
+
+class TokenProvider:
+    """
+    access_token 提供者：内存一级缓存 + 磁盘（.token_cache_*.json）二级缓存。
+    - get()：内存命中直接返回，不读盘；进入续期窗口（过期前 renew_margin 秒）时后台续期，
+      已过期才同步刷新
+    - refresh()：单飞刷新——线程锁保证进程内只有一个线程去取，文件锁保证多进程只有一个去取；
+      拿到锁后先看磁盘是否已被别的进程刷新过
+    - 被替换掉的旧 token 记在 superseded 里，调用方可据此换用新 token
+    fetch_token() 负责真正请求接口，返回 (access_token, expires_in 秒)。
+    """
+    def __init__(
+        self,
+        cache_file: Path,
+        fetch_token: Callable[[], Tuple[str, int]],
+        renew_margin: float = 300.0,
+        background_renew: bool = True,
+    ):
+        self.cache_file = Path(cache_file)
+        self.lock_file = self.cache_file.with_name(self.cache_file.name + ".lock")
+        self.fetch_token = fetch_token
+        self.renew_margin = float(renew_margin)
+        self.background_renew = background_renew
+
+        self._lock = threading.Lock()
+        self._token: Optional[str] = None
+        self._expires_at = 0.0
+        self._margin = self.renew_margin
+        self._timer: Optional[threading.Timer] = None
+        self._renewing = False
+        self.superseded: Set[str] = set()
+        self.refresh_count = 0
+
+    # ---------- 磁盘二级缓存 ----------
+    def _read_disk(self) -> Tuple[Optional[str], float]:
+        try:
+            with open(self.cache_file, "r") as f:
+                cache = json.load(f)
+            return cache.get("access_token"), float(cache.get("expires_at", 0))
+        except Exception:
+            return None, 0.0
+
+    def _write_disk(self, token: str, expires_at: float) -> None:
+        tmp = self.cache_file.with_name(self.cache_file.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump({"access_token": token, "expires_at": expires_at}, f)
+        os.replace(tmp, self.cache_file)  # 原子替换，其它进程不会读到半个文件
+
+    def _set(self, token: str, expires_at: float) -> None:
+        if self._token and self._token != token:
+            self.superseded.add(self._token)
+        self._token = token
+        self._expires_at = expires_at
+        # token 有效期比 2 倍续期提前量还短时，改为剩余时间的一半，避免刚拿到就又去续期
+        self._margin = min(self.renew_margin, max(0.0, (expires_at - time.time()) / 2))
+        self._schedule_renewal()
+
+    # ---------- 对外接口 ----------
+    def get(self) -> str:
+        now = time.time()
+        token, expires_at = self._token, self._expires_at
+        if token and now < expires_at:
+            if now >= expires_at - self._margin:
+                self._renew_in_background()
+            return token
+
+        # 内存没有：先看磁盘（启动时/别的进程刷新过）
+        with self._lock:
+            if not self._token or time.time() >= self._expires_at:
+                disk_token, disk_expires = self._read_disk()
+                if disk_token and time.time() < disk_expires:
+                    self._set(disk_token, disk_expires)
+            if self._token and time.time() < self._expires_at:
+                return self._token
+        return self.refresh()
+
+    def refresh(self, stale: Optional[str] = None, force: bool = False) -> str:
+        """
+        取新 token。stale 为调用方手里已失效的 token：
+        若在等锁期间别人已经换成了另一个有效 token，直接返回它，不再重复请求。
+        force=True 时跳过内存/磁盘检查，一定向接口要新的。
+        """
+        with self._lock:
+            if not force and self._is_fresh(self._token, self._expires_at, stale):
+                return self._token
+            with file_lock(self.lock_file):
+                disk_token, disk_expires = self._read_disk()
+                if not force and self._is_fresh(disk_token, disk_expires, stale) and disk_token != self._token:
+                    self._set(disk_token, disk_expires)
+                    return disk_token
+                token, expires_in = self.fetch_token()
+                expires_at = time.time() + int(expires_in)
+                self._write_disk(token, expires_at)
+                self.refresh_count += 1
+                if stale:
+                    self.superseded.add(stale)
+                self._set(token, expires_at)
+                return token
+
+    def current(self, token: Optional[str]) -> str:
+        """调用方手里的 token 已被替换（续期/刷新）时换成当前 token，否则原样返回。"""
+        if token is None or token in self.superseded:
+            return self.get()
+        return token
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    # ---------- 内部 ----------
+    def _is_fresh(self, token: Optional[str], expires_at: float, stale: Optional[str]) -> bool:
+        """有效、且不在续期窗口内、且不是调用方报告失效的那个。"""
+        if not token or token == stale:
+            return False
+        return time.time() < expires_at - self._margin
+
+    def _schedule_renewal(self) -> None:
+        if not self.background_renew:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(0.0, self._expires_at - self._margin - time.time())
+        self._timer = threading.Timer(delay, self._renew_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def _renew_in_background(self) -> None:
+        if self._renewing:
+            return
+        self._renewing = True
+
+        def _run():
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ 后台续期 access_token 失败（到期前会再试）：{e}")
+            finally:
+                self._renewing = False
+
+        threading.Thread(target=_run, name="token-renew", daemon=True).start()
+
+
+class AsyncTokenProvider(TokenProvider):
+    """
+    TokenProvider 的 asyncio 版本（AsyncOpenApiBase 用）：同样的内存一级 + 磁盘二级缓存、
+    原子写盘、文件锁跨进程单飞；get()/refresh()/current() 都是协程，fetch_token 也是协程。
+    - 进程内单飞用 asyncio.Lock；文件锁的等待放到线程里，不卡住事件循环
+    - 不起定时器线程：get() 发现进入续期窗口时，在事件循环里起一个后台任务续期
+    """
+    def __init__(
+        self,
+        cache_file: Path,
+        fetch_token: Callable[[], Awaitable[Tuple[str, int]]],
+        renew_margin: float = 300.0,
+        background_renew: bool = True,
+    ):
+        super().__init__(cache_file, fetch_token, renew_margin=renew_margin, background_renew=background_renew)
+        self._alock = asyncio.Lock()
+        self._renew_task: Optional[asyncio.Task] = None
+
+    async def get(self) -> str:
+        now = time.time()
+        token, expires_at = self._token, self._expires_at
+        if token and now < expires_at:
+            if now >= expires_at - self._margin:
+                self._renew_in_background()
+            return token
+
+        async with self._alock:
+            if not self._token or time.time() >= self._expires_at:
+                disk_token, disk_expires = self._read_disk()
+                if disk_token and time.time() < disk_expires:
+                    self._set(disk_token, disk_expires)
+            if self._token and time.time() < self._expires_at:
+                return self._token
+        return await self.refresh()
+
+    async def refresh(self, stale: Optional[str] = None, force: bool = False) -> str:
+        """同 TokenProvider.refresh。"""
+        async with self._alock:
+            if not force and self._is_fresh(self._token, self._expires_at, stale):
+                return self._token
+            lock = await asyncio.to_thread(acquire_file_lock, self.lock_file)
+            try:
+                disk_token, disk_expires = self._read_disk()
+                if not force and self._is_fresh(disk_token, disk_expires, stale) and disk_token != self._token:
+                    self._set(disk_token, disk_expires)
+                    return disk_token
+                token, expires_in = await self.fetch_token()
+                expires_at = time.time() + int(expires_in)
+                self._write_disk(token, expires_at)
+                self.refresh_count += 1
+                if stale:
+                    self.superseded.add(stale)
+                self._set(token, expires_at)
+                return token
+            finally:
+                release_file_lock(lock)
+
+    async def current(self, token: Optional[str]) -> str:
+        if token is None or token in self.superseded:
+            return await self.get()
+        return token
+
+    def close(self) -> None:
+        super().close()
+        if self._renew_task is not None:
+            self._renew_task.cancel()
+            self._renew_task = None
+
+    def _schedule_renewal(self) -> None:
+        pass  # 续期由 get() 触发，见 _renew_in_background
+
+    def _renew_in_background(self) -> None:
+        if self._renewing or not self.background_renew:
+            return
+        self._renewing = True
+
+        async def _run():
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ 后台续期 access_token 失败（到期前会再试）：{e}")
+            finally:
+                self._renewing = False
+
+        self._renew_task = asyncio.get_running_loop().create_task(_run())